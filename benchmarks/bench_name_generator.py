@@ -0,0 +1,52 @@
+"""
+Micro-benchmark for NameGenerator: per-entry cost of naming synthetic dblp records.
+
+Run from the repository root:  python benchmarks/bench_name_generator.py [N]
+"""
+import random
+import string
+import sys
+import time
+import typing as tg
+
+from retrievelit.name_generator import NameGenerator
+
+# names that exercise the special cases; most surnames are random letters to keep collisions realistic
+SURNAMES = ['Smith', 'Müller-Birn', 'van Klaassen', "O'Brien", 'Nguyen', 'García', 'Prechelt']
+TITLE_WORDS = ['the', 'an', 'on', 'of', 'empirical', 'study', 'FACER:', 'API', 'testing', 'code', 'review',
+               'developers', 'in', 'open-source', 'software', 'mining', 'with', 'large', 'language', 'models']
+
+
+def synthetic_records(n: int, seed: int = 1) -> tg.List[tg.Dict]:
+    """Return n records in the unified format DblpDownloader produces, as far as naming needs it."""
+    rnd = random.Random(seed)
+
+    def surname() -> str:
+        if rnd.random() < 0.1:
+            return rnd.choice(SURNAMES)
+        return ''.join(rnd.choice(string.ascii_lowercase) for _ in range(rnd.randint(3, 9))).capitalize()
+
+    return [{
+        'authors': [f"Author{i} {surname()}" for i in range(rnd.randint(1, 6))],
+        'year': str(rnd.randint(2000, 2024)),
+        'title': ' '.join(rnd.choice(TITLE_WORDS) for _ in range(rnd.randint(4, 12))) + ' engineering',
+    } for _ in range(n)]
+
+
+def bench(records: tg.List[tg.Dict], longname: bool) -> float:
+    """Return the seconds per entry for naming all records with a fresh NameGenerator (stopwords included)."""
+    name_generator_ = NameGenerator('unused', [], longname)
+    start = time.perf_counter()
+    name_generator_.generate_names(records)
+    return (time.perf_counter() - start) / len(records)
+
+
+def main() -> None:
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    records = synthetic_records(n)
+    for longname in (False, True):
+        print(f"{n} records, longname={longname}: {1e6 * bench(records, longname):.2f} µs per entry")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""
+Startup benchmark: how long a fresh interpreter takes to import retrievelit.main and to print `retrievelit -h`.
+
+Run from the repository root:  python benchmarks/bench_startup.py [N]
+"""
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import typing as tg
+from pathlib import Path
+
+SRC = Path(__file__).resolve().parents[1] / 'src'
+# modules that only some runs need and that should therefore not be imported at startup
+HEAVY = ('bs4', 'bibtexparser')
+
+
+def run(args: tg.List[str], cwd: str) -> subprocess.CompletedProcess:
+    env = dict(os.environ, PYTHONPATH=str(SRC))
+    return subprocess.run([sys.executable, *args], cwd=cwd, env=env, capture_output=True, text=True, check=True)
+
+
+def import_time(cwd: str) -> float:
+    """Return the seconds that importing retrievelit.main takes, as reported by -X importtime."""
+    stderr = run(['-X', 'importtime', '-c', 'import retrievelit.main'], cwd).stderr
+    cumulative = re.search(r'\|\s*(\d+) \| retrievelit\.main$', stderr, re.MULTILINE).group(1)
+    return int(cumulative) / 1e6
+
+
+def wall_time(args: tg.List[str], cwd: str) -> float:
+    """Return the seconds a fresh interpreter takes for args."""
+    start = time.perf_counter()
+    run(args, cwd)
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    with tempfile.TemporaryDirectory() as cwd:
+        run(['-c', 'import retrievelit.main'], cwd)  # warm up the bytecode caches
+        imports = statistics.median(import_time(cwd) for _ in range(n))
+        helps = statistics.median(wall_time(['-m', 'retrievelit.main', '-h'], cwd) for _ in range(n))
+        code = f"import sys, retrievelit.main; print(sorted(m for m in sys.modules if m.split('.')[0] in {HEAVY}))"
+        loaded = run(['-c', code], cwd).stdout.strip()
+        print(f"import retrievelit.main: {1e3 * imports:.1f} ms (median of {n})")
+        print(f"retrievelit -h:          {1e3 * helps:.1f} ms (median of {n}, including interpreter startup)")
+        print(f"heavy modules imported:  {loaded}")
+        print(f"files left behind:       {os.listdir(cwd)}")
+
+
+if __name__ == '__main__':
+    main()
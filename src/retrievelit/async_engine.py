@@ -0,0 +1,209 @@
+from __future__ import annotations
+
+import asyncio
+import concurrent.futures
+import contextlib
+import logging
+import time
+import typing as tg
+from urllib.parse import urlparse
+
+from tqdm import tqdm
+
+from retrievelit import http_client
+from retrievelit import throttle
+from retrievelit.doi_pdf_mappers.base import AsyncDoiMapper, DoiMapper, PDFDescriptor
+from retrievelit.resolution_cache import CachedMapper
+
+if tg.TYPE_CHECKING:
+    from retrievelit.pdf_downloader import PdfDownloader
+
+logger = logging.getLogger(__name__)
+
+
+def _aiohttp() -> tg.Any:
+    """Return the aiohttp module, which is an optional dependency."""
+    try:
+        import aiohttp
+    except ImportError:
+        logger.error("--engine=asyncio needs the aiohttp package. Install it by 'pip install retrievelit[async]'.")
+        raise SystemExit()
+    return aiohttp
+
+
+def check_available() -> None:
+    """Exit early if the asyncio engine cannot work here."""
+    _aiohttp()
+
+
+def _retry_after(response: tg.Any, attempt: int, backoff_factor: float) -> float:
+    """Return the seconds to wait before retrying, as the server asks or by exponential backoff."""
+    try:
+        return float(response.headers.get('Retry-After', ''))
+    except ValueError:
+        return backoff_factor * 2 ** attempt
+
+
+class AsyncHttpClient():
+    """
+    Send requests with aiohttp, with the headers, timeout, retries and throttle of http_client.
+    At most `per_host` requests to the same host are in flight at once;
+    any number of further requests just wait their turn, which costs next to nothing.
+    The aiohttp session is only created by the first request.
+    """
+    def __init__(self, per_host: int) -> None:
+        self._per_host = max(1, per_host)
+        self._semaphores: tg.Dict[str, asyncio.Semaphore] = {}
+        self._session: tg.Any = None
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def _get_session(self) -> tg.Any:
+        if self._session is None:
+            aiohttp = _aiohttp()
+            timeout = aiohttp.ClientTimeout(sock_connect=http_client.TIMEOUT, sock_read=http_client.TIMEOUT)
+            self._session = aiohttp.ClientSession(headers=http_client.HEADERS, timeout=timeout)
+        return self._session
+
+    def _semaphore(self, host: str) -> asyncio.Semaphore:
+        if host not in self._semaphores:
+            self._semaphores[host] = asyncio.Semaphore(self._per_host)
+        return self._semaphores[host]
+
+    @contextlib.asynccontextmanager
+    async def request(self, method: str, url: str, **kwargs: tg.Any) -> tg.AsyncIterator[tg.Any]:
+        """Send a request and provide the response while holding one of its host's slots."""
+        aiohttp = _aiohttp()
+        session = self._get_session()
+        settings = http_client.settings()
+        async with self._semaphore(urlparse(url).netloc):
+            for attempt in range(settings['retries'] + 1):
+                await asyncio.sleep(max(0.0, throttle.reserve(url)))
+                logger.debug(f'{method} request to {url}')
+                started = time.monotonic()
+                try:
+                    response = await session.request(method, url, **kwargs)
+                except (aiohttp.ClientError, asyncio.TimeoutError):
+                    throttle.feedback(url, healthy=False)
+                    raise
+                logger.debug(f'Reponse code: {response.status}')
+                throttle.observe(url, response.status, time.monotonic() - started)
+                if response.status not in http_client.RETRY_STATUSES or attempt == settings['retries']:
+                    break
+                response.release()
+                await asyncio.sleep(_retry_after(response, attempt, settings['backoff_factor']))
+            try:
+                yield response
+            finally:
+                response.release()
+
+    async def resolve(self, url: str) -> str:
+        """Return the URL that url finally redirects to."""
+        async with self.request('HEAD', url, allow_redirects=True) as response:
+            return str(response.url)
+
+
+class SyncMapperAdapter(AsyncDoiMapper):
+    """Let a synchronous DoiMapper serve the asyncio engine by running its methods on a thread pool."""
+    def __init__(self, mapper: DoiMapper, executor: concurrent.futures.Executor) -> None:
+        self._mapper = mapper
+        self._executor = executor
+
+    async def get_pdf_url_async(self, doi: str, client: tg.Any) -> str:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._mapper.get_pdf_url, doi)
+
+    async def get_pdfdescriptor_async(self, doi: str, client: tg.Any) -> PDFDescriptor:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._mapper.get_pdfdescriptor, doi)
+
+
+def as_async_mapper(mapper: tg.Any, executor: concurrent.futures.Executor) -> AsyncDoiMapper:
+    """Return mapper itself if it can map DOIs with asyncio, else an adapter running it on executor."""
+    if isinstance(mapper, CachedMapper):
+        mapper = mapper.wrapped  # the engine consults the cache itself
+    if isinstance(mapper, AsyncDoiMapper):
+        return mapper
+    return SyncMapperAdapter(mapper, executor)
+
+
+async def _resolve_dois(mapper: tg.Any, dois: tg.Sequence[str], per_host: int,
+                        done: tg.Optional[tg.Callable[[str, PDFDescriptor], None]]) -> tg.List[PDFDescriptor]:
+    with_filename = mapper.has_pdfdescriptor()
+    cache = mapper if isinstance(mapper, CachedMapper) else None
+    # synchronous mappers get as many threads as requests they may send to one host at a time
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=max(1, per_host))
+    async_mapper = as_async_mapper(mapper, executor)
+    client = AsyncHttpClient(per_host)
+    progress = tqdm(total=len(dois))
+
+    async def resolve(doi: str) -> PDFDescriptor:
+        descriptor = cache.cached_descriptor(doi, with_filename) if cache else None
+        if descriptor is None:
+            if with_filename:
+                descriptor = await async_mapper.get_pdfdescriptor_async(doi, client)
+            else:
+                descriptor = PDFDescriptor(await async_mapper.get_pdf_url_async(doi, client), None)
+            if cache:
+                cache.store_descriptor(doi, descriptor, with_filename)
+        if done:
+            done(doi, descriptor)
+        progress.update()
+        return descriptor
+
+    try:
+        return list(await asyncio.gather(*(resolve(doi) for doi in dois)))
+    finally:
+        progress.close()
+        await client.close()
+        executor.shutdown(wait=False)
+
+
+def resolve_dois(mapper: tg.Any, dois: tg.Sequence[str], per_host: int,
+                 done: tg.Optional[tg.Callable[[str, PDFDescriptor], None]] = None) -> tg.List[PDFDescriptor]:
+    """
+    Return the PDF descriptors of all dois in order (without filename if the mapper knows none),
+    resolving them all at once with at most per_host requests in flight per host.
+    done(doi, descriptor) is called as soon as each DOI is resolved.
+    """
+    logger.info(f'Resolving {len(dois)} DOIs with asyncio, {per_host} requests at a time per host.')
+    return asyncio.run(_resolve_dois(mapper, dois, per_host, done))
+
+
+async def _download_pdfs(downloader: PdfDownloader, per_host: int) -> bool:
+    downloads = downloader.pending_downloads()
+    for _, descriptor in downloads:
+        downloader.set_pace(urlparse(descriptor.download_url).netloc)
+    client = AsyncHttpClient(per_host)
+    progress = tqdm(total=len(downloads))
+    failed = asyncio.Event()
+
+    async def download(entry: tg.Dict, descriptor: PDFDescriptor) -> None:
+        if failed.is_set():
+            return
+        try:
+            pdf_path = await downloader.download_directly_async(entry, descriptor, client)
+        except SystemExit:
+            # the publisher won't hand out PDFs (see PdfDownloader._no_pdf_data), stop asking
+            failed.set()
+            return
+        downloader.record_download(entry, pdf_path)
+        progress.update()
+
+    try:
+        await asyncio.gather(*(download(entry, descriptor) for entry, descriptor in downloads))
+    finally:
+        progress.close()
+        await client.close()
+    return not failed.is_set()
+
+
+def download_pdfs(downloader: PdfDownloader, per_host: int) -> bool:
+    """
+    Download the pending PDFs of downloader directly, all at once with at most per_host downloads
+    in flight per host. Return whether all of them could be downloaded.
+    """
+    return asyncio.run(_download_pdfs(downloader, per_host))
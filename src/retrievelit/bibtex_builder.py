@@ -2,20 +2,31 @@ import logging
 import typing as tg
 from pathlib import Path
 
-import bibtexparser
-
 from retrievelit import utils
 from retrievelit.pipeline_step import PipelineStep
 
 logger = logging.getLogger(__name__)
 
+
+def _bibtexparser() -> tg.Any:
+    """Return the bibtexparser module, which is slow to import, so only runs that write BibTeX do."""
+    import bibtexparser
+    return bibtexparser
+
+
 class BibtexBuilder(PipelineStep):
-    """Populate the bibtex file based on the data in metadata_file."""
+    """
+    Populate the bibtex file based on the data in metadata_file.
+    If the file exists already, only the entries missing from it are appended.
+    """
+    # the file is written at the end, but a rerun only appends the entries missing from it
+    idempotent = True
+
     def __init__(self, metadata_file: Path, bibtex_file: Path):
         self._metadata_file = metadata_file
         self._bibtex_file = bibtex_file
         self._metadata: tg.List = []
-        self._bibtex_db: bibtexparser.bibdatabase.BibDatabase = bibtexparser.bibdatabase.BibDatabase()
+        self._bibtex_entries: tg.List[tg.Dict] = []
     
     def _build_entry(self, publication: tg.Dict) -> tg.Dict:
         """Create the article entry for the bibtex file in the format bibtexparser expects."""
@@ -34,23 +45,41 @@ class BibtexBuilder(PipelineStep):
         return entry
     
     def _build_bibtex(self) -> None:
-        """Create the bibtex entries and write them to the bibtex database object."""
+        """Create the bibtex entries of the metadata."""
         logger.debug('Building bibtex entries.')
-        bibtex = [self._build_entry(e) for e in self._metadata]
-        self._bibtex_db.entries = bibtex
-
-    def _save_to_file(self) -> None:
-        """Write the bibtex database to the bibtex file."""
-        logger.debug('Creating bibtex file.')
-        with open(self._bibtex_file, 'w', encoding='utf-8') as f:
-            bibtexparser.dump(self._bibtex_db, f)
+        self._bibtex_entries = [self._build_entry(e) for e in self._metadata]
+
+    def _save_to_file(self, mode: str = 'w') -> None:
+        """Write the bibtex entries to the bibtex file, or append them with mode 'a'."""
+        logger.debug('Creating bibtex file.' if mode == 'w' else 'Appending to bibtex file.')
+        bibtexparser = _bibtexparser()
+        bibtex_db = bibtexparser.bibdatabase.BibDatabase()
+        bibtex_db.entries = self._bibtex_entries
+        with open(self._bibtex_file, mode, encoding='utf-8') as f:
+            bibtexparser.dump(bibtex_db, f)
         logger.debug(f'Wrote data to bibtex file {self._bibtex_file}')
 
+    def _existing_ids(self) -> tg.Set[str]:
+        """Return the IDs of the entries in the bibtex file, if it exists."""
+        if not Path(self._bibtex_file).is_file():
+            return set()
+        with open(self._bibtex_file, 'r', encoding='utf-8') as f:
+            return {entry['ID'] for entry in _bibtexparser().load(f).entries}
+
     def run(self) -> None:
         """Run the full bibtex process."""
         self._metadata = utils.load_metadata(self._metadata_file)
-        self._build_bibtex()
-        self._save_to_file()
+        existing_ids = self._existing_ids()
+        if not existing_ids:
+            self._build_bibtex()
+            self._save_to_file()
+            return
+        # e.g. after --refresh: leave the existing entries (and any edits to them) alone
+        self._metadata = [e for e in self._metadata if e['identifier'] not in existing_ids]
+        logger.debug(f'{len(self._metadata)} entries missing from the bibtex file.')
+        if self._metadata:
+            self._build_bibtex()
+            self._save_to_file('a')
         
 if __name__ == '__main__':
     logger.error('Not a standalone file. Please run the main script instead.') # pragma: no cover
\ No newline at end of file
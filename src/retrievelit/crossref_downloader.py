@@ -0,0 +1,123 @@
+import logging
+import typing as tg
+from pathlib import Path
+
+from retrievelit import http_client
+from retrievelit.doi_pdf_mappers.base import DoiMapper
+from retrievelit.exceptions import NoEntriesReceivedError
+from retrievelit.metadata_downloader import MetadataDownloader
+
+logger = logging.getLogger(__name__)
+
+WORKS_URL = 'https://api.crossref.org/works'
+# items per page, which is the maximum of the Crossref API
+PAGE_SIZE = 1000
+# the fields _unify_data_format needs; the others are not transferred at all
+SELECT_FIELDS = ['DOI', 'title', 'author', 'volume', 'issue', 'page', 'issued', 'type']
+# Crossref work types and the type names dblp uses for them
+TYPE_NAMES = {'journal-article': 'Journal Articles', 'proceedings-article': 'Conference and Workshop Papers'}
+
+
+class CrossrefDownloader(MetadataDownloader):
+    """Download metadata for a target from the Crossref REST API and store it in a uniform format."""
+    def __init__(self, metadata_file: Path, venue: tg.Mapping, number: str, grouping: str,
+                 mapper: DoiMapper, resolve_workers: int = 1, engine: str = 'threads', refresh: bool = False):
+        super().__init__(metadata_file, mapper, resolve_workers, engine, refresh)
+        self._venue = venue
+        self._number = number
+        self._grouping = grouping
+        # mds = metadata-source
+        self._mds_config: tg.Dict = {}
+
+    def _load_mds_config(self) -> None:
+        """Load and verify the fields of the venue dict that tell how to select the venue in Crossref."""
+        try:
+            self._mds_config = self._venue['metadata_sources']['crossref']
+        except KeyError:
+            logger.error(f"No 'crossref' entry in the metadata_sources of venue '{self._venue['name']}' in venues.py. "
+                         "Please add one or try another metadata-source.")
+            raise SystemExit()
+        if not self._mds_config.get('issn') and not self._mds_config.get('container-title'):
+            logger.error("The crossref entry in venues.py needs an 'issn' list or a 'container-title'. "
+                         f"Value is {self._mds_config}.")
+            raise SystemExit()
+        if self._grouping != 'year':
+            logger.error("Crossref cannot select works by volume. Please use --grouping=year.")
+            raise SystemExit()
+
+    def _build_filter(self) -> str:
+        """Return the Crossref filter for the works of the venue in the specified year."""
+        filters = [f'from-pub-date:{self._number}-01-01', f'until-pub-date:{self._number}-12-31']
+        # Crossref ORs repeated filters of the same name
+        filters += [f'issn:{issn}' for issn in self._mds_config.get('issn', [])]
+        if self._mds_config.get('container-title'):
+            filters.append(f"container-title:{self._mds_config['container-title']}")
+        return ','.join(filters)
+
+    def _get_data(self, params: tg.Mapping[str, str]) -> tg.Dict:
+        """Send a get request for params to the works endpoint and return the message, if successful."""
+        r = http_client.get(WORKS_URL, params=params)
+        r.raise_for_status()
+        return r.json()['message']
+
+    def _get_data_for_year(self) -> tg.List:
+        """
+        Download the metadata of the venue for the specified year by deep paging:
+        each page names the cursor for the next one, so the pages come one after another.
+        """
+        params = {'filter': self._build_filter(), 'select': ','.join(SELECT_FIELDS),
+                  'rows': str(PAGE_SIZE), 'cursor': '*'}
+        items: tg.List[tg.Dict] = []
+        while True:
+            message = self._get_data(params)
+            items.extend(message['items'])
+            logger.debug(f"Received {len(items)} items. Amount for year {self._number}: {message['total-results']}.")
+            if not message['items'] or len(items) >= message['total-results']:
+                break
+            params['cursor'] = message['next-cursor']
+        if not items:
+            raise NoEntriesReceivedError()
+        return items
+
+    def _unify_data_format(self, items: tg.List) -> tg.List:
+        """Rewrite the Crossref metadata into a uniform format."""
+        result = []
+        for item in items:
+            if not item.get('DOI'):
+                logger.warning(f"Dropped entry without DOI: {item}")
+                continue
+            authors = [f"{a.get('given', '')} {a['family']}".strip() for a in item.get('author', []) if 'family' in a]
+            if not authors:
+                logger.warning(f"Dropped entry without author: {item}")
+                continue
+            # the earliest publication date, online or in print, which is also what the pub-date filters select by
+            year = item.get('issued', {}).get('date-parts', [[None]])[0][0]
+            entry = {
+                'title': item['title'][0] if item.get('title') else None,
+                'volume': item.get('volume'),
+                'number': item.get('issue'),
+                'pages': item.get('page'),
+                'year': str(year) if year else None,
+                'type': TYPE_NAMES.get(item.get('type'), item.get('type')),
+                'doi': item['DOI'].lower(),
+                'venue': self._venue['name'],
+                'venue_type': self._venue['type'],
+                'authors': authors,
+                'pdf': False,
+            }
+            logger.debug(f'created entry: {entry}')
+            result.append(entry)
+        return result
+
+    def _fetch(self) -> tg.List[tg.Dict]:
+        """Download the Crossref metadata for the specified target."""
+        self._load_mds_config()
+        logger.debug(f'Downloading metadata for venue {self._venue} and year {self._number} from Crossref.')
+        try:
+            raw_data = self._get_data_for_year()
+        except NoEntriesReceivedError:
+            logger.error(f"No entries received from Crossref for year {self._number} "
+                         f"and the selection {self._mds_config}.\n"
+                         "Please check the ISSNs or container title of the venue in 'venues.py'.")
+            raise SystemExit()
+        return self._unify_data_format(raw_data)
@@ -1,29 +1,36 @@
+import concurrent.futures
+import json
 import logging
-import time
 import typing as tg
 from pathlib import Path
 
-import requests
-
-from retrievelit import utils
+from retrievelit import http_client
 from retrievelit.doi_pdf_mappers.base import DoiMapper
-from retrievelit.pipeline_step import PipelineStep
+from retrievelit.metadata_downloader import MetadataDownloader
+from retrievelit.response_cache import ResponseCache
 from retrievelit.exceptions import NoEntriesReceivedError
 
 logger = logging.getLogger(__name__)
 
 BASE_URL = 'https://dblp.org/db/'
 API_BASE_URL = 'https://dblp.org/search/publ/api?q='
-
-class DblpDownloader(PipelineStep):
+# entries per page of the publ API, which is its maximum ...
+PAGE_SIZE = 1000
+# ... and the API computes no more than this many entries per query
+MAX_HITS = 10000
+# pages of a year fetched at the same time; the throttle still spaces out the requests
+PAGE_WORKERS = 4
+
+class DblpDownloader(MetadataDownloader):
     """Download metadata for a target from dblp.org and store it in a uniform format."""
     def __init__(self, metadata_file: Path, venue: tg.Mapping, number: str, grouping: str,
-                 mapper: DoiMapper):
-        self._metadata_file = metadata_file
+                 mapper: DoiMapper, resolve_workers: int = 1, engine: str = 'threads',
+                 response_cache: tg.Optional[ResponseCache] = None, refresh: bool = False):
+        super().__init__(metadata_file, mapper, resolve_workers, engine, refresh)
         self._venue = venue
         self._number = number
         self._grouping = grouping
-        self._mapper = mapper
+        self._response_cache = response_cache
         # mds = metadata-source
         self._mds_config: tg.Dict = {}
 
@@ -49,64 +56,68 @@ class DblpDownloader(PipelineStep):
         """Load the fields of the venue dict containing required information to download the metadata from dblp."""
         self._mds_config = self._venue['metadata_sources']['dblp']
 
-    def _get_data_for_year(self) -> tg.List:
-        """Download the metadata of the venue for the specified year."""
+    def _build_year_url(self, offset: int) -> str:
+        """Generate the dblp URL for one page of the venue's entries of the specified year."""
         venue_type = self._mds_config['type']
         acronym = self._mds_config['acronym']
-        offset = 0
-        received = 0
-        entries = []
-        while True:
-            url = f"{API_BASE_URL}stream:streams/{venue_type}/{acronym}:&h=1000&f={offset}&format=json"
-            data = self._get_data(url)
-            hits = data['result']['hits']
-            received += int(hits['@sent'])
-            total = int(hits['@total'])
-            logger.debug(f"Received {received} entries. Amount in collection: {total}.")
-            if hits['@sent'] == '0':
-                logger.warning('No entries received. This might be due to the hard cap of 10000 computed entries.'
-                               'If you are downloading entries older than ~15 years, please download a specific volume instead.')
-                break
-            entries.extend(hits['hit'])
-            older_year_reached = entries[-1]['info']['year'] < self._number  # entries arrive youngest first
-            if received >= total or older_year_reached:
-                logger.debug(f"Received all entries.")
-                break
-            logger.debug(f"{total - received} entries left. Getting next batch.")
-            offset += 1000
-            time.sleep(1)
-            
-        if not entries:
+        # the year: facet makes dblp filter on its side, so no other years are paged through
+        return (f"{API_BASE_URL}stream:streams/{venue_type}/{acronym}: year:{self._number}:"
+                f"&h={PAGE_SIZE}&f={offset}&format=json")
+
+    def _get_pages(self, build_url: tg.Callable[[int], str], what: str, advice: str = "") -> tg.List:
+        """
+        Download all pages of a query of the publ API for what, whose URL for an offset is build_url(offset).
+        The first page tells how many entries there are; the remaining pages are fetched concurrently,
+        paced by the throttle for dblp.org.
+        """
+        hits = self._get_data(build_url(0))['result']['hits']
+        total = int(hits['@total'])
+        logger.debug(f"Received {hits['@sent']} entries. Amount for {what}: {total}.")
+        if hits['@sent'] == '0':
             raise NoEntriesReceivedError()
+        if total > MAX_HITS:
+            logger.warning(f"dblp has {total} entries for {what}, but returns only the first {MAX_HITS}. {advice}")
+        pages = [hits['hit']]
+        offsets = list(range(PAGE_SIZE, min(total, MAX_HITS), PAGE_SIZE))
+        if offsets:
+            logger.debug(f"Getting {len(offsets)} more pages.")
+            with concurrent.futures.ThreadPoolExecutor(max_workers=PAGE_WORKERS) as executor:
+                for page in executor.map(self._get_data, map(build_url, offsets)):
+                    pages.append(page['result']['hits'].get('hit', []))
+        entries = [e for page in pages for e in page]
         logger.debug(f"{len(entries)} entries received from publ API.")
-        logger.debug("Filtering out entries from other years.")
+        return entries
+
+    def _get_data_for_year(self) -> tg.List:
+        """Download the metadata of the venue for the specified year."""
+        entries = self._get_pages(self._build_year_url, f"year {self._number}",
+                                  "Please download the specific volumes instead.")
+        # a no-op as long as dblp honors the year: facet
         year_entries = [e for e in entries if e['info']['year'] == self._number]
         logger.debug(f"{len(year_entries)} entries found for year {self._number}.")
         return year_entries
-        
-    def _build_volume_url(self) -> str:
-        """Generate the dbl URL to download the specified volume of the venue."""
+
+    def _build_volume_url(self, offset: int) -> str:
+        """Generate the dblp URL for one page of the specified volume of the venue."""
         venue_type = self._mds_config['type']
         acronym = self._mds_config['acronym']
-        url = f"{API_BASE_URL}toc:db/{venue_type}/{acronym}/{acronym}{self._number}.bht:&h=1000&format=json"
+        # the first page keeps the URL it had before volumes were paged, so cached responses still match
+        page = f"&f={offset}" if offset else ""
+        url = f"{API_BASE_URL}toc:db/{venue_type}/{acronym}/{acronym}{self._number}.bht:&h={PAGE_SIZE}{page}&format=json"
         logger.debug(f'Built volume url: {url}')
         return url
 
     def _get_data(self, url: str) -> tg.Dict:
         """Send a get request to the URL and return the json data, if successful."""
-        logger.debug(f'GET request to {url}')
-        r = requests.get(url)
-        logger.debug(f'Reponse code: {r.status_code}')
+        if self._response_cache is not None:
+            return json.loads(self._response_cache.get(url))
+        r = http_client.get(url)
         r.raise_for_status()
         return r.json()
 
     def _get_data_for_volume(self) -> tg.List:
         """Download the metadata of the venue for the specified volume."""
-        volume_url = self._build_volume_url()
-        data = self._get_data(volume_url)
-        if data['result']['hits']['@total'] == "0":
-            raise NoEntriesReceivedError()
-        entries = data['result']['hits']['hit']
+        entries = self._get_pages(self._build_volume_url, f"volume {self._number}")
         logger.debug(f"Received {len(entries)} entries for volume {self._number}.")
         return entries
 
@@ -126,9 +137,6 @@ class DblpDownloader(PipelineStep):
             entry['doi'] = entry['doi'].lower()
             entry['venue'] = self._venue['name']
             entry['venue_type'] = self._venue['type']
-            descriptor = self._mapper.get_pdfdescriptor(entry['doi'])
-            entry['pdf_url'] = descriptor.download_url
-            entry['pdf_filename'] = descriptor.filename
 
             # create list of author names
             authors = publication.get('authors')
@@ -152,8 +160,8 @@ class DblpDownloader(PipelineStep):
             result.append(entry)
         return result
 
-    def run(self) -> None:
-        """Download the dblp metadata for the specified target and save it to a file."""
+    def _fetch(self) -> tg.List[tg.Dict]:
+        """Download the dblp metadata for the specified target."""
         self._verify_mds_config()
         # mds = metadata-source
         self._load_mds_config()
@@ -186,8 +194,7 @@ class DblpDownloader(PipelineStep):
 
         logger.debug('Metadata received.')
         logger.debug('Rewriting data in uniform format.')
-        unified_data = self._unify_data_format(raw_data)
-        utils.save_metadata(self._metadata_file, unified_data)
+        return self._unify_data_format(raw_data)
 
 if __name__ == '__main__':
     logger.error('Not a standalone file. Please run the main script instead.')
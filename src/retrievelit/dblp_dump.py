@@ -0,0 +1,224 @@
+import gzip
+import html.entities
+import json
+import logging
+import os
+import sqlite3
+import threading
+import typing as tg
+import xml.etree.ElementTree as ET
+from pathlib import Path
+
+from retrievelit.dblp_downloader import DblpDownloader
+from retrievelit.doi_pdf_mappers.base import DoiMapper
+from retrievelit.exceptions import NoEntriesReceivedError
+
+logger = logging.getLogger(__name__)
+
+DUMP_URL = 'https://dblp.org/xml/dblp.xml.gz'
+# the record types we index and the type names the publ API gives them
+RECORD_TYPES = {'article': 'Journal Articles', 'inproceedings': 'Conference and Workshop Papers'}
+DOI_PREFIX = 'https://doi.org/'
+# bytes of the dump fed to the parser at a time
+CHUNK_SIZE = 1 << 20
+# rows inserted per transaction while building the index
+BATCH_SIZE = 10000
+
+# several targets of a batch may ask for the same index at once; it is built only once
+_build_lock = threading.Lock()
+
+
+class _RecordCollector():
+    """
+    Parser target that turns the publication records of the dump into index rows
+    without building the document tree, so memory use does not grow with the dump.
+    """
+    def __init__(self, rows: tg.List[tg.Tuple[str, str, str, str]]) -> None:
+        self._rows = rows
+        self._record: tg.Optional[tg.Dict] = None
+        self._field: tg.Optional[str] = None
+        self._text: tg.List[str] = []
+        self._depth = 0
+
+    def start(self, tag: str, attrs: tg.Dict[str, str]) -> None:
+        self._depth += 1
+        if self._depth == 2 and tag in RECORD_TYPES and attrs.get('key', '').startswith(('journals/', 'conf/')):
+            self._record = {'tag': tag, 'key': attrs['key'], 'authors': [], 'ee': []}
+        elif self._depth == 3 and self._record is not None:
+            self._field = tag
+            self._text = []
+
+    def data(self, data: str) -> None:
+        if self._field is not None:
+            self._text.append(data)
+
+    def end(self, tag: str) -> None:
+        self._depth -= 1
+        if self._depth == 2 and self._field is not None:
+            self._add_field(self._field, ''.join(self._text).strip())
+            self._field = None
+        elif self._depth == 1 and self._record is not None:
+            row = self._row(self._record)
+            if row:
+                self._rows.append(row)
+            self._record = None
+
+    def close(self) -> None:
+        pass
+
+    def _add_field(self, field: str, text: str) -> None:
+        if field == 'author':
+            self._record['authors'].append({'text': text})
+        elif field == 'ee':
+            self._record['ee'].append(text)
+        elif field in ('title', 'volume', 'number', 'pages', 'year', 'url'):
+            self._record[field] = text
+
+    def _row(self, record: tg.Dict) -> tg.Optional[tg.Tuple[str, str, str, str]]:
+        """Return (stream, toc, year, info) for record, with info shaped like a hit of the publ API."""
+        if 'year' not in record:
+            return None
+        stream = '/'.join(record['key'].split('/')[:2])
+        # the publ API names a table of contents by the .bht file behind the page in the record's url
+        page = record.get('url', '').split('#')[0]
+        toc = page[:-len('.html')] + '.bht' if page.endswith('.html') else ''
+        info = {key: record[key] for key in ('title', 'volume', 'number', 'pages', 'year') if key in record}
+        info['type'] = RECORD_TYPES[record['tag']]
+        dois = [ee[len(DOI_PREFIX):] for ee in record['ee'] if ee.startswith(DOI_PREFIX)]
+        if dois:
+            info['doi'] = dois[0]
+        if record['authors']:
+            info['authors'] = {'author': record['authors']}
+        return stream, toc, record['year'], json.dumps(info, ensure_ascii=False)
+
+
+class DblpDumpIndex():
+    """
+    Index of the journal and conference papers in a dblp XML dump (dblp.xml.gz), stored in an SQLite file
+    next to the dump. The index is (re)built by one streaming pass over the dump whenever the dump is newer.
+    """
+    def __init__(self, dump_file: Path) -> None:
+        self._dump_file = dump_file
+        self._index_file = Path(f"{dump_file}.index.sqlite")
+
+    def _dump_version(self) -> str:
+        stat = self._dump_file.stat()
+        return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+    def _is_current(self) -> bool:
+        if not self._index_file.exists():
+            return False
+        db = sqlite3.connect(str(self._index_file))
+        try:
+            row = db.execute("SELECT value FROM meta WHERE name = 'dump_version'").fetchone()
+        except sqlite3.DatabaseError:
+            return False
+        finally:
+            db.close()
+        return bool(row) and row[0] == self._dump_version()
+
+    def ensure_built(self) -> None:
+        """Build the index unless an index of the current dump exists."""
+        if not self._dump_file.exists():
+            logger.error(f"dblp XML dump {self._dump_file} not found. Download it from {DUMP_URL} "
+                         "or point --dblp-xml to it.")
+            raise SystemExit()
+        with _build_lock:
+            if not self._is_current():
+                self._build()
+
+    def _build(self) -> None:
+        logger.info(f"Indexing dblp XML dump {self._dump_file}. This takes a few minutes, but only once per dump.")
+        # build into a separate file, so an interrupted build leaves no half index behind
+        tmp_file = Path(f"{self._index_file}.{os.getpid()}.tmp")
+        if tmp_file.exists():
+            tmp_file.unlink()
+        db = sqlite3.connect(str(tmp_file))
+        try:
+            db.execute('CREATE TABLE meta (name TEXT PRIMARY KEY, value TEXT)')
+            db.execute('CREATE TABLE entries (stream TEXT, toc TEXT, year TEXT, info TEXT)')
+            rows: tg.List[tg.Tuple[str, str, str, str]] = []
+            parser = ET.XMLParser(target=_RecordCollector(rows))
+            # the entities are declared in dblp.dtd, which the parser does not read; they are HTML's
+            parser.entity.update({name: chr(code) for name, code in html.entities.name2codepoint.items()})
+            count = 0
+            opener = gzip.open if self._dump_file.suffix == '.gz' else open
+            with opener(self._dump_file, 'rb') as f:
+                while True:
+                    chunk = f.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    parser.feed(chunk)
+                    if len(rows) >= BATCH_SIZE:
+                        count += self._insert(db, rows)
+            parser.close()
+            count += self._insert(db, rows)
+            db.execute('CREATE INDEX entries_stream ON entries (stream, year)')
+            db.execute('CREATE INDEX entries_toc ON entries (toc)')
+            db.execute("INSERT INTO meta VALUES ('dump_version', ?)", (self._dump_version(),))
+            db.commit()
+        except BaseException:
+            db.close()
+            tmp_file.unlink()
+            raise
+        db.close()
+        os.replace(tmp_file, self._index_file)
+        logger.info(f"Indexed {count} papers of the dblp XML dump.")
+
+    def _insert(self, db: sqlite3.Connection, rows: tg.List[tg.Tuple[str, str, str, str]]) -> int:
+        """Insert and clear rows, returning their number."""
+        db.executemany('INSERT INTO entries VALUES (?, ?, ?, ?)', rows)
+        db.commit()
+        count = len(rows)
+        rows.clear()
+        return count
+
+    def _query(self, condition: str, params: tg.Tuple) -> tg.List[tg.Dict]:
+        db = sqlite3.connect(str(self._index_file))
+        try:
+            rows = db.execute(f'SELECT info FROM entries WHERE {condition} ORDER BY rowid', params).fetchall()
+        finally:
+            db.close()
+        return [{'info': json.loads(info)} for info, in rows]
+
+    def year(self, stream: str, year: str) -> tg.List[tg.Dict]:
+        """Return the hits of stream (e.g. 'journals/tse') in year."""
+        return self._query('stream = ? AND year = ?', (stream, year))
+
+    def toc(self, toc: str) -> tg.List[tg.Dict]:
+        """Return the hits of the table of contents toc (e.g. 'db/journals/ese/ese25.bht')."""
+        return self._query('toc = ?', (toc,))
+
+
+class DblpDumpDownloader(DblpDownloader):
+    """
+    Read the metadata for a target from a local dblp XML dump instead of the dblp search API.
+    Works with the same venue configuration and produces the same entries as DblpDownloader,
+    but without network access, rate limits or result caps.
+    """
+    def __init__(self, metadata_file: Path, venue: tg.Mapping, number: str, grouping: str,
+                 mapper: DoiMapper, dump_file: Path, resolve_workers: int = 1, engine: str = 'threads',
+                 refresh: bool = False):
+        super().__init__(metadata_file, venue, number, grouping, mapper, resolve_workers, engine, refresh=refresh)
+        self._index = DblpDumpIndex(dump_file)
+
+    def _get_data_for_year(self) -> tg.List:
+        """Look up the entries of the venue for the specified year in the dump."""
+        self._index.ensure_built()
+        stream = f"{self._mds_config['type']}/{self._mds_config['acronym']}"
+        entries = self._index.year(stream, self._number)
+        if not entries:
+            raise NoEntriesReceivedError()
+        logger.debug(f"{len(entries)} entries found in dump for year {self._number}.")
+        return entries
+
+    def _get_data_for_volume(self) -> tg.List:
+        """Look up the entries of the venue for the specified volume in the dump."""
+        self._index.ensure_built()
+        venue_type = self._mds_config['type']
+        acronym = self._mds_config['acronym']
+        entries = self._index.toc(f"db/{venue_type}/{acronym}/{acronym}{self._number}.bht")
+        if not entries:
+            raise NoEntriesReceivedError()
+        logger.debug(f"{len(entries)} entries found in dump for volume {self._number}.")
+        return entries
@@ -7,6 +7,7 @@ logger = logging.getLogger(__name__)
 class AcmMapper(DoiMapper):
     """Get the PDF download URL for DOIs resolving to ACM domains."""
     DL_LINK_BASE = "https://dl.acm.org/doi/pdf"
+    politeness = 30.0  # ACM blocks IPs that download directly more than a few times
 
     def get_pdf_url(self, doi: str) -> str:
         url = f'{self.DL_LINK_BASE}/{doi}'
@@ -1,3 +1,4 @@
+import typing as tg
 from dataclasses import dataclass
 from abc import ABC, abstractmethod
 
@@ -16,12 +17,47 @@ def doi_url(doi: str) -> str:
 
 class DoiMapper(ABC):
     """Abstract base class for mappers converting a DOI to a PDF download URL."""
+    # whether mapping needs network requests; only the results of such mappers are worth caching
+    resolves_online = False
+    # seconds between the starts of two direct PDF downloads from the publisher's host, to begin with;
+    # the throttle shortens it to a quarter while the host copes and lengthens it when it does not
+    politeness = 5.0
+
     @abstractmethod
     def get_pdf_url(self, doi: str) -> str:
         """Return the PDF download URL for the DOI."""
         pass
 
-    @abstractmethod
     def get_pdfdescriptor(self, doi: str) -> PDFDescriptor:
-        """Return PDF download URL and filename for the DOI."""
+        """
+        Return PDF download URL and filename for the DOI.
+        Mappers implementing this have their PDFs downloaded by the webbrowser (see README.md).
+        """
+        raise NotImplementedError()
+
+    def has_pdfdescriptor(self) -> bool:
+        """Whether this mapper implements get_pdfdescriptor."""
+        return type(self).get_pdfdescriptor is not DoiMapper.get_pdfdescriptor
+
+    def prefetch(self, dois: tg.Sequence[str]) -> None:
+        """
+        Get ready to map all of dois, e.g. by looking them up in bulk.
+        Called before the DOIs are mapped one by one; mappers that can do better than that override it.
+        """
+        pass
+
+
+class AsyncDoiMapper(ABC):
+    """
+    Mixin for DoiMappers that can also map DOIs with asyncio (`--engine=asyncio`),
+    sending their requests through the engine's `client` (see async_engine.AsyncHttpClient).
+    Mappers without it still work with that engine; their synchronous methods then run on threads.
+    """
+    @abstractmethod
+    async def get_pdf_url_async(self, doi: str, client: tg.Any) -> str:
+        """Return the PDF download URL for the DOI."""
         pass
+
+    async def get_pdfdescriptor_async(self, doi: str, client: tg.Any) -> PDFDescriptor:
+        """Return PDF download URL and filename for the DOI."""
+        raise NotImplementedError()
@@ -1,8 +1,8 @@
 import logging
+import typing as tg
 
-import requests
-
-from retrievelit.doi_pdf_mappers.base import DoiMapper, PDFDescriptor
+from retrievelit import http_client
+from retrievelit.doi_pdf_mappers.base import AsyncDoiMapper, DoiMapper, PDFDescriptor
 from retrievelit.exceptions import PdfUrlNotFoundError
 
 logger = logging.getLogger(__name__)
@@ -33,33 +33,19 @@ So we need the last 5 components of the DOI target (all after /journal/) for the
 and the next-to-last component for the PDF filename.
 """
 
-def _get_computer_org_pdf_url(the_doi: str, get_ids: callable, urlpattern: str) -> str:
-    logger.debug(f'get_pdf_url({the_doi})')
-    response = requests.head(_doi_ieeecs_url(the_doi), allow_redirects=True)
+def _get_resolved_url(doi: str) -> str:
+    logger.debug(f'get_pdf_url({doi})')
+    response = http_client.head(_doi_ieeecs_url(doi), allow_redirects=True)
+    # after the retries ran out, the URL of an error response would make a bogus PDF URL
+    response.raise_for_status()
     resolved_url = response.url
     logger.debug(f'---> {resolved_url}')
-    ids = get_ids(resolved_url)
-    if not ids:
-        raise PdfUrlNotFoundError(f"Url '{resolved_url}' doesn't match expected pattern.")
-    url = urlpattern % ids
-    logger.debug(f'---> {url}')
-    return url
-
-
-def _get_pdfdescriptor(the_doi: str, get_ids: callable, urlpattern: str) -> PDFDescriptor:
-    resolved_url = _get_resolved_url(the_doi)
-    ids = get_ids(resolved_url)
-    if not ids:
-        raise PdfUrlNotFoundError(f"Url '{resolved_url}' doesn't match expected pattern.")
-    url = urlpattern % ids
-    logger.debug(f'---> {url}')
-    return url
+    return resolved_url
 
 
-def _get_resolved_url(doi: str) -> str:
-    logger.debug(f'get_pdf_url({doi})')
-    response = requests.head(_doi_ieeecs_url(doi), allow_redirects=True)
-    resolved_url = response.url
+async def _get_resolved_url_async(doi: str, client: tg.Any) -> str:
+    logger.debug(f'get_pdf_url_async({doi})')
+    resolved_url = await client.resolve(_doi_ieeecs_url(doi))
     logger.debug(f'---> {resolved_url}')
     return resolved_url
 
@@ -69,37 +55,71 @@ def _doi_ieeecs_url(doi: str) -> str:
     return f"https://doi.ieeecomputersociety.org/{doi}"
 
 
-class ComputerOrgConfMapper(DoiMapper):
+def _pdf_url(resolved_url: str, get_ids: tg.Callable[[str], str], urlpattern: str) -> str:
+    ids = get_ids(resolved_url)
+    if not ids:
+        raise PdfUrlNotFoundError(f"Url '{resolved_url}' doesn't match expected pattern.")
+    url = urlpattern % ids
+    logger.debug(f'---> {url}')
+    return url
+
+
+class ComputerOrgConfMapper(DoiMapper, AsyncDoiMapper):
+    resolves_online = True
     DL_LINK_BASE = "https://www.computer.org/csdl/pds/api/csdl/proceedings/download-article"
 
-    def get_pdf_url(self, the_doi):
-        return _get_computer_org_pdf_url(
-            the_doi,
+    def _pdf_url(self, resolved_url: str) -> str:
+        return _pdf_url(
+            resolved_url,
             get_ids=lambda url: url.split('/')[-1],
             urlpattern='https://www.computer.org/csdl/pds/api/csdl/proceedings/download-article/%s/pdf'
         )
 
-    def get_pdfdescriptor(self, the_doi: str) -> PDFDescriptor:
-        resolved_url = _get_resolved_url(the_doi)
+    def _pdfdescriptor(self, resolved_url: str) -> PDFDescriptor:
         two_ids = resolved_url.split('/')[-2:]  # the two last path elements
         dl_link = f"{self.DL_LINK_BASE}/{two_ids[1]}/pdf"
         filename = f"{two_ids[0]}.pdf"
         return PDFDescriptor(dl_link, filename)
 
+    def get_pdf_url(self, the_doi):
+        return self._pdf_url(_get_resolved_url(the_doi))
+
+    def get_pdfdescriptor(self, the_doi: str) -> PDFDescriptor:
+        return self._pdfdescriptor(_get_resolved_url(the_doi))
+
+    async def get_pdf_url_async(self, the_doi: str, client: tg.Any) -> str:
+        return self._pdf_url(await _get_resolved_url_async(the_doi, client))
 
-class ComputerOrgJournalMapper(DoiMapper):
+    async def get_pdfdescriptor_async(self, the_doi: str, client: tg.Any) -> PDFDescriptor:
+        return self._pdfdescriptor(await _get_resolved_url_async(the_doi, client))
+
+
+class ComputerOrgJournalMapper(DoiMapper, AsyncDoiMapper):
+    resolves_online = True
     DL_LINK_BASE = "https://www.computer.org/csdl/api/v1/periodical/trans"
-    def get_pdf_url(self, the_doi):
-        return _get_pdfdescriptor(
-                the_doi,
+
+    def _pdf_url(self, resolved_url: str) -> str:
+        return _pdf_url(
+                resolved_url,
                 get_ids=lambda url: url.split('/journal/')[1],
                 urlpattern='https://www.computer.org/csdl/api/v1/periodical/trans/%s/download-article/pdf'
         )
 
-    def get_pdfdescriptor(self, the_doi: str) -> PDFDescriptor:
-        resolved_url = _get_resolved_url(the_doi)
+    def _pdfdescriptor(self, resolved_url: str) -> PDFDescriptor:
         several_ids_part = resolved_url.split('/journal/')[1]  # several path elements
         dl_link = f"{self.DL_LINK_BASE}/{several_ids_part}/download-article/pdf"
         several_ids = several_ids_part.split('/')
         filename = f"{several_ids[-2]}.pdf"
         return PDFDescriptor(dl_link, filename)
+
+    def get_pdf_url(self, the_doi):
+        return self._pdf_url(_get_resolved_url(the_doi))
+
+    def get_pdfdescriptor(self, the_doi: str) -> PDFDescriptor:
+        return self._pdfdescriptor(_get_resolved_url(the_doi))
+
+    async def get_pdf_url_async(self, the_doi: str, client: tg.Any) -> str:
+        return self._pdf_url(await _get_resolved_url_async(the_doi, client))
+
+    async def get_pdfdescriptor_async(self, the_doi: str, client: tg.Any) -> PDFDescriptor:
+        return self._pdfdescriptor(await _get_resolved_url_async(the_doi, client))
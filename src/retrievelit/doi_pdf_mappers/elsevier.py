@@ -1,22 +1,80 @@
 import logging
+import re
+import typing as tg
+from urllib.parse import urlparse
 
 import requests
 
+from retrievelit import http_client
 from retrievelit.doi_pdf_mappers.base import DoiMapper, PDFDescriptor
 from retrievelit.exceptions import PdfUrlNotFoundError
 
 logger = logging.getLogger(__name__)
 
+CROSSREF_WORKS_URL = 'https://api.crossref.org/works'
+# DOIs per Crossref request; they all go into the URL, so keep it moderate
+PREFETCH_BATCH_SIZE = 50
+# compact form of a Publisher Item Identifier such as S0950584916301793
+PII_PATTERN = re.compile(r'[SB]\d{15}[\dX]')
+# where Elsevier DOIs resolve to, e.g. https://www.sciencedirect.com/science/article/pii/S0950584916301793
+SCIENCEDIRECT_HOSTS = ('www.sciencedirect.com', 'sciencedirect.com', 'linkinghub.elsevier.com')
+
+
+def _pii_from_alternative_ids(alternative_ids: tg.Sequence[str]) -> tg.Optional[str]:
+    """Return the PII among the 'alternative-id' values Crossref has for Elsevier articles, if any."""
+    for alternative_id in alternative_ids:
+        # PIIs are sometimes written as S0950-5849(16)30179-3
+        compact = re.sub(r'[^0-9A-Z]', '', alternative_id.upper())
+        if PII_PATTERN.fullmatch(compact):
+            return compact
+    return None
+
+
 class ElsevierMapper(DoiMapper):
     """Get the PDF download URL for DOIs resolving to sciencedirect domains (Elsevier)."""
+    resolves_online = True
     DL_LINK_BASE = "https://www.sciencedirect.com/science/article/pii"
 
+    def __init__(self) -> None:
+        # DOI -> Elsevier ID (PII); every DOI is resolved at most once per process
+        self._elsevier_ids: tg.Dict[str, str] = {}
+
     def _elsevier_id_from_doi(self, doi: str) -> str:
-        response = requests.head(f'https://doi.org/{doi}', allow_redirects=True)
+        if doi in self._elsevier_ids:
+            return self._elsevier_ids[doi]
+        response = http_client.head(f'https://doi.org/{doi}', allow_redirects=True)
+        # after the retries ran out, the URL of an error response would make a bogus PII
+        response.raise_for_status()
         resolved_url = response.url
-        elsevier_id = resolved_url.split('/')[-1]
+        elsevier_id = urlparse(resolved_url).path.split('/')[-1]
+        if urlparse(resolved_url).netloc not in SCIENCEDIRECT_HOSTS or not PII_PATTERN.fullmatch(elsevier_id):
+            logger.debug(f'{doi} resolved to {resolved_url}, which is no ScienceDirect article.')
+            return ''  # not memoized, the next attempt may fare better
+        self._elsevier_ids[doi] = elsevier_id
         return elsevier_id
 
+    def prefetch(self, dois: tg.Sequence[str]) -> None:
+        """Look up the PIIs of all dois in Crossref's metadata, a batch of DOIs per request."""
+        missing = [doi for doi in dois if doi not in self._elsevier_ids]
+        logger.debug(f'Prefetching Elsevier IDs for {len(missing)} DOIs from Crossref.')
+        for i in range(0, len(missing), PREFETCH_BATCH_SIZE):
+            batch = missing[i:i + PREFETCH_BATCH_SIZE]
+            doi_filter = ','.join(f'doi:{doi}' for doi in batch)
+            url = f'{CROSSREF_WORKS_URL}?filter={doi_filter}&rows={len(batch)}&select=DOI,alternative-id'
+            try:
+                response = http_client.get(url)
+                response.raise_for_status()
+                items = response.json()['message']['items']
+            except (requests.RequestException, ValueError, KeyError) as e:
+                # not fatal: the DOIs of this batch get resolved one by one later
+                logger.warning(f'Could not prefetch Elsevier IDs from Crossref: {e!r}')
+                continue
+            for item in items:
+                elsevier_id = _pii_from_alternative_ids(item.get('alternative-id', []))
+                if elsevier_id:
+                    self._elsevier_ids[item['DOI'].lower()] = elsevier_id
+        logger.debug(f'Elsevier IDs known for {len(self._elsevier_ids)} DOIs.')
+
     def get_pdf_url(self, doi: str) -> str:
         logger.debug(f'get_pdf_url({doi})')
         elsevier_id = self._elsevier_id_from_doi(doi)
@@ -28,6 +86,6 @@ class ElsevierMapper(DoiMapper):
 
     def get_pdfdescriptor(self, doi: str) -> PDFDescriptor:
         pdf_dl_url = self.get_pdf_url(doi)
-        elsevier_id = self._elsevier_id_from_doi(doi)
+        elsevier_id = self._elsevier_id_from_doi(doi)  # memoized by get_pdf_url, no second request
         download_filename = f'1-s2.0-{elsevier_id}-main.pdf'
         return PDFDescriptor(pdf_dl_url, download_filename)
@@ -7,6 +7,7 @@ logger = logging.getLogger(__name__)
 class SpringerMapper(DoiMapper):
     """Get the PDF download URL for DOIs resolving to Springer domains. As simple as it should be!"""
     DL_LINK_BASE = "https://link.springer.com/content/pdf"
+    politeness = 1.0  # Springer copes well with direct downloads
     
     def get_pdf_url(self, doi: str) -> str:
         url = f'{self.DL_LINK_BASE}/{doi}.pdf'
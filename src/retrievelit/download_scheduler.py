@@ -0,0 +1,267 @@
+from __future__ import annotations
+
+import collections
+import concurrent.futures
+import contextlib
+import logging
+import queue
+import time
+import typing as tg
+from dataclasses import dataclass
+from pathlib import Path
+from urllib.parse import urlparse
+
+from tqdm import tqdm
+
+from retrievelit import download_watcher
+from retrievelit import throttle
+from retrievelit.doi_pdf_mappers.base import PDFDescriptor
+from retrievelit.exceptions import DownloadTimeoutError
+
+if tg.TYPE_CHECKING:
+    from retrievelit.pdf_downloader import PdfDownloader
+
+logger = logging.getLogger(__name__)
+
+# seconds to look for landed browser downloads at a time while direct downloads are running as well
+WATCH_SLICE = 0.5
+
+
+@dataclass
+class _Download:
+    downloader: PdfDownloader
+    entry: tg.Dict
+    descriptor: PDFDescriptor
+
+    @property
+    def url(self) -> str:
+        return self.descriptor.download_url
+
+    @property
+    def by_webbrowser(self) -> bool:
+        return self.downloader.uses_webbrowser
+
+
+def _download_directly(download: _Download, delay: float) -> Path:
+    """Download in the throttle slot that was reserved delay seconds ahead and return the path of the PDF."""
+    if delay > 0:
+        time.sleep(delay)
+    return download.downloader.download_directly(download.entry, download.descriptor, reserved=True)
+
+
+class DownloadScheduler():
+    """
+    Download the pending PDFs of one or more PdfDownloaders, interleaving the hosts they come from.
+    Each host has a queue of its own; the next download is taken round-robin from the hosts
+    whose throttle allows a request right now, so waiting for one publisher does not hold up the others.
+    Direct downloads run on `workers` threads, browser downloads have up to `window` of them in flight.
+    Downloads may also be streamed in while run() is running (see stream()).
+    """
+    def __init__(self, downloaddir: Path, workers: int = 1, window: int = 1, downloadtimeout: float = 600) -> None:
+        self._downloaddir = downloaddir
+        self._workers = max(1, workers)
+        self._window = max(1, window)
+        self._downloadtimeout = downloadtimeout
+        self._queues: tg.Dict[str, tg.Deque[_Download]] = {}
+        self._hosts: tg.Deque[str] = collections.deque()  # hosts with queued downloads, in round-robin order
+        self._running: tg.Dict[concurrent.futures.Future, _Download] = {}  # direct downloads
+        # expected filename -> (browser download, time by which the file must have landed)
+        self._in_flight: tg.Dict[str, tg.Tuple[_Download, float]] = {}
+        self._downloaders: tg.List[PdfDownloader] = []
+        self._incomplete: tg.Set[PdfDownloader] = set()  # downloaders with failed or overdue downloads
+        self._feeds: tg.List[tg.Tuple[PdfDownloader, queue.Queue]] = []  # see stream()
+        self._total = 0
+
+    def _enqueue(self, downloader: PdfDownloader, entry: tg.Dict, descriptor: PDFDescriptor) -> None:
+        host = urlparse(descriptor.download_url).netloc
+        downloader.set_pace(host)
+        if host not in self._queues:
+            self._queues[host] = collections.deque()
+            self._hosts.append(host)
+        self._queues[host].append(_Download(downloader, entry, descriptor))
+        self._total += 1
+
+    def add(self, downloader: PdfDownloader) -> None:
+        """Queue the pending downloads of downloader."""
+        self._downloaders.append(downloader)
+        for entry, descriptor in downloader.pending_downloads():
+            self._enqueue(downloader, entry, descriptor)
+
+    def stream(self, downloader: PdfDownloader, feed: queue.Queue) -> None:
+        """
+        Download the (entry, descriptor) pairs that are put into feed while run() is running, until None is put.
+        run() takes only a few of them at a time, so whoever fills a bounded feed is held up
+        while the downloads fall behind.
+        """
+        self._downloaders.append(downloader)
+        self._feeds.append((downloader, feed))
+
+    def _take_from_feeds(self, timeout: float, progress: tqdm) -> None:
+        """
+        Queue downloads from the feeds while fewer than there are slots to start them are queued.
+        Wait up to timeout seconds for the first one.
+        """
+        for downloader, feed in list(self._feeds):
+            while sum(len(q) for q in self._queues.values()) < self._workers + self._window:
+                try:
+                    item = feed.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                finally:
+                    timeout = 0
+                if item is None:
+                    self._feeds.remove((downloader, feed))
+                    break
+                self._enqueue(downloader, *item)
+                progress.total = self._total
+                progress.refresh()
+
+    def finished(self, downloader: PdfDownloader) -> bool:
+        """Whether run() got all PDFs of downloader that could be downloaded at all."""
+        return downloader not in self._incomplete
+
+    def _drop(self, downloader: PdfDownloader, progress: tqdm) -> None:
+        """Dequeue all remaining downloads of downloader and stop taking more from its feeds."""
+        self._feeds = [(d, feed) for d, feed in self._feeds if d is not downloader]
+        for host in list(self._hosts):
+            queue = self._queues[host]
+            kept = collections.deque(d for d in queue if d.downloader is not downloader)
+            progress.update(len(queue) - len(kept))
+            if kept:
+                self._queues[host] = kept
+            else:
+                del self._queues[host]
+                self._hosts.remove(host)
+
+    def _can_start(self, download: _Download) -> bool:
+        if download.by_webbrowser:
+            # two downloads of the same name could not be told apart
+            return (len(self._in_flight) < self._window
+                    and download.descriptor.filename not in self._in_flight)
+        return len(self._running) < self._workers
+
+    def _next_download(self) -> tg.Optional[_Download]:
+        """Dequeue the download of the next host in turn that may start right now, if any."""
+        now = time.monotonic()
+        for _ in range(len(self._hosts)):
+            host = self._hosts[0]
+            self._hosts.rotate(-1)
+            queue = self._queues[host]
+            if throttle.ready_at(queue[0].url) > now or not self._can_start(queue[0]):
+                continue
+            download = queue.popleft()
+            if not queue:
+                del self._queues[host]
+                self._hosts.remove(host)
+            return download
+        return None
+
+    def _wake_time(self) -> tg.Optional[float]:
+        """Return when the next host becomes ready or the next browser download times out."""
+        times = [throttle.ready_at(queue[0].url) for queue in self._queues.values() if self._can_start(queue[0])]
+        times += [deadline for _, deadline in self._in_flight.values()]
+        return min(times) if times else None
+
+    def _start(self, download: _Download, executor: concurrent.futures.Executor) -> None:
+        if download.by_webbrowser:
+            download.downloader.open_in_webbrowser(download.descriptor)
+            deadline = time.monotonic() + self._downloadtimeout
+            self._in_flight[download.descriptor.filename] = (download, deadline)
+        else:
+            # take the host's slot right away, so the next pass picks another host
+            # instead of handing this one's next download to a worker that would only wait for it
+            delay = throttle.reserve(download.url)
+            future = executor.submit(_download_directly, download, delay)
+            self._running[future] = download
+
+    def _expire_browser_downloads(self, progress: tqdm) -> None:
+        """Give up on the browser downloads that are overdue."""
+        for filename, (download, deadline) in list(self._in_flight.items()):
+            if deadline <= time.monotonic():
+                logger.warning(f"{filename} did not arrive in {self._downloaddir} within "
+                               f"{self._downloadtimeout}s. Skipping {download.entry['identifier']}; "
+                               "it will be retried in the next run.")
+                throttle.feedback(download.url, healthy=False)
+                self._incomplete.add(download.downloader)
+                del self._in_flight[filename]
+                progress.update()
+
+    def _wait(self, watcher: tg.Optional[download_watcher.DownloadWatcher], timeout: tg.Optional[float],
+              progress: tqdm) -> None:
+        """Wait up to timeout seconds (None: until something happens) and collect what has finished."""
+        if self._in_flight:
+            # deadlines are among the wake times, so timeout is not None here
+            watch_timeout = min(timeout, WATCH_SLICE) if self._running else timeout
+            try:
+                filename = watcher.wait(list(self._in_flight), watch_timeout)
+            except DownloadTimeoutError:
+                self._expire_browser_downloads(progress)
+            else:
+                download, _ = self._in_flight.pop(filename)
+                pdf_path = download.downloader.collect_download(download.entry, download.descriptor)
+                download.downloader.record_download(download.entry, pdf_path)
+                progress.update()
+            timeout = 0
+        if self._running:
+            done, _ = concurrent.futures.wait(self._running, timeout,
+                                              return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                download = self._running.pop(future)
+                progress.update()
+                try:
+                    pdf_path = future.result()
+                except SystemExit:
+                    # the publisher won't hand out PDFs (see PdfDownloader._no_pdf_data), so stop
+                    # asking for this downloader's PDFs, but go on with the others
+                    logger.error(f"Stopping the downloads into {download.downloader.target_dir} "
+                                 f"after the failed download of {download.entry['identifier']}.")
+                    self._incomplete.add(download.downloader)
+                    self._drop(download.downloader, progress)
+                    continue
+                except Exception as e:
+                    # e.g. a connection error, which says nothing about the other PDFs
+                    logger.error(f"Download of {download.entry['identifier']} failed: {e!r}. "
+                                 "It will be retried in the next run.")
+                    throttle.feedback(download.url, healthy=False)
+                    self._incomplete.add(download.downloader)
+                    continue
+                download.downloader.record_download(download.entry, pdf_path)
+        elif not self._in_flight and timeout:
+            time.sleep(timeout)
+
+    def run(self) -> None:
+        """Download everything queued by add()."""
+        logger.info(f'Downloading {self._total} PDFs from {len(self._hosts)} hosts '
+                    f'with {self._workers} workers and a window of {self._window} browser downloads.')
+        if self._feeds:
+            logger.info('More downloads are queued while they are being resolved.')
+        any_browser = (any(d.by_webbrowser for queue in self._queues.values() for d in queue)
+                       or any(downloader.uses_webbrowser for downloader, _ in self._feeds))
+        watching = (download_watcher.DownloadWatcher(self._downloaddir) if any_browser
+                    else contextlib.nullcontext())
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=self._workers)
+        try:
+            with watching as watcher, tqdm(total=self._total) as progress:
+                while self._hosts or self._running or self._in_flight or self._feeds:
+                    idle = not (self._hosts or self._running or self._in_flight)
+                    # with nothing else to do, wait for the feeds
+                    self._take_from_feeds(WATCH_SLICE if idle else 0, progress)
+                    download = self._next_download()
+                    if download:
+                        self._start(download, executor)
+                        continue
+                    wake_time = self._wake_time()
+                    timeout = None if wake_time is None else max(0.0, wake_time - time.monotonic())
+                    if self._feeds:
+                        # look for more downloads now and then
+                        timeout = WATCH_SLICE if timeout is None else min(timeout, WATCH_SLICE)
+                    if not idle:
+                        self._wait(watcher, timeout, progress)
+        finally:
+            # on interruption, don't wait for running downloads: they stop after their current chunk,
+            # keeping their .part files for the next run
+            for downloader in self._downloaders:
+                downloader.cancel()
+            for future in self._running:
+                future.cancel()
+            executor.shutdown(wait=False)
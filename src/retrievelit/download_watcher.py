@@ -0,0 +1,135 @@
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import struct
+import sys
+import time
+import typing as tg
+from pathlib import Path
+
+from retrievelit.exceptions import DownloadTimeoutError
+
+logger = logging.getLogger(__name__)
+
+# inotify constants from <sys/inotify.h>
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_DELETE = 0x00000200
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+EVENT_HEADER = struct.Struct('iIII')  # wd, mask, cookie, len; followed by len bytes of name
+# seconds between two looks at the directory when inotify is not available
+POLL_INTERVAL = 0.5
+# browsers download into a file with one of these suffixes and rename it when done
+PARTIAL_SUFFIXES = ('.part', '.crdownload', '.download')
+
+
+class DownloadWatcher():
+    """
+    Notice as soon as files have completely landed in a download directory.
+    Uses Linux inotify to react to close-after-write and rename events right away;
+    elsewhere it polls the directory and waits for file sizes to settle.
+    Use as a context manager.
+    """
+    def __init__(self, directory: Path) -> None:
+        self._directory = directory
+        self._fd: tg.Optional[int] = None
+        self._finished: tg.Set[str] = set()  # names with a close-after-write or rename event
+        self._sizes: tg.Dict[str, int] = {}  # names' sizes at the last poll
+        self._started = 0.0
+
+    def __enter__(self) -> 'DownloadWatcher':
+        self._started = time.time()
+        self._fd = self._start_inotify()
+        if self._fd is None:
+            logger.debug(f'Polling {self._directory} for downloads.')
+        return self
+
+    def __exit__(self, *exc_info: tg.Any) -> None:
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def _start_inotify(self) -> tg.Optional[int]:
+        """Return an inotify file descriptor watching the directory, or None if that is impossible."""
+        if not sys.platform.startswith('linux'):
+            return None
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+            fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        except (OSError, AttributeError) as e:
+            logger.debug(f'inotify not available: {e!r}')
+            return None
+        if fd < 0:
+            return None
+        mask = IN_CLOSE_WRITE | IN_MOVED_TO | IN_MOVED_FROM | IN_DELETE
+        if libc.inotify_add_watch(fd, os.fsencode(str(self._directory)), mask) < 0:
+            logger.debug(f'Cannot watch {self._directory}: {os.strerror(ctypes.get_errno())}')
+            os.close(fd)
+            return None
+        logger.debug(f'Watching {self._directory} for downloads with inotify.')
+        return fd
+
+    def _read_events(self, timeout: float) -> None:
+        """Wait up to timeout seconds for inotify events and note which files were finished."""
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return
+        buffer = os.read(self._fd, 64 * 1024)
+        offset = 0
+        while offset < len(buffer):
+            _, mask, _, length = EVENT_HEADER.unpack_from(buffer, offset)
+            offset += EVENT_HEADER.size
+            name = os.fsdecode(buffer[offset:offset + length].rstrip(b'\0'))
+            offset += length
+            if mask & (IN_CLOSE_WRITE | IN_MOVED_TO):
+                self._finished.add(name)
+            else:
+                self._finished.discard(name)
+
+    def _in_progress(self, filename: str) -> bool:
+        """Whether the browser is still busy with filename (or has not even started it)."""
+        path = Path(self._directory, filename)
+        if any(Path(self._directory, filename + suffix).exists() for suffix in PARTIAL_SUFFIXES):
+            return True
+        return not path.is_file() or path.stat().st_size == 0  # Firefox creates an empty placeholder
+
+    def _is_complete(self, filename: str) -> bool:
+        if self._in_progress(filename):
+            self._sizes.pop(filename, None)
+            return False
+        if self._fd is not None:
+            return filename in self._finished
+        # polling: complete once the size did not change between two polls
+        size = Path(self._directory, filename).stat().st_size
+        size_old = self._sizes.get(filename)
+        self._sizes[filename] = size
+        return size == size_old
+
+    def wait(self, filenames: tg.Collection[str], timeout: float) -> str:
+        """
+        Return one of filenames as soon as it has completely landed in the directory.
+        Raise DownloadTimeoutError if none does within timeout seconds.
+        """
+        # files last written before we started watching were finished before
+        self._finished.update(name for name in filenames if not self._in_progress(name)
+                              and Path(self._directory, name).stat().st_mtime < self._started)
+        deadline = time.monotonic() + timeout
+        while True:
+            for filename in filenames:
+                if self._is_complete(filename):
+                    logger.debug(f'Download of {filename} complete.')
+                    self._finished.discard(filename)
+                    self._sizes.pop(filename, None)
+                    return filename
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise DownloadTimeoutError(f'None of {sorted(filenames)} arrived in {self._directory} '
+                                           f'within {timeout}s.')
+            if self._fd is not None:
+                self._read_events(remaining)
+            else:
+                time.sleep(min(POLL_INTERVAL, remaining))
@@ -1,8 +1,9 @@
 import logging
-import json
 import typing as tg
 from pathlib import Path
 
+from retrievelit import metadata_store
+from retrievelit import utils
 from retrievelit.pipeline_step import PipelineStep
 
 logger = logging.getLogger(__name__)
@@ -18,42 +19,91 @@ class DownloaderPipeline():
     def _load_state(self) -> None:
         """Load the state from the metadata file."""
         logger.info('Loading state.')
-        with open(self._metadata_file, 'r', encoding="utf8") as f:
-            metadata = json.load(f)
-        try:
-            self._state = metadata['state']
-        except KeyError:
-            logger.error(f"Metadata file {self._metadata_file} does not contain state.")
-            raise SystemExit()
+        self._state = metadata_store.open_store(self._metadata_file).load_state()
     
     def _save_state(self) -> None:
         """Save the current state to the metadata file."""
         logger.debug('Saving state to metadata file.')
-        with open(self._metadata_file, 'r', encoding="utf8") as f:
-            metadata = json.load(f)
-        metadata['state'] = self._state
-        with open(self._metadata_file, 'w', encoding="utf8") as f:
-            f.write(json.dumps(metadata, ensure_ascii=False, indent=2, sort_keys=True))
+        metadata_store.open_store(self._metadata_file).save_state(self._state)
         logger.debug('Finished saving state.')
     
     def add_step(self, step: PipelineStep) -> None:
         """Add a PipelineStep to the pipeline."""
         self._steps.append(step)
     
+    def is_done(self, step: PipelineStep) -> bool:
+        """Whether step has been completed, by this pipeline or by someone else on its behalf."""
+        self._load_state()
+        return bool(self._state.get(type(step).__name__))
+
+    def mark_done(self, step: PipelineStep) -> None:
+        """Record that step has been completed outside of run(), e.g. by a DownloadScheduler."""
+        utils.compact_journal(self._metadata_file)
+        self._load_state()
+        self._state[type(step).__name__] = True
+        self._save_state()
+
+    def refresh(self) -> None:
+        """
+        Mark all steps that have been done as unfinished, so that run() resumes them.
+        Incremental steps then only process what is new, e.g. entries a metadata source has added since.
+        """
+        utils.compact_journal(self._metadata_file)
+        self._load_state()
+        for step in self._steps:
+            step_name = type(step).__name__
+            if step_name in self._state:
+                self._state[step_name] = False
+        self._save_state()
+
+    def _start(self, step: PipelineStep) -> None:
+        """Record that step is started, checking that it may be, if an earlier run did not finish it."""
+        step_name = type(step).__name__
+        # False means started but not finished
+        if step_name not in self._state:
+            logger.info(f'Starting step {step_name}.')
+        elif step.incremental:
+            logger.info(f'Resuming step {step_name} with the entries an earlier run did not finish.')
+        elif step.idempotent:
+            logger.info(f'Restarting step {step_name}, which an earlier run did not finish.')
+        else:
+            logger.error(f"Step {step_name} was interrupted by an earlier run and cannot be resumed or repeated. "
+                         f"Please delete {self._metadata_file} and start over.")
+            raise SystemExit()
+        self._state[step_name] = False
+        self._save_state()
+
     def run(self) -> None:
-        """Execute the pipeline by running each step and saving state inbetween."""
+        """
+        Execute the pipeline by running each step and saving state inbetween.
+        Steps may record per-entry progress in the journal (see utils.append_to_journal);
+        it is compacted into the metadata file at every step boundary and on exit.
+        A step an earlier run did not finish is resumed or repeated as it declares (see PipelineStep).
+        """
+        # a previous run may have been interrupted and left a journal behind
+        utils.compact_journal(self._metadata_file)
         self._load_state()
         
-        for step in self._steps:
-            step_name = type(step).__name__ # = classname
-            if self._state.get(step_name):
-                logger.info(f'Step {step_name} already done. Skipping.')
-            else:
-                logger.info(f'Starting step {step_name}.')
-                step.run()
-                logger.info(f'Finished step {step_name}.')
-                self._state[step_name] = True
-                self._save_state()
-                
-    
-    
\ No newline at end of file
+        try:
+            for step in self._steps:
+                self._run_step(step)
+        finally:
+            utils.compact_journal(self._metadata_file)
+
+    def _run_step(self, step: PipelineStep) -> None:
+        """Run step unless it is done already."""
+        step_name = type(step).__name__ # = classname
+        if self._state.get(step_name):
+            logger.info(f'Step {step_name} already done. Skipping.')
+            return
+        self._start(step)
+        step.run()
+        self._finish(step)
+
+    def _finish(self, step: PipelineStep) -> None:
+        """Record that step is done."""
+        step_name = type(step).__name__
+        logger.info(f'Finished step {step_name}.')
+        utils.compact_journal(self._metadata_file)
+        self._state[step_name] = True
+        self._save_state()
@@ -4,4 +4,12 @@ class PdfUrlNotFoundError(Exception):
 
 class NoEntriesReceivedError(Exception):
     """The Metadatasource did not return any entries for the current target and configuration."""
-    pass
\ No newline at end of file
+    pass
+
+class DownloadTimeoutError(Exception):
+    """A PDF the browser was asked to download did not arrive in the download directory in time."""
+    pass
+
+class DownloadCancelledError(Exception):
+    """A direct PDF download was stopped between two chunks because the run is being cancelled."""
+    pass
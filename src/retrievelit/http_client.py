@@ -0,0 +1,91 @@
+import logging
+import threading
+import typing as tg
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from retrievelit import throttle
+
+logger = logging.getLogger(__name__)
+
+HEADERS = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:104.0) Gecko/20100101 Firefox/104.0'}
+# seconds to wait for a connection or for the next piece of the response
+TIMEOUT = 60
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+_settings = {
+    'pool_size': 10,  # connections kept alive per host
+    'retries': 5,
+    'backoff_factor': 1.0,  # waits 0, 2, 4, 8, ... seconds before the retries unless Retry-After says otherwise
+}
+_sessions: tg.Dict[str, requests.Session] = {}
+_lock = threading.Lock()
+
+
+def configure(**settings: tg.Any) -> None:
+    """Change pool_size, retries or backoff_factor for all sessions created afterwards."""
+    unknown = set(settings) - set(_settings)
+    if unknown:
+        raise ValueError(f'Unknown HTTP client settings {unknown}')
+    _settings.update(settings)
+    logger.debug(f'HTTP client settings: {_settings}')
+
+
+def settings() -> tg.Dict[str, tg.Any]:
+    """Return the current settings, e.g. for clients other than the requests sessions."""
+    return dict(_settings)
+
+
+def _new_session() -> requests.Session:
+    """Create a session that keeps connections alive and retries throttled or failed requests."""
+    retry = Retry(total=_settings['retries'], backoff_factor=_settings['backoff_factor'],
+                  status_forcelist=RETRY_STATUSES, allowed_methods=frozenset(['HEAD', 'GET']),
+                  respect_retry_after_header=True,
+                  raise_on_status=False)  # hand out the last response, callers check the status
+    adapter = HTTPAdapter(pool_connections=_settings['pool_size'], pool_maxsize=_settings['pool_size'],
+                          max_retries=retry)
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers.update(HEADERS)
+    return session
+
+
+def session_for(url: str) -> requests.Session:
+    """Return the session shared by all requests to the host of url."""
+    host = urlparse(url).netloc
+    with _lock:
+        if host not in _sessions:
+            logger.debug(f'Creating HTTP session for {host}.')
+            _sessions[host] = _new_session()
+        return _sessions[host]
+
+
+def request(method: str, url: str, reserved: bool = False, **kwargs: tg.Any) -> requests.Response:
+    """
+    Send a request through the pooled session of the host of url, respecting and informing its throttle.
+    With reserved, the caller has already reserved the throttle's slot for it (see throttle.reserve).
+    """
+    kwargs.setdefault('timeout', TIMEOUT)
+    if not reserved:
+        throttle.wait(url)
+    logger.debug(f'{method} request to {url}')
+    try:
+        response = session_for(url).request(method, url, **kwargs)
+    except requests.RequestException:
+        throttle.feedback(url, healthy=False)
+        raise
+    logger.debug(f'Reponse code: {response.status_code}')
+    throttle.observe(url, response.status_code, response.elapsed.total_seconds())
+    return response
+
+
+def get(url: str, **kwargs: tg.Any) -> requests.Response:
+    return request('GET', url, **kwargs)
+
+
+def head(url: str, **kwargs: tg.Any) -> requests.Response:
+    return request('HEAD', url, **kwargs)
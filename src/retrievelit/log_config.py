@@ -2,13 +2,6 @@ import logging.config
 import os
 from datetime import datetime
 
-# create log folder if it doesn't exist
-os.makedirs('log', exist_ok=True)
-
-# create new file for each run with dts of start
-log_dts = datetime.now().strftime('%Y-%m-%dT%H-%M-%S')
-filename = f'log/{log_dts}.log'
-
 LOGGING_CONFIG = {
     'version': 1,
     'disable_existing_loggers': False,
@@ -26,7 +19,7 @@ LOGGING_CONFIG = {
             'formatter': 'file',
             'level': 'DEBUG',
             'class': 'logging.handlers.RotatingFileHandler',
-            'filename': filename,
+            'filename': None,  # set by setup()
             'encoding': 'UTF-8',
             'backupCount': 3,
         },
@@ -51,4 +44,12 @@ LOGGING_CONFIG = {
 
 
 def setup():
+    """
+    Log to the console and to a new file in the log folder for each run, named by the time of its start.
+    Called when a run starts rather than on import, so that importing or `-h` leave no files behind.
+    """
+    # create log folder if it doesn't exist
+    os.makedirs('log', exist_ok=True)
+    log_dts = datetime.now().strftime('%Y-%m-%dT%H-%M-%S')
+    LOGGING_CONFIG['handlers']['logfile']['filename'] = f'log/{log_dts}.log'
     logging.config.dictConfig(LOGGING_CONFIG)
@@ -1,4 +1,8 @@
+from __future__ import annotations
+
 import argparse
+import concurrent.futures
+import copy
 import logging
 import re
 import sys
@@ -6,50 +10,117 @@ import typing as tg
 from pathlib import Path
 
 from retrievelit import log_config
-from retrievelit import setup_files
-from retrievelit import downloader_pipeline
 from retrievelit import mapper_factory
-from retrievelit import bibtex_builder
-from retrievelit import dblp_downloader
-from retrievelit import name_generator
-from retrievelit import pdf_downloader
+from retrievelit import metadata_store
+from retrievelit import resolution_cache
+from retrievelit import utils
 from retrievelit import venues
 
+# the modules doing the work import requests, aiohttp and the like, so they are
+# imported where a run needs them; printing the help or a usage error does not
+if tg.TYPE_CHECKING:
+    from retrievelit import downloader_pipeline
+    from retrievelit import pdf_downloader
+    from retrievelit import response_cache
 
 # disable logging from urllib3 library (used by requests)
 logging.getLogger('urllib3').setLevel(logging.ERROR)
 
-log_config.setup()
 logger = logging.getLogger(__name__)
 
 
 def create_parser() -> argparse.ArgumentParser:
     """Set up and return the parser for passed arguments."""
-    parser = argparse.ArgumentParser(description="Downloads metadata and publication PDFs of a specified venue-volume combination. See README.md for more information.")
+    parser = argparse.ArgumentParser(description="Downloads metadata and publication PDFs of a specified venue-volume combination. See README.md for more information.",
+                                     epilog="Use 'retrievelit batch -h' to download several targets in one run.")
 
     parser.add_argument('target', help="the venue-volume combination to be downloaded e. g. 'ESE-2021'")
     parser.add_argument('existing_folders', nargs='*', 
                         help=("existing folders in the current directory containing previous downloads, "
                               "constraining the namespace for the target's data"))
+    add_run_options(parser)
+    return parser
+
+
+def create_batch_parser() -> argparse.ArgumentParser:
+    """Set up and return the parser for the arguments of 'retrievelit batch'."""
+    parser = argparse.ArgumentParser(prog='retrievelit batch',
+                                     description="Downloads metadata and publication PDFs of several venue-volume combinations in one run. See README.md for more information.")
+    parser.add_argument('targets', nargs='*', metavar='target',
+                        help=("venue-volume combinations to be downloaded, in this order, e. g. 'ICSE-2021'. "
+                              "'EMSE-2015:2024' stands for EMSE-2015 up to EMSE-2024, "
+                              "'TSE-2022@ComputerOrgJournal' uses another mapper than --mapper for one target."))
+    parser.add_argument('--manifest', action='store', type=str, metavar='file',
+                        help="a file with more targets, one per line in the same notation; '#' starts a comment.")
+    parser.add_argument('--existing', action='store', nargs='+', default=[], metavar='folder',
+                        help=("existing folders in the current directory containing previous downloads. "
+                              "Each target also avoids the names of the targets before it."))
+    parser.add_argument('--metadata-workers', action='store', type=int, metavar='N', default=4,
+                        help="number of targets whose metadata is fetched in parallel. (default: %(default)s)")
+    add_run_options(parser)
+    return parser
+
+
+def add_run_options(parser: argparse.ArgumentParser) -> None:
+    """Add the options that apply to each target to parser."""
     grouping_options = ['year', 'volume']
     parser.add_argument('--grouping', choices=grouping_options, default='year', 
                         help="whether the number after the target determines the year or volume of the choosen corpus. (default: %(default)s)")
-    parser.add_argument('--mapper', default='HtmlParserMapper', choices=mapper_factory.mapper_names(),
+    parser.add_argument('--mapper', default='HtmlParser', choices=mapper_factory.mapper_names(),
                         help=("the doi_pdf_mappers class to use for retrieving the PDF URL from the DOI of a publication. "
                               "See README.md on how to implement your own.")),
-    metadata_options = ['dblp', 'crossref']
+    metadata_options = ['dblp', 'dblp-xml', 'crossref']
     parser.add_argument('--metadata', choices=metadata_options, default='dblp', 
-                        help="the source for metadata and DOIs of the venue. (default: %(default)s)")
+                        help=("the source for metadata and DOIs of the venue; 'dblp-xml' reads a local dblp "
+                              "XML dump (see --dblp-xml). (default: %(default)s)"))
+    parser.add_argument('--dblp-xml', action='store', type=str, metavar='fullpath',
+                        default=str(Path(utils.cache_dir(), 'dblp.xml.gz')),
+                        help="the dblp XML dump read by --metadata=dblp-xml. (default: %(default)s)")
     parser.add_argument('--sample', action='store', type=int, metavar='N',
                         help="number of randomly sampled articles to retrieve the PDF for. (default: all)")
     parser.add_argument('--maxwait', action='store', type=int, metavar='N', default=20,
-                        help="will wait between 0.25 N and N seconds after each download. (default: %(default)s")
+                        help=("browser downloads start N seconds apart at first, down to 0.25 N while the publisher copes. "
+                              "(default: %(default)s)"))
+    parser.add_argument('--direct', action='store_true',
+                        help="download PDFs by direct GET requests even if the mapper supports browser downloads.")
+    parser.add_argument('--download-workers', action='store', type=int, metavar='N', default=1,
+                        help=("number of direct downloads to run in parallel. Downloads from the same host start "
+                              "the mapper's politeness interval apart, adapted like --maxwait. (default: %(default)s)"))
     parser.add_argument('--downloaddir', action='store', type=str, metavar='fullpath', 
                         default=f"{Path.home()}/Downloads",
-                        help="will wait between 0.25 N and N seconds after each download. (default: %(default)s)")
+                        help="the directory your webbrowser downloads files to. (default: %(default)s)")
+    parser.add_argument('--window', action='store', type=int, metavar='K', default=1,
+                        help=("number of browser downloads to have in flight at once; the next one is opened "
+                              "while earlier files are still landing. (default: %(default)s)"))
+    parser.add_argument('--downloadtimeout', action='store', type=float, metavar='N', default=600,
+                        help="give up on a browser download after N seconds; it is retried in the next run. (default: %(default)s)")
+    parser.add_argument('--resolve-workers', action='store', type=int, metavar='N', default=4,
+                        help="number of DOIs to resolve to PDF URLs in parallel. (default: %(default)s)")
+    engine_options = ['threads', 'asyncio']
+    parser.add_argument('--engine', choices=engine_options, default='threads',
+                        help=("how to run DOI resolution and direct downloads: on thread pools or, with the "
+                              "optional aiohttp package, as asyncio tasks, all at once with --resolve-workers and "
+                              "--download-workers as the limits per host. (default: %(default)s)"))
+    parser.add_argument('--cachedays', action='store', type=float, metavar='N',
+                        default=resolution_cache.DEFAULT_TTL_DAYS,
+                        help="reuse DOI resolutions of earlier runs for N days, 0 disables the cache. (default: %(default)s)")
+    parser.add_argument('--store', choices=list(metadata_store.STORES), default='json',
+                        help=("how to keep the metadata and progress of a target: in one JSON file or in an SQLite "
+                              "database, which updates single entries in place. (default: %(default)s)"))
+    parser.add_argument('--export', action='store_true',
+                        help=("only write the JSON, BibTeX and list files of the target from its metadata store "
+                              "(as far as the earlier runs got) and exit."))
+    parser.add_argument('--refresh', action='store_true',
+                        help=("retrieve the metadata of an existing target again and add the articles that are new "
+                              "since, keeping the names of the others; only their PDFs are downloaded."))
+    parser.add_argument('--stream', action='store_true',
+                        help=("start downloading PDFs while the DOIs are still being resolved, each PDF as soon as "
+                              "its URL is known. Runs on threads; not for batches."))
+    parser.add_argument('--offline', action='store_true',
+                        help=("send no requests: take the dblp metadata and the DOI resolutions from the caches of "
+                              "earlier runs and download no PDFs. The metadata files get an '-offline' suffix."))
     parser.add_argument('--longname', action='store_true', 
                         help="add the first non-particle word of the publication title to it's name. (default: %(default)s)")
-    return parser
 
 
 def parse_target(target: str) -> tg.Tuple[tg.Mapping, str]:
@@ -67,37 +138,317 @@ def parse_target(target: str) -> tg.Tuple[tg.Mapping, str]:
     return venues.VENUES[venuename], number
 
 
-def main() -> None:
-    """Entry point: Run the entire downloader as a CLI command."""
-    argv = sys.argv[1:]
-    parser = create_parser()
-    args = parser.parse_args(argv)
-    logger.debug(f'Configuration: {vars(args)}')
+def expand_target_spec(spec: str) -> tg.List[tg.Tuple[str, tg.Optional[str]]]:
+    """
+    Return the (target, mapper name) pairs meant by a batch target specification
+    such as 'ICSE-2021', 'EMSE-2015:2024' or 'TSE-2022@ComputerOrgJournal'.
+    The mapper name is None if the specification does not name one.
+    """
+    spec_regexp = r"(.+)-(\d+)(?::(\d+))?(?:@(\w+))?"
+    mm = re.fullmatch(spec_regexp, spec)
+    if not mm:
+        logger.error("Malformed target specification: '%s'.\nUse format %s, e.g. %s" %
+                     (spec, "<venuename>-<number>[:<lastnumber>][@<mapper>]", "EMSE-2015:2024"))
+        raise SystemExit()
+    venuename, first, last, mapper = mm.groups()
+    if last is None:
+        return [(f"{venuename}-{first}", mapper)]
+    if int(last) < int(first):
+        logger.error(f"Empty range in target specification '{spec}'.")
+        raise SystemExit()
+    return [(f"{venuename}-{number}", mapper) for number in range(int(first), int(last) + 1)]
+
+
+def read_manifest(manifest: Path) -> tg.List[str]:
+    """Return the target specifications listed in a manifest file."""
+    try:
+        with open(manifest, 'r', encoding='utf8') as f:
+            lines = f.read().splitlines()
+    except OSError as e:
+        logger.error(f"Cannot read manifest {manifest}: {e}")
+        raise SystemExit()
+    specs = []
+    for line in lines:
+        specs.extend(line.split('#', 1)[0].split())
+    return specs
+
 
+def target_files(args: argparse.Namespace) -> tg.Tuple[Path, Path, Path, Path, Path]:
+    """Return target folder, metadata folder, metadata file, BibTeX file and list file of args.target."""
     target_dir = Path(args.target)
     metadata_dir = Path(target_dir, 'metadata')
     basename = f"{args.target}-{args.metadata}"
-    metadata_file = Path(metadata_dir, f'{basename}.json')
+    if args.offline:
+        basename += '-offline'  # keep the state of online runs apart
+    metadata_file = Path(metadata_dir, f'{basename}{metadata_store.STORES[args.store]}')
     bibtex_file = Path(metadata_dir, f'{basename}.bib')
     list_file = Path(metadata_dir, f'{args.target}.list')
+    return target_dir, metadata_dir, metadata_file, bibtex_file, list_file
 
-    try:
-        venue, number = parse_target(args.target)
-        mapperclass = mapper_factory.get_mapper(args.mapper)
-        setup = setup_files.Setup(metadata_dir, metadata_file, vars(args))
-        setup.run()
-        # --- create pipeline with all downloader steps:
+
+def build_pdf_downloader(args: argparse.Namespace, mapperclass: tg.Any) -> pdf_downloader.PdfDownloader:
+    """Return the PdfDownloader step of args.target."""
+    from retrievelit import pdf_downloader
+    target_dir, _, metadata_file, _, list_file = target_files(args)
+    return pdf_downloader.PdfDownloader(metadata_file, mapperclass, target_dir, list_file,
+                                        args.sample, args.maxwait, args.downloaddir,
+                                        args.direct, args.download_workers,
+                                        args.downloadtimeout, args.window, args.engine)
+
+
+def build_pipeline(args: argparse.Namespace, mapperclass: tg.Any,
+                   response_cache_: tg.Optional[response_cache.ResponseCache] = None,
+                   metadata_only: bool = False, downloads: bool = True) -> downloader_pipeline.DownloaderPipeline:
+    """
+    Set up the folder and metadata file of args.target and return the pipeline downloading it.
+    Metadata API responses are kept in response_cache_, if given.
+    With metadata_only, the pipeline stops after retrieving the metadata;
+    without downloads, it stops before downloading the PDFs.
+    """
+    from retrievelit import bibtex_builder
+    from retrievelit import crossref_downloader
+    from retrievelit import dblp_downloader
+    from retrievelit import dblp_dump
+    from retrievelit import downloader_pipeline
+    from retrievelit import name_generator
+    from retrievelit import setup_files
+    from retrievelit import streaming_pipeline
+    venue, number = parse_target(args.target)
+    _, metadata_dir, metadata_file, bibtex_file, _ = target_files(args)
+
+    setup = setup_files.Setup(metadata_dir, metadata_file, vars(args))
+    setup.run()
+    # --- create pipeline with all downloader steps:
+    if args.stream and downloads and not metadata_only:
+        pipeline = streaming_pipeline.StreamingPipeline(metadata_file)
+    else:
         pipeline = downloader_pipeline.DownloaderPipeline(metadata_file)
+    if args.metadata == 'crossref':
+        metadata_downloader = crossref_downloader.CrossrefDownloader(metadata_file, venue, number,
+                                                                     args.grouping, mapperclass,
+                                                                     args.resolve_workers, args.engine,
+                                                                     args.refresh)
+    elif args.metadata == 'dblp-xml':
+        metadata_downloader = dblp_dump.DblpDumpDownloader(metadata_file, venue, number,
+                                                           args.grouping, mapperclass, Path(args.dblp_xml),
+                                                           args.resolve_workers, args.engine, args.refresh)
+    else:
         metadata_downloader = dblp_downloader.DblpDownloader(metadata_file, venue, number, 
-                                                             args.grouping, mapperclass)
-        pipeline.add_step(metadata_downloader)
-        name_generator_ = name_generator.NameGenerator(metadata_file, args.existing_folders, args.longname)
-        pipeline.add_step(name_generator_)
-        bibtex_builder_ = bibtex_builder.BibtexBuilder(metadata_file, bibtex_file)
-        pipeline.add_step(bibtex_builder_)
-        pdf_downloader_ = pdf_downloader.PdfDownloader(metadata_file, mapperclass, target_dir, list_file,
-                                                       args.sample, args.maxwait, args.downloaddir)
-        pipeline.add_step(pdf_downloader_)
+                                                             args.grouping, mapperclass,
+                                                             args.resolve_workers, args.engine, response_cache_,
+                                                             args.refresh)
+    pipeline.add_step(metadata_downloader)
+    if metadata_only:
+        return pipeline
+    name_generator_ = name_generator.NameGenerator(metadata_file, args.existing_folders, args.longname)
+    pipeline.add_step(name_generator_)
+    bibtex_builder_ = bibtex_builder.BibtexBuilder(metadata_file, bibtex_file)
+    pipeline.add_step(bibtex_builder_)
+    if downloads:
+        pipeline.add_step(build_pdf_downloader(args, mapperclass))
+    return pipeline
+
+
+def export_target(args: argparse.Namespace) -> None:
+    """Write the JSON, BibTeX and list files of args.target from its metadata store."""
+    from retrievelit import bibtex_builder
+    target_dir, _, metadata_file, bibtex_file, list_file = target_files(args)
+    store = metadata_store.open_store(metadata_file)
+    if not store.exists():
+        logger.error(f"No metadata of {args.target} in {metadata_file} to export. Run without --export first.")
+        raise SystemExit()
+    store.compact()
+    if metadata_file.suffix != '.json':
+        store.export_json(metadata_file.with_suffix('.json'))
+    if bibtex_file.exists():
+        bibtex_file.unlink()  # BibtexBuilder would only append the missing entries
+    bibtex_builder.BibtexBuilder(metadata_file, bibtex_file).run()
+    with open(list_file, 'w', encoding='utf8') as f:
+        for entry in store.load():
+            if entry.get('pdf'):
+                f.write(f"{Path(target_dir, entry['identifier'] + '.pdf').as_posix()}\n")
+    logger.info(f'Exported {bibtex_file} and {list_file}.')
+
+
+def create_cache(args: argparse.Namespace) -> tg.Optional[resolution_cache.ResolutionCache]:
+    """Return the DOI resolution cache asked for by args, if any."""
+    if args.cachedays <= 0:
+        return None
+    return resolution_cache.ResolutionCache(Path(utils.cache_dir(), 'resolutions.sqlite'), args.cachedays)
+
+
+def create_response_cache(args: argparse.Namespace) -> response_cache.ResponseCache:
+    """Return the cache of metadata API responses, which is all there is to read with --offline."""
+    from retrievelit import response_cache
+    return response_cache.ResponseCache(Path(utils.cache_dir(), 'responses.sqlite'), args.offline)
+
+
+def check_offline(args: argparse.Namespace) -> None:
+    """Make args fit for --offline, if given, or exit if they contradict it."""
+    if not args.offline:
+        return
+    if args.metadata == 'crossref':
+        logger.error("--offline needs --metadata=dblp or --metadata=dblp-xml; Crossref responses are not cached.")
+        raise SystemExit()
+    if args.cachedays <= 0:
+        logger.error("--offline takes the DOI resolutions from the cache, which --cachedays=0 disables.")
+        raise SystemExit()
+    if args.engine != 'threads':
+        logger.info("Nothing to run concurrently when offline, using --engine=threads.")
+        args.engine = 'threads'
+
+
+def check_stream(args: argparse.Namespace, batch: bool) -> None:
+    """Make args fit for --stream, if given, or exit if they contradict it."""
+    if not args.stream:
+        return
+    if batch:
+        logger.error("--stream works for single targets only; a batch downloads all targets together.")
+        raise SystemExit()
+    if args.engine != 'threads':
+        logger.info("--stream resolves and downloads on threads, using --engine=threads.")
+        args.engine = 'threads'
+
+
+def run_batch(args: argparse.Namespace) -> bool:
+    """
+    Download all targets of a batch in one process, sharing HTTP sessions, throttles, caches and mappers.
+    The metadata of several targets is fetched in parallel first; names then follow
+    target by target, so every target avoids the names of all targets before it.
+    Finally, the PDFs of all targets are downloaded together by one DownloadScheduler.
+    Return whether all targets succeeded.
+    """
+    from retrievelit import download_scheduler
+    from retrievelit import http_client
+    from retrievelit import throttle
+    specs = list(args.targets)
+    if args.manifest:
+        specs += read_manifest(Path(args.manifest))
+    targets = [pair for spec in specs for pair in expand_target_spec(spec)]
+    if not targets:
+        logger.error("No targets given. Name them on the command line or in a --manifest file.")
+        raise SystemExit()
+    for target, _ in targets:
+        parse_target(target)  # reject unknown venues before anything is downloaded
+    if args.export:
+        for target, _ in targets:
+            target_args_ = copy.copy(args)
+            target_args_.target = target
+            export_target(target_args_)
+        return True
+    logger.info(f"Batch of {len(targets)} targets: {', '.join(target for target, _ in targets)}.")
+
+    # every worker of every target may hold a connection to the same host
+    http_client.configure(pool_size=max(10, args.resolve_workers * args.metadata_workers,
+                                        args.download_workers))
+    cache = create_cache(args)
+    responses = create_response_cache(args)
+    mappers: tg.Dict[str, tg.Any] = {}
+    target_args: tg.Dict[str, argparse.Namespace] = {}
+    existing_folders = list(args.existing)
+    for target, mapper in targets:
+        mapper = mapper or args.mapper
+        if mapper not in mappers:
+            mappers[mapper] = mapper_factory.get_mapper(mapper, cache, args.offline)
+        target_args_ = copy.copy(args)
+        target_args_.target = target
+        target_args_.mapper = mapper
+        target_args_.existing_folders = list(existing_folders)
+        for name in ('targets', 'manifest', 'existing', 'metadata_workers'):
+            delattr(target_args_, name)
+        target_args[target] = target_args_
+        existing_folders.append(target)
+    if args.refresh:
+        # the phases below then resume every step of every target with what is new
+        for target, target_args_ in target_args.items():
+            build_pipeline(target_args_, mappers[target_args_.mapper], responses).refresh()
+
+    def fetch_metadata(target: str) -> None:
+        target_args_ = target_args[target]
+        build_pipeline(target_args_, mappers[target_args_.mapper], responses, metadata_only=True).run()
+
+    failed = []
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, args.metadata_workers)) as executor:
+        futures = {target: executor.submit(fetch_metadata, target) for target in target_args}
+        for target, future in futures.items():
+            try:
+                future.result()
+            except (SystemExit, Exception) as e:
+                logger.error(f"Retrieving the metadata of {target} failed: {e!r}")
+                failed.append(target)
+    pipelines = {}
+    for target, target_args_ in target_args.items():
+        if target in failed:
+            continue
+        logger.info(f"Processing target {target}.")
+        try:
+            pipeline = build_pipeline(target_args_, mappers[target_args_.mapper], responses, downloads=False)
+            pipeline.run()
+        except SystemExit:
+            logger.error(f"Target {target} failed, continuing with the next one.")
+            failed.append(target)
+            continue
+        pipelines[target] = pipeline
+    if args.offline:
+        if failed:
+            logger.error(f"Failed targets: {', '.join(failed)}.")
+        return not failed
+
+    # downloads of all targets together, so that the hosts of different publishers take turns
+    scheduler = download_scheduler.DownloadScheduler(Path(args.downloaddir), args.download_workers,
+                                                     args.window, args.downloadtimeout)
+    pdf_downloaders = {}
+    for target, pipeline in pipelines.items():
+        target_args_ = target_args[target]
+        pdf_downloaders[target] = build_pdf_downloader(target_args_, mappers[target_args_.mapper])
+        if not pipeline.is_done(pdf_downloaders[target]):
+            scheduler.add(pdf_downloaders[target])
+    scheduler.run()
+    throttle.report()
+    for target, pipeline in pipelines.items():
+        if scheduler.finished(pdf_downloaders[target]):
+            pipeline.mark_done(pdf_downloaders[target])
+        else:
+            logger.error(f"Not all PDFs of {target} could be downloaded.")
+            failed.append(target)
+    if failed:
+        logger.error(f"Failed targets: {', '.join(failed)}. Rerun the batch to retry them.")
+    return not failed
+
+
+def main() -> None:
+    """Entry point: Run the entire downloader as a CLI command."""
+    argv = sys.argv[1:]
+    batch = argv[:1] == ['batch']
+    if batch:
+        args = create_batch_parser().parse_args(argv[1:])
+    else:
+        args = create_parser().parse_args(argv)
+    log_config.setup()
+    logger.debug(f'Configuration: {vars(args)}')
+
+    try:
+        check_offline(args)
+        check_stream(args, batch)
+        if args.engine == 'asyncio':
+            from retrievelit import async_engine
+            async_engine.check_available()
+        if batch:
+            if not run_batch(args):
+                raise SystemExit()
+            logger.info('Exiting.')
+            return
+        if args.export:
+            export_target(args)
+            logger.info('Exiting.')
+            return
+        # every worker may hold a connection to the same host
+        from retrievelit import http_client
+        http_client.configure(pool_size=max(10, args.resolve_workers, args.download_workers))
+        mapperclass = mapper_factory.get_mapper(args.mapper, create_cache(args), args.offline)
+        pipeline = build_pipeline(args, mapperclass, create_response_cache(args), downloads=not args.offline)
+        if args.refresh:
+            pipeline.refresh()
         pipeline.run()
         logger.info('Exiting.')
     except SystemExit:
@@ -107,6 +458,5 @@ def main() -> None:
         logger.error('Manual interruption - cancelling.')
         sys.exit(1)
 
-
 if __name__ == '__main__':
     main()
\ No newline at end of file
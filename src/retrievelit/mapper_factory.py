@@ -1,31 +1,51 @@
+import importlib
 import logging
 import typing as tg
 
-from retrievelit.doi_pdf_mappers import *  # make sure all mappers have been loaded
 import retrievelit.doi_pdf_mappers.base
+from retrievelit import resolution_cache
 
 logger = logging.getLogger(__name__)
 
-def get_mapper(name: str) -> retrievelit.doi_pdf_mappers.base.DoiMapper:
-    """Return an instance of the mapper class specified in `name`, if possible."""
-    logger.debug('Trying to find mapper class for provided mapper name.')
-    # all classes in that folder which implement the Mapper ABC.
+# mapper name (the class name without `Mapper`) -> module of the class in doi_pdf_mappers.
+# Only the module of the mapper in use gets imported, so startup does not pay for the others
+# and their dependencies (e.g. BeautifulSoup for HtmlParser).
+MAPPERS = {
+    'Acm': 'acm',
+    'ComputerOrgConf': 'computer_org',
+    'ComputerOrgJournal': 'computer_org',
+    'Elsevier': 'elsevier',
+    'HtmlParser': 'html_parser',
+    'Scihub': 'scihub',
+    'Springer': 'springer',
+}
+
+
+def mapper_class(name: str) -> tg.Type[retrievelit.doi_pdf_mappers.base.DoiMapper]:
+    """Import and return the mapper class of the mapper name `name`."""
     fullname = f"{name}Mapper"
-    for sc in mapper_classes():
-        if sc.__name__ == fullname:
-            logger.debug(f'Matching class found: {sc}.')
-            return sc()
-    logger.error(f"No mapper class {fullname} found for mapper name {name}. "
-                 "Make sure the class exists under 'doi_pdf_mappers' and inherits from a Mapper baseclass.")
-    raise SystemExit()
+    if name not in MAPPERS:
+        logger.error(f"No mapper class {fullname} found for mapper name {name}. "
+                     "Make sure the class exists under 'doi_pdf_mappers' and is listed in mapper_factory.MAPPERS.")
+        raise SystemExit()
+    module = importlib.import_module(f"retrievelit.doi_pdf_mappers.{MAPPERS[name]}")
+    logger.debug(f'Matching class found: {fullname} in {module.__name__}.')
+    return getattr(module, fullname)
 
 
-def mapper_classes() -> tg.Sequence[tg.Type]:
-    """Return all subclasses of DoiMapper and ResolvedDoiMapper."""
-    return retrievelit.doi_pdf_mappers.base.DoiMapper.__subclasses__()
+def get_mapper(name: str, cache: tg.Optional[resolution_cache.ResolutionCache] = None,
+               offline: bool = False) -> retrievelit.doi_pdf_mappers.base.DoiMapper:
+    """
+    Return an instance of the mapper class specified in `name`, if possible.
+    If a cache is given, mappers that resolve DOIs online consult it first;
+    when offline, they consult nothing else.
+    """
+    sc = mapper_class(name)
+    if cache and sc.resolves_online:
+        return resolution_cache.CachedMapper(sc(), cache, offline)
+    return sc()
 
 
 def mapper_names() -> tg.Sequence[str]:
-    """Return the names of all classes in mapper_classes(), without the `Mapper` substring."""
-    logger.debug(f"{len(mapper_classes())} mapper classes")
-    return [cls.__name__.replace("Mapper", "") for cls in mapper_classes()]
+    """Return the names of all mappers, i.e. their class names without the `Mapper` suffix."""
+    return list(MAPPERS)
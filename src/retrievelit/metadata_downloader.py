@@ -0,0 +1,121 @@
+import concurrent.futures
+import logging
+import typing as tg
+from abc import abstractmethod
+from pathlib import Path
+
+from tqdm import tqdm
+
+from retrievelit import async_engine
+from retrievelit import throttle
+from retrievelit import utils
+from retrievelit.doi_pdf_mappers.base import DoiMapper, PDFDescriptor
+from retrievelit.pipeline_step import PipelineStep
+
+logger = logging.getLogger(__name__)
+
+
+class MetadataDownloader(PipelineStep):
+    """
+    Base of the steps that retrieve the metadata of a target from some source.
+    Each entry of the uniform format also gets the PDF URL and filename that the mapper resolves its DOI to.
+    The entries are saved before their DOIs are resolved and each resolution is journaled,
+    so a resumed run only resolves the DOIs that are left.
+    With refresh, the metadata are retrieved again and the entries with new DOIs are added.
+    """
+    idempotent = True
+    incremental = True
+
+    def __init__(self, metadata_file: Path, mapper: DoiMapper, resolve_workers: int = 1, engine: str = 'threads',
+                 refresh: bool = False):
+        self._metadata_file = metadata_file
+        self._refresh = refresh
+        self._mapper = mapper
+        self._resolve_workers = max(1, resolve_workers)
+        self._engine = engine
+
+    @property
+    def resolve_workers(self) -> int:
+        return self._resolve_workers
+
+    def _get_pdfdescriptor(self, doi: str) -> PDFDescriptor:
+        """Return the mapper's PDF descriptor for doi; just the URL if the mapper knows no filename."""
+        if self._mapper.has_pdfdescriptor():
+            return self._mapper.get_pdfdescriptor(doi)
+        return PDFDescriptor(self._mapper.get_pdf_url(doi), None)
+
+    def _record_pdfdescriptor(self, entry: tg.Dict, descriptor: PDFDescriptor) -> None:
+        entry['pdf_url'] = descriptor.download_url
+        entry['pdf_filename'] = descriptor.filename
+        utils.append_to_journal(self._metadata_file, entry['doi'], by='doi',
+                                pdf_url=descriptor.download_url, pdf_filename=descriptor.filename)
+
+    def resolve(self, entry: tg.Dict) -> None:
+        """Resolve the DOI of entry and record its PDF descriptor in entry and in the journal."""
+        self._record_pdfdescriptor(entry, self._get_pdfdescriptor(entry['doi']))
+
+    def prefetch(self, entries: tg.List[tg.Dict]) -> None:
+        """Let the mapper get ready to resolve the DOIs of entries."""
+        self._mapper.prefetch([e['doi'] for e in entries])
+
+    def _add_pdfdescriptors(self, entries: tg.List[tg.Dict]) -> None:
+        """
+        Add PDF URL and filename to each entry that has none yet, resolving the DOIs in parallel.
+        The mappers throttle their requests per host (see throttle.py),
+        so more workers only help as long as the hosts answer slower than they are throttled.
+        """
+        entries = [e for e in entries if 'pdf_url' not in e]
+        self.prefetch(entries)
+        if self._engine == 'asyncio':
+            by_doi = {e['doi']: e for e in entries}
+            # resolve_workers is the limit of requests per host then
+            async_engine.resolve_dois(self._mapper, list(by_doi), self._resolve_workers,
+                                      done=lambda doi, descriptor: self._record_pdfdescriptor(by_doi[doi], descriptor))
+            for entry in entries:
+                entry.update({k: by_doi[entry['doi']][k] for k in ('pdf_url', 'pdf_filename')})
+            return
+        logger.info(f'Resolving {len(entries)} DOIs with {self._resolve_workers} workers.')
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=self._resolve_workers)
+        futures = [executor.submit(self._get_pdfdescriptor, e['doi']) for e in entries]
+        try:
+            # consume in entry order, so an error surfaces for the same entry as when resolving serially
+            for entry, future in tqdm(zip(entries, futures), total=len(entries)):
+                self._record_pdfdescriptor(entry, future.result())
+        finally:
+            for future in futures:
+                future.cancel()
+            executor.shutdown()
+
+    @abstractmethod
+    def _fetch(self) -> tg.List[tg.Dict]:
+        """Retrieve the metadata of the target and return it in the uniform format, without PDF URLs."""
+
+    def _add_new_entries(self, entries: tg.List[tg.Dict]) -> None:
+        """Retrieve the metadata again and append the entries whose DOI is not among entries yet."""
+        known_dois = {e['doi'] for e in entries}
+        fetched = self._fetch()
+        new_entries = [e for e in fetched if e['doi'] not in known_dois]
+        logger.info(f'{len(new_entries)} new entries among the {len(fetched)} retrieved.')
+        if new_entries:
+            entries.extend(new_entries)
+            utils.save_metadata(self._metadata_file, entries)
+
+    def retrieve(self) -> tg.List[tg.Dict]:
+        """
+        Retrieve the metadata unless an earlier run did, save it and return the entries,
+        without resolving any DOIs. run() does both; a StreamingPipeline resolves the DOIs itself.
+        """
+        entries = utils.load_metadata(self._metadata_file)
+        if entries and self._refresh:
+            self._add_new_entries(entries)
+        elif entries:
+            logger.info(f'Metadata of {len(entries)} entries retrieved by an earlier run. Resolving the remaining DOIs.')
+        else:
+            entries = self._fetch()
+            utils.save_metadata(self._metadata_file, entries)
+        return entries
+
+    def run(self) -> None:
+        """Retrieve the metadata unless an earlier run did, then resolve the DOIs not resolved yet."""
+        self._add_pdfdescriptors(self.retrieve())
+        throttle.report()
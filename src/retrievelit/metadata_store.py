@@ -0,0 +1,302 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import typing as tg
+from abc import ABC, abstractmethod
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+# the backends by the suffix of the metadata file (see open_store)
+STORES = {'json': '.json', 'sqlite': '.sqlite'}
+
+
+class MetadataStore(ABC):
+    """
+    Storage of everything retrievelit knows about a target:
+    the run configuration, the state of the pipeline steps and one entry per publication.
+    """
+    @abstractmethod
+    def exists(self) -> bool:
+        pass
+
+    @abstractmethod
+    def create(self, run_configuration: tg.Dict) -> None:
+        """Create the empty store."""
+
+    @abstractmethod
+    def run_configuration(self) -> tg.Dict:
+        pass
+
+    @abstractmethod
+    def load_state(self) -> tg.Dict:
+        """Return the state of the pipeline steps (step name -> done)."""
+
+    @abstractmethod
+    def save_state(self, state: tg.Dict) -> None:
+        pass
+
+    @abstractmethod
+    def load(self) -> tg.List[tg.Dict]:
+        """Return all entries, in their order."""
+
+    @abstractmethod
+    def save(self, entries: tg.List[tg.Dict]) -> None:
+        """Replace all entries."""
+
+    @abstractmethod
+    def update(self, key: str, by: str = 'identifier', **fields: tg.Any) -> None:
+        """
+        Change some fields of the entry whose `by` field ('identifier' or 'doi') is key, durably.
+        Unlike save, this costs the same for every entry no matter how large the corpus is.
+        """
+
+    def compact(self) -> None:
+        """Fold pending updates into the main storage, if the backend keeps them apart."""
+
+    def export_json(self, json_file: Path) -> None:
+        """Write the whole store to json_file in the layout of the JSON backend."""
+        content = {
+            "run_configuration": self.run_configuration(),
+            "state": self.load_state(),
+            "corpus_metadata": self.load(),
+        }
+        _write_json(json_file, content)
+        logger.info(f'Exported metadata to {json_file}.')
+
+
+def _write_json(json_file: Path, content: tg.Dict) -> None:
+    """Replace json_file by content at once, so a crash leaves either the old or the new document."""
+    tmp_file = Path(f"{json_file}.{os.getpid()}.tmp")
+    try:
+        with open(tmp_file, 'w', encoding='utf8') as f:
+            f.write(json.dumps(content, ensure_ascii=False, indent=2, sort_keys=True))
+    except BaseException:
+        if tmp_file.exists():
+            tmp_file.unlink()
+        raise
+    os.replace(tmp_file, json_file)
+
+
+def journal_file(metadata_file: Path) -> Path:
+    """Return the path of the append-only progress journal belonging to metadata_file."""
+    return metadata_file.with_suffix('.journal.jsonl')
+
+
+class JsonMetadataStore(MetadataStore):
+    """
+    Keep a target in one pretty-printed JSON document (`<target>-<source>.json`).
+    Updates of single entries go to an append-only journal next to it,
+    which is replayed on load and folded into the document by compact().
+    """
+    def __init__(self, metadata_file: Path) -> None:
+        self._metadata_file = metadata_file
+        self._lock = threading.Lock()  # keeps the records of concurrent updates apart
+
+    def exists(self) -> bool:
+        return self._metadata_file.is_file()
+
+    def create(self, run_configuration: tg.Dict) -> None:
+        _write_json(self._metadata_file, {"run_configuration": run_configuration, "state": {}, "corpus_metadata": []})
+
+    def _read(self, key: str) -> tg.Any:
+        """Return the value of key in the JSON document."""
+        try:
+            with open(self._metadata_file, 'r', encoding='utf8') as f:
+                file_content = json.load(f)
+        except OSError as e:
+            logger.error(repr(e))
+            logger.error('Error while loading metadata file.')
+            raise SystemExit()
+        try:
+            return file_content[key]
+        except KeyError:
+            logger.error(f"Metadata file {self._metadata_file} does not contain {key}.")
+            raise SystemExit()
+
+    def _write(self, key: str, value: tg.Any) -> None:
+        """Replace the value of key in the JSON document."""
+        try:
+            with open(self._metadata_file, 'r', encoding='utf8') as f:
+                file_content = json.load(f)
+            file_content[key] = value
+            _write_json(self._metadata_file, file_content)
+        except OSError as e:
+            logger.error(repr(e))
+            logger.error(f'Error while saving {key} to metadata file.')
+            raise SystemExit()
+
+    def run_configuration(self) -> tg.Dict:
+        return self._read('run_configuration')
+
+    def load_state(self) -> tg.Dict:
+        return self._read('state')
+
+    def save_state(self, state: tg.Dict) -> None:
+        self._write('state', state)
+
+    def load(self) -> tg.List[tg.Dict]:
+        metadata = self._read('corpus_metadata')
+        self._replay_journal(metadata)
+        return metadata
+
+    def save(self, entries: tg.List[tg.Dict]) -> None:
+        self._write('corpus_metadata', entries)
+
+    def update(self, key: str, by: str = 'identifier', **fields: tg.Any) -> None:
+        # fsynced, so the record survives a crash right after the call
+        record = {by: key, 'ts': time.time(), **fields}
+        with self._lock, open(journal_file(self._metadata_file), 'a', encoding='utf8') as f:
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        logger.debug(f'Journaled {record}')
+
+    def _read_journal(self) -> tg.List[tg.Dict]:
+        """Return all complete records of the journal, oldest first."""
+        records = []
+        try:
+            with open(journal_file(self._metadata_file), 'r', encoding='utf8') as f:
+                for line in f:
+                    try:
+                        records.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        # a crash in the middle of a write leaves a truncated last line
+                        logger.warning(f'Ignoring incomplete journal record {line!r}')
+        except FileNotFoundError:
+            pass
+        return records
+
+    def _replay_journal(self, metadata: tg.List[tg.Dict]) -> None:
+        """Apply the journal to the entries in metadata."""
+        records = self._read_journal()
+        if not records:
+            return
+        logger.debug(f'Replaying {len(records)} journal records.')
+        entries: tg.Dict[tg.Tuple[str, str], tg.List[tg.Dict]] = {}
+        for e in metadata:
+            for by in ('identifier', 'doi'):
+                if e.get(by):
+                    entries.setdefault((by, e[by]), []).append(e)
+        for record in records:
+            by = 'identifier' if 'identifier' in record else 'doi'
+            matches = entries.get((by, record.get(by)), [])
+            if not matches:
+                logger.warning(f'Journal record {record} matches no entry. Ignoring it.')
+            for entry in matches:
+                entry.update({k: v for k, v in record.items() if k not in (by, 'ts')})
+
+    def compact(self) -> None:
+        if not journal_file(self._metadata_file).is_file():
+            return
+        logger.debug(f'Compacting journal into {self._metadata_file}')
+        self.save(self.load())
+        journal_file(self._metadata_file).unlink()
+
+
+class SqliteMetadataStore(MetadataStore):
+    """
+    Keep a target in an SQLite database (`<target>-<source>.sqlite`) in WAL mode:
+    one row per entry, indexed by identifier and DOI, and every change in its own transaction,
+    so an update touches one row and several steps and threads can write at once.
+    """
+    def __init__(self, db_file: Path) -> None:
+        self._db_file = db_file
+        self._db: tg.Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        """Return the connection, opening the database on first use. Caller holds the lock."""
+        if self._db is None:
+            self._db = sqlite3.connect(str(self._db_file), check_same_thread=False, isolation_level=None)
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute('CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)')
+            self._db.execute('CREATE TABLE IF NOT EXISTS state (step TEXT PRIMARY KEY, done INTEGER)')
+            self._db.execute('CREATE TABLE IF NOT EXISTS entries ('
+                             'position INTEGER PRIMARY KEY, identifier TEXT, doi TEXT, data TEXT)')
+            self._db.execute('CREATE INDEX IF NOT EXISTS entries_identifier ON entries (identifier)')
+            self._db.execute('CREATE INDEX IF NOT EXISTS entries_doi ON entries (doi)')
+        return self._db
+
+    def _transaction(self, statements: tg.Callable[[sqlite3.Connection], tg.Any]) -> tg.Any:
+        """Run statements(connection) in one write transaction and return its result."""
+        with self._lock:
+            db = self._connection()
+            db.execute('BEGIN IMMEDIATE')
+            try:
+                result = statements(db)
+            except BaseException:
+                db.execute('ROLLBACK')
+                raise
+            db.execute('COMMIT')
+            return result
+
+    def _query(self, sql: str, params: tg.Tuple = ()) -> tg.List[tg.Tuple]:
+        with self._lock:
+            return self._connection().execute(sql, params).fetchall()
+
+    def exists(self) -> bool:
+        return self._db_file.is_file()
+
+    def create(self, run_configuration: tg.Dict) -> None:
+        self._transaction(lambda db: db.execute("INSERT OR REPLACE INTO meta VALUES ('run_configuration', ?)",
+                                                (json.dumps(run_configuration, ensure_ascii=False),)))
+
+    def run_configuration(self) -> tg.Dict:
+        rows = self._query("SELECT value FROM meta WHERE name = 'run_configuration'")
+        return json.loads(rows[0][0]) if rows else {}
+
+    def load_state(self) -> tg.Dict:
+        return {step: bool(done) for step, done in self._query('SELECT step, done FROM state')}
+
+    def save_state(self, state: tg.Dict) -> None:
+        def replace(db: sqlite3.Connection) -> None:
+            db.execute('DELETE FROM state')
+            db.executemany('INSERT INTO state VALUES (?, ?)', [(step, int(bool(done))) for step, done in state.items()])
+        self._transaction(replace)
+
+    def load(self) -> tg.List[tg.Dict]:
+        return [json.loads(data) for data, in self._query('SELECT data FROM entries ORDER BY position')]
+
+    def save(self, entries: tg.List[tg.Dict]) -> None:
+        rows = [(e.get('identifier'), e.get('doi'), json.dumps(e, ensure_ascii=False)) for e in entries]
+
+        def replace(db: sqlite3.Connection) -> None:
+            db.execute('DELETE FROM entries')
+            db.executemany('INSERT INTO entries (identifier, doi, data) VALUES (?, ?, ?)', rows)
+        self._transaction(replace)
+
+    def update(self, key: str, by: str = 'identifier', **fields: tg.Any) -> None:
+        if by not in ('identifier', 'doi'):
+            raise ValueError(f'Cannot look up entries by {by}')
+
+        def change(db: sqlite3.Connection) -> None:
+            rows = db.execute(f'SELECT position, data FROM entries WHERE {by} = ?', (key,)).fetchall()
+            if not rows:
+                logger.warning(f'Update {fields} of {by} {key} matches no entry. Ignoring it.')
+            for position, data in rows:
+                entry = json.loads(data)
+                entry.update(fields)
+                db.execute('UPDATE entries SET identifier = ?, doi = ?, data = ? WHERE position = ?',
+                           (entry.get('identifier'), entry.get('doi'), json.dumps(entry, ensure_ascii=False), position))
+        self._transaction(change)
+        logger.debug(f'Updated {by} {key} with {fields}')
+
+
+_stores: tg.Dict[Path, MetadataStore] = {}
+_stores_lock = threading.Lock()
+
+
+def open_store(metadata_file: Path) -> MetadataStore:
+    """Return the store kept in metadata_file, whose suffix selects the backend (see STORES)."""
+    key = Path(os.path.abspath(metadata_file))
+    with _stores_lock:
+        if key not in _stores:
+            if metadata_file.suffix == STORES['sqlite']:
+                _stores[key] = SqliteMetadataStore(metadata_file)
+            else:
+                _stores[key] = JsonMetadataStore(metadata_file)
+        return _stores[key]
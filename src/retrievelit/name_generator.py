@@ -4,24 +4,35 @@ import typing as tg
 from pathlib import Path
 
 from retrievelit import utils
+from retrievelit.name_registry import NameRegistry
 from retrievelit.pipeline_step import PipelineStep
 
 # from nltk.corpus import stopwords
 
 logger = logging.getLogger(__name__)
 
+# matches any symbols, but no alphanumeric chars, umlauts, etc.
+NON_WORD_CHARS = re.compile(r'[\W_]+')
+# same pattern as above, but excludes dashes
+NON_WORD_CHARS_EXCEPT_DASH = re.compile(r'(?!-)([\W_])')
+# suffixes tried in this order to make a name unique
+APPENDICES = ('',) + tuple(chr(i) for i in range(97, 123))
+
 class NameGenerator(PipelineStep):
     """
     Create filenames from authornames: Full lastname if there is only 1 author,
     otherwise three lastname starting letters of up to 3 authors.
     If append_keyword is given, add the first non-stopword title word. 
     """
+    # names are saved all at once at the end, but a rerun only names the entries still without one
+    idempotent = True
+
     def __init__(self, metadata_file: Path, existing_folders: tg.List[str], append_keyword: bool = False):
         self._metadata_file = metadata_file
         self._existing_folders = existing_folders
-        self._existing_names: tg.List = []
+        self._existing_names = NameRegistry()
         self._append_keyword = append_keyword
-        self._stopwords: tg.List = []
+        self._stopwords: tg.FrozenSet[str] = frozenset()
         self._metadata: tg.List = []
     
     def _load_stopwords(self) -> None:
@@ -30,40 +41,15 @@ class NameGenerator(PipelineStep):
         file_path = Path(__file__).with_name('stopwords.txt')
         with open(file_path, 'r') as f:
             stopwords_string = f.read()
-        self._stopwords = stopwords_string.split('\n')
-        logger.debug(f'Loaded stopwords {self._stopwords}.')
-
-    def _get_names_from_list(self, list_string: str) -> tg.List[str]:
-        """Extract and return the list of existing names from the filenames in list_string."""
-        names = list_string.split('\n')
-        # get identifier from path if not empty string (last new line)
-        list_names = [e.split('/')[1][:-4] for e in names if e]
-        logger.debug(f'Loaded names {list_names}')
-        return list_names
+        self._stopwords = frozenset(stopwords_string.split('\n'))
+        logger.debug(f'Loaded {len(self._stopwords)} stopwords.')
 
     def _load_existing_names(self) -> None:
-        """Load all existing names from the .list files in the existing folders."""
-        # No need to load names for this venue-volume target,
-        # since names are generated in one step, so if we get to here,
-        # we want to regenerate all names anyways.
+        """Load all existing names from the .list and metadata files in the existing folders."""
+        # the names already given in this venue-volume target come from its metadata (see run)
         logger.debug('Loading existing names.')
-        # TODO maybe pass both the folder paths as well as the target names from main, so we don't have the `metadata` folder name hardcoded here?
-        list_files = [Path(f'{folder}/metadata/{folder}-dblp.list') for folder in self._existing_folders]
-
-        for list_file in list_files:
-            logger.debug(f'Reading names from file {list_file}')
-
-            try:
-                with open(list_file, 'r') as f:
-                    list_string = f.read()
-            except FileNotFoundError:
-                logger.warn(f'File {list_file} not found. Skipping.')
-                continue
-
-            list_names = self._get_names_from_list(list_string)
-            self._existing_names.append(list_names)
-            logger.debug(f'Loaded names from file {list_file}.')
-        logger.debug('Finished loading existing names.')
+        self._existing_names.load_folders(self._existing_folders)
+        logger.debug(f'Finished loading {len(self._existing_names)} existing names.')
 
     def _generate_name(self, article: tg.Dict) -> str:
         """Generate and return the name (identifier) of an article."""
@@ -74,10 +60,7 @@ class NameGenerator(PipelineStep):
         # first 3 letters of last name of first 3 authors
         # if 1 author, full first word of last name
         author_part = ""
-        surnames = [name.split()[-1] for name in article['authors'][:3]]
-        # matches any symbols, but no alphanumeric chars, umlauts, etc.
-        pattern = re.compile('[\W_]+')
-        surnames = [re.sub(pattern, '', name) for name in surnames]
+        surnames = [NON_WORD_CHARS.sub('', name.split()[-1]) for name in article['authors'][:3]]
         if len(surnames) == 1:
             author_part += surnames[0]
         if len(surnames) > 1:
@@ -89,36 +72,49 @@ class NameGenerator(PipelineStep):
         if self._append_keyword:
             # titles such as "FACER: An API..." should lead to output "facer" (without ":")
             # while still keeping non-latin chars and dashes, so we strip of everything else
-            title = [e.lower() for e in article['title'].split()]
-            title_no_stopwords = [e for e in title if e not in self._stopwords]
-            # same pattern as above, but excludes dashes
-            pattern = re.compile('(?!-)([\W_])')
-            title_part = "-" + re.sub(pattern, '', title_no_stopwords[0])
+            title = article['title'].lower().split()
+            # a title consisting of stopwords only gets its first word
+            keyword = next((e for e in title if e not in self._stopwords), title[0])
+            title_part = "-" + NON_WORD_CHARS_EXCEPT_DASH.sub('', keyword)
         else:
             title_part = ""
-        appendices = [''] + [chr(i) for i in range(97,123)]
-        for e in appendices:
+        for e in APPENDICES:
             full_name = f"{author_part}{year_part}{e}{title_part}"
-            logger.debug(f'Checking name {full_name} for uniqueness.')
             if full_name not in self._existing_names:
-                logger.debug("Name is unique.")
+                logger.debug(f"Name {full_name} is unique.")
                 return full_name
-            logger.debug('Name not unique. Trying new name.')
         logger.error(f"No free name available. This should not happen. Check the log file for more information.")
         raise SystemExit()
 
-    def run(self) -> None:
-        """Generate the identifiers for all articles, respecting existing names in the provided folders of previous runs."""
-        if self._append_keyword:
+    def generate_names(self, articles: tg.Iterable[tg.Dict]) -> tg.List[str]:
+        """
+        Generate the names of all articles in one pass, in order.
+        Each name is unique among the existing names and those generated before it.
+        """
+        if self._append_keyword and not self._stopwords:
             self._load_stopwords()
+        names = []
+        for article in articles:
+            name = self._generate_name(article)
+            self._existing_names.add(name)
+            names.append(name)
+        return names
+
+    def run(self) -> None:
+        """
+        Generate the identifiers for all articles that have none yet, respecting existing names
+        in the provided folders of previous runs and the names already given in this corpus.
+        """
         logger.debug('Loading existing folders into namespace.')
         self._load_existing_names()
         self._metadata = utils.load_metadata(self._metadata_file)
-        logger.debug('Generating identifiers for publications.')
+        unnamed = [e for e in self._metadata if not e.get('identifier')]
         for e in self._metadata:
-            generated_name = self._generate_name(e)
+            if e.get('identifier'):
+                self._existing_names.add(e['identifier'])
+        logger.debug(f'Generating identifiers for {len(unnamed)} of {len(self._metadata)} publications.')
+        for e, generated_name in zip(unnamed, self.generate_names(unnamed)):
             e['identifier'] = generated_name
-            self._existing_names.append(generated_name)
         logger.debug('Identifiers generated.')
         utils.save_metadata(self._metadata_file, self._metadata)
 
@@ -0,0 +1,95 @@
+import json
+import logging
+import typing as tg
+from pathlib import Path
+
+from retrievelit import metadata_store
+
+logger = logging.getLogger(__name__)
+
+# remembers the names found in each folder, so unchanged folders need not be read again
+INDEX_FILE = '.retrievelit-names.json'
+
+
+class NameRegistry():
+    """
+    The set of identifiers taken by earlier corpora plus those added in this run.
+    Names of a corpus folder come from its .list file(s) and its metadata file(s).
+    """
+    def __init__(self, index_file: Path = Path(INDEX_FILE)) -> None:
+        self._names: tg.Set[str] = set()
+        self._index_file = index_file
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._names
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def add(self, name: str) -> None:
+        self._names.add(name)
+
+    def _source_files(self, folder: str) -> tg.List[Path]:
+        """Return the files of folder that may contain identifiers."""
+        metadata_dir = Path(folder, 'metadata')
+        # '{folder}.list' is what PdfDownloader writes, '{folder}-dblp.list' what older versions expected
+        candidates = [Path(metadata_dir, f'{folder}.list'), Path(metadata_dir, f'{folder}-dblp.list')]
+        candidates += sorted(metadata_dir.glob(f'{folder}-*.json')) + sorted(metadata_dir.glob(f'{folder}-*.sqlite'))
+        return [path for path in candidates if path.is_file()]
+
+    def _signature(self, files: tg.List[Path]) -> tg.List[tg.List]:
+        """Return what changes whenever one of files changes."""
+        # an SQLite store takes in changes in its write-ahead log first
+        files = files + [Path(f'{path}-wal') for path in files if path.suffix == '.sqlite']
+        return [[str(path), path.stat().st_mtime_ns, path.stat().st_size] for path in files if path.is_file()]
+
+    def _read_names(self, path: Path) -> tg.List[str]:
+        """Return the identifiers in a .list file or metadata file."""
+        logger.debug(f'Reading names from file {path}')
+        if path.suffix == '.sqlite':
+            metadata = metadata_store.open_store(path).load()
+            return [e['identifier'] for e in metadata if e.get('identifier')]
+        with open(path, 'r', encoding='utf8') as f:
+            if path.suffix == '.json':
+                metadata = json.load(f).get('corpus_metadata', [])
+                return [e['identifier'] for e in metadata if e.get('identifier')]
+            # one path per line such as 'EMSE-25/Smith20.pdf'
+            return [Path(line.strip()).stem for line in f if line.strip()]
+
+    def _load_index(self) -> tg.Dict[str, tg.Dict]:
+        try:
+            with open(self._index_file, 'r', encoding='utf8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.warning(f'Ignoring unreadable name index {self._index_file}: {e!r}')
+            return {}
+
+    def _save_index(self, index: tg.Dict[str, tg.Dict]) -> None:
+        with open(self._index_file, 'w', encoding='utf8') as f:
+            json.dump(index, f, ensure_ascii=False)
+        logger.debug(f'Updated name index {self._index_file}.')
+
+    def load_folders(self, folders: tg.Sequence[str]) -> None:
+        """Add the names used in folders, reading only folders that changed since they were last indexed."""
+        index = self._load_index()
+        index_changed = False
+        for folder in folders:
+            files = self._source_files(folder)
+            if not files:
+                logger.warning(f'No list or metadata file found in folder {folder}. Skipping.')
+                continue
+            signature = self._signature(files)
+            cached = index.get(folder)
+            if cached and cached['signature'] == signature:
+                names = cached['names']
+                logger.debug(f'Took {len(names)} names of {folder} from the name index.')
+            else:
+                names = sorted({name for path in files for name in self._read_names(path)})
+                index[folder] = {'signature': signature, 'names': names}
+                index_changed = True
+                logger.debug(f'Loaded {len(names)} names from {folder}.')
+            self._names.update(names)
+        if index_changed:
+            self._save_index(index)
@@ -1,27 +1,62 @@
+import json
 import logging
+import os
+import queue
 import random
-import time
+import shutil
+import threading
 import typing as tg
 import webbrowser
 from pathlib import Path
 
-from tqdm import tqdm
+import requests
 
+from retrievelit import async_engine
+from retrievelit import download_scheduler
+from retrievelit import http_client
+from retrievelit import throttle
 from retrievelit import utils
-from retrievelit.exceptions import PdfUrlNotFoundError
+from retrievelit.exceptions import DownloadCancelledError, PdfUrlNotFoundError
 from retrievelit.doi_pdf_mappers.base import DoiMapper, PDFDescriptor
 from retrievelit.pipeline_step import PipelineStep
 
-# seconds to wait between get requests (ignoring code execution time inbetween)
-REQUEST_DELAY = 1
+# bytes read at a time when streaming a PDF to disk
+CHUNK_SIZE = 64 * 1024
+# every PDF file starts like this
+PDF_MAGIC = b'%PDF-'
 
 logger = logging.getLogger(__name__)
 
+
+def _file_length(headers: tg.Mapping[str, str], offset: int) -> tg.Optional[int]:
+    """
+    Return the size of the whole file according to the headers of a response whose body starts at byte offset,
+    or None if they don't tell. A partial response names it at the end of its Content-Range
+    ('bytes 100-199/200'), unless the server does not know it ('bytes 100-199/*').
+    """
+    total = headers.get('Content-Range', '').rpartition('/')[2].strip()
+    if offset and total.isdigit():
+        return int(total)
+    length = headers.get('Content-Length', '').strip()
+    return offset + int(length) if length.isdigit() else None
+
+
 class PdfDownloader(PipelineStep):
-    """Download the article PDFs and write the filepath to the list file."""
+    """
+    Download the article PDFs and write the filepath to the list file.
+    Browser downloads start `maxwait` seconds apart, with up to `window` of them in flight.
+    Direct downloads run on `workers` threads, starting the mapper's `politeness` seconds apart per host;
+    with the asyncio engine, all of them are started at once and `workers` is the limit per host.
+    Either interval then adapts to how the host copes (see throttle.py).
+    """
+    idempotent = True
+    incremental = True  # each finished download is journaled
+
     def __init__(self, metadata_file: Path, doi_pdf_mapper: DoiMapper, 
                  target_dir: Path, list_file: Path, 
-                 samplesize: tg.Optional[int], maxwait: int, downloaddir: str):
+                 samplesize: tg.Optional[int], maxwait: int, downloaddir: str,
+                 direct: bool = False, workers: int = 1, downloadtimeout: float = 600, window: int = 1,
+                 engine: str = 'threads'):
         self._metadata_file = metadata_file
         self._mapper = doi_pdf_mapper
         self._target_dir = target_dir
@@ -29,8 +64,13 @@ class PdfDownloader(PipelineStep):
         self._samplesize = samplesize
         self._maxwait = max(4, maxwait)
         self._downloaddir = downloaddir
+        self._downloadtimeout = downloadtimeout
+        self._window = max(1, window)
+        self._workers = max(1, workers)
+        self._engine = engine
         self._metadata: tg.List = []
-        self._use_webbrowser = self._webbrowser_required()
+        self._stop = threading.Event()  # tells running direct downloads to give up
+        self._use_webbrowser = not direct and self._webbrowser_required()
 
     def _get_sample(self, samplesize: tg.Optional[int], metadata: tg.Mapping[str, tg.Any]) -> tg.Mapping[str, tg.Any]:
         if samplesize is None:
@@ -41,56 +81,228 @@ class PdfDownloader(PipelineStep):
 
     def _webbrowser_required(self) -> bool:
         """Check if the target requires download through webbrowser, based on the selected mapper."""
-        if getattr(self._mapper, 'get_pdfdescriptor'):
+        if self._mapper.has_pdfdescriptor():
             logger.debug(f"Mapper suggests download by the webbrowser module.")
             return True
         else:
             logger.debug(f"Target will be downloaded by direct GET requests.")
             return False
 
-    def _get_pdf_data(self, pdf_url: str) -> bytes:
-        r = utils.make_get_request(pdf_url, REQUEST_DELAY)
+    def _get_pdfdescriptor(self, entry: tg.Dict) -> PDFDescriptor:
+        """Return the descriptor the metadata step stored in entry or, failing that, ask the mapper."""
+        if entry.get('pdf_url') and entry.get('pdf_filename'):
+            return PDFDescriptor(entry['pdf_url'], entry['pdf_filename'])
+        return self._mapper.get_pdfdescriptor(entry['doi'])
+
+    def _no_pdf_data(self) -> tg.NoReturn:
+        logger.error("Resonse from PDF URL didn't contain PDF data. This might be because your IP doesn't have access. Check the logs to see the URL and manually open it to debug.")
+        raise SystemExit()
+
+    def _check_content_type(self, r: requests.Response) -> None:
+        """Make sure the response announces PDF data before its body is read."""
         content_type = r.headers.get('Content-Type')
         if content_type is None or 'application/pdf' not in content_type:
-            logger.error("Resonse from PDF URL didn't contain PDF data. This might be because your IP doesn't have access. Check the logs to see the URL and manually open it to debug.")
-            raise SystemExit()
-        return r.content
+            self._no_pdf_data()
 
-    def _store_pdf(self, pdf_data: bytes, pdf_path: Path) -> None:
-        """Write pdf_data to a file."""
-        with open(pdf_path, 'wb') as f:
-            f.write(pdf_data)
-        logger.debug(f'Wrote PDF to file {pdf_path}')
-    
-    def _download_pdf_with_requests(self, pdf_url: str, pdf_path: Path) -> None:
-        """Use requests to download the PDF and store it in `filename`."""
-        pdf_data = self._get_pdf_data(pdf_url)
-        self._store_pdf(pdf_data, pdf_path)
+    def _resume_point(self, pdf_url: str, part_path: Path, info_path: Path) -> tg.Tuple[int, tg.Optional[str]]:
+        """
+        Return how many bytes of an earlier download of pdf_url can be reused from part_path
+        and the validator (ETag or Last-Modified) the server must still match for that.
+        """
+        if not part_path.is_file() or not info_path.is_file():
+            return 0, None
+        with open(info_path, 'r', encoding='utf8') as f:
+            info = json.load(f)
+        validator = info.get('etag') or info.get('last_modified')
+        if info.get('url') != pdf_url or not validator:
+            return 0, None
+        return part_path.stat().st_size, validator
+
+    def _save_part_info(self, pdf_url: str, r: requests.Response, info_path: Path,
+                        length: tg.Optional[int]) -> None:
+        """Record what is needed to resume the download of pdf_url later."""
+        etag = r.headers.get('ETag')
+        info = {
+            'url': pdf_url,
+            'etag': etag if etag and not etag.startswith('W/') else None,  # If-Range needs a strong ETag
+            'last_modified': r.headers.get('Last-Modified'),
+            'length': length,
+        }
+        with open(info_path, 'w', encoding='utf8') as f:
+            json.dump(info, f)
+
+    def _remove_part(self, part_path: Path, info_path: Path) -> None:
+        for path in (part_path, info_path):
+            if path.exists():
+                path.unlink()
+
+    def _store_pdf(self, r: requests.Response, part_path: Path, mode: str) -> None:
+        """Write the body of the streamed response r to part_path chunk by chunk."""
+        with open(part_path, mode) as f:
+            for chunk in r.iter_content(CHUNK_SIZE):
+                self._write_chunk(f, chunk, part_path)
+        logger.debug(f'Wrote PDF data to file {part_path}')
+
+    def _write_chunk(self, f: tg.BinaryIO, chunk: bytes, part_path: Path) -> None:
+        """Append the next chunk of PDF data to the open .part file f, unless the download should stop."""
+        if self._stop.is_set():
+            raise DownloadCancelledError(f'Stopped writing {part_path} at byte {f.tell()}.')
+        if f.tell() == 0 and not chunk.startswith(PDF_MAGIC[:len(chunk)]):
+            self._no_pdf_data()  # don't bother downloading the rest
+        f.write(chunk)
+
+    def _verify_pdf(self, part_path: Path, length: tg.Optional[int]) -> bool:
+        """Check that the downloaded file is complete and looks like a PDF."""
+        size = part_path.stat().st_size
+        if length is not None and size != length:
+            logger.error(f'{part_path} has {size} bytes, but the server announced {length}.')
+            return False
+        with open(part_path, 'rb') as f:
+            if f.read(len(PDF_MAGIC)) != PDF_MAGIC:
+                logger.error(f'{part_path} does not start like a PDF file.')
+                return False
+        return True
+
+    def _download_pdf_with_requests(self, pdf_url: str, pdf_path: Path, reserved: bool = False) -> None:
+        """
+        Use requests to download the PDF and store it in `pdf_path`
+        (in the throttle slot the caller has reserved, if reserved).
+        The data goes to a .part file first, which gets its final name only once it is complete.
+        If an earlier attempt left a .part file behind, only the missing rest is requested
+        (with a Range request) as long as the server confirms the file has not changed.
+        """
+        part_path = pdf_path.with_name(f'{pdf_path.name}.part')
+        info_path = pdf_path.with_name(f'{pdf_path.name}.part.json')
+        offset, validator = self._resume_point(pdf_url, part_path, info_path)
+        # byte ranges must refer to the file itself, not to a compressed encoding of it
+        headers = {'Accept-Encoding': 'identity'}
+        if offset:
+            headers.update({'Range': f'bytes={offset}-', 'If-Range': validator})
+        with http_client.get(pdf_url, stream=True, headers=headers, reserved=reserved) as r:
+            if r.status_code == 416:  # nothing left to request or the .part file is bogus
+                logger.debug(f'Server refused range request for {pdf_url}. Starting over.')
+                self._remove_part(part_path, info_path)
+                return self._download_pdf_with_requests(pdf_url, pdf_path)
+            try:
+                r.raise_for_status()
+            except requests.HTTPError as e:
+                logger.error(f'Bad Reponse from GET requests. {e}')
+                raise SystemExit()
+            try:
+                self._check_content_type(r)
+            except SystemExit:
+                throttle.feedback(pdf_url, healthy=False)
+                raise
+            if r.status_code == 206:
+                logger.info(f'Resuming download of {pdf_path} at byte {offset}.')
+                mode = 'ab'
+                length = _file_length(r.headers, offset)
+            else:
+                mode = 'wb'
+                length = _file_length(r.headers, 0)
+                self._save_part_info(pdf_url, r, info_path, length)
+            try:
+                self._store_pdf(r, part_path, mode)
+            except SystemExit:
+                throttle.feedback(pdf_url, healthy=False)
+                self._remove_part(part_path, info_path)
+                raise
+            # anything else (interruption, network error) keeps the .part file for resumption
+        if not self._verify_pdf(part_path, length):
+            self._remove_part(part_path, info_path)
+            raise SystemExit()
+        os.replace(part_path, pdf_path)
+        info_path.unlink()
+        logger.debug(f'Moved {part_path} to {pdf_path}')
     
-    def _download_pdf_with_webbrowser(self, pdfdescriptor: PDFDescriptor, pdf_targetfilename: Path,
-                                      download_dir: Path) -> None:
-        """Use the webbrowser module to download the PDF and store it in `filename`."""
-        def is_download_finished(file: Path) -> bool:
-            """Check if the PDF file download can be assumed to be complete."""
-            size_old = file.stat().st_size
-            time.sleep(2)
-            size_new = file.stat().st_size
-            logger.debug(f"Size of file {str(file)}: old: {size_old}, new: {size_new}.")
-            return size_old == size_new
-
-        pdf_file = Path(download_dir, pdfdescriptor.filename)
-        
+    async def _download_pdf_async(self, pdf_url: str, pdf_path: Path, client: tg.Any) -> None:
+        """The same as _download_pdf_with_requests, but through the AsyncHttpClient client."""
+        part_path = pdf_path.with_name(f'{pdf_path.name}.part')
+        info_path = pdf_path.with_name(f'{pdf_path.name}.part.json')
+        offset, validator = self._resume_point(pdf_url, part_path, info_path)
+        headers = {'Accept-Encoding': 'identity'}
+        if offset:
+            headers.update({'Range': f'bytes={offset}-', 'If-Range': validator})
+        async with client.request('GET', pdf_url, headers=headers) as r:
+            range_refused = r.status == 416
+            if not range_refused:
+                if r.status >= 400:
+                    logger.error(f'Bad Reponse from GET requests. {r.status} {r.reason} for url: {pdf_url}')
+                    raise SystemExit()
+                try:
+                    self._check_content_type(r)
+                except SystemExit:
+                    throttle.feedback(pdf_url, healthy=False)
+                    raise
+                if r.status == 206:
+                    logger.info(f'Resuming download of {pdf_path} at byte {offset}.')
+                    mode = 'ab'
+                    length = _file_length(r.headers, offset)
+                else:
+                    mode = 'wb'
+                    length = _file_length(r.headers, 0)
+                    self._save_part_info(pdf_url, r, info_path, length)
+                try:
+                    with open(part_path, mode) as f:
+                        async for chunk in r.content.iter_chunked(CHUNK_SIZE):
+                            self._write_chunk(f, chunk, part_path)
+                except SystemExit:
+                    throttle.feedback(pdf_url, healthy=False)
+                    self._remove_part(part_path, info_path)
+                    raise
+        if range_refused:  # once the host's slot is free again
+            logger.debug(f'Server refused range request for {pdf_url}. Starting over.')
+            self._remove_part(part_path, info_path)
+            return await self._download_pdf_async(pdf_url, pdf_path, client)
+        if not self._verify_pdf(part_path, length):
+            self._remove_part(part_path, info_path)
+            raise SystemExit()
+        os.replace(part_path, pdf_path)
+        info_path.unlink()
+        logger.debug(f'Moved {part_path} to {pdf_path}')
+
+    def set_pace(self, host: str) -> None:
+        """Set the starting interval between downloads from host."""
+        if self._use_webbrowser:
+            # replaces pausing for 0.25*maxwait..maxwait: start at maxwait, speed up while downloads go well
+            throttle.set_interval(host, self._maxwait)
+        else:
+            throttle.set_interval(host, self._mapper.politeness)
+
+    def open_in_webbrowser(self, pdfdescriptor: PDFDescriptor) -> None:
+        """Ask the webbrowser to download the PDF into the download directory."""
+        throttle.wait(pdfdescriptor.download_url)
         logger.debug(f"Opening {pdfdescriptor.download_url} in browser.")
         webbrowser.open(pdfdescriptor.download_url, 0)
-        # keep this order and no parantheses to take advantage of lazy evaluation:
-        while not pdf_file.is_file() or not is_download_finished(pdf_file):
-            logger.debug(f"Download of file {pdf_file} is not finished.")
-            time.sleep(2)
 
+    def collect_download(self, entry: tg.Dict, pdfdescriptor: PDFDescriptor) -> Path:
+        """Move the PDF the webbrowser has finished downloading to the target folder and return its new path."""
+        pdf_file = Path(self._downloaddir, pdfdescriptor.filename)
         logger.debug(f"Finished downloading file {pdf_file}.")
-        new_path = Path(Path(), pdf_targetfilename)
+        throttle.feedback(pdfdescriptor.download_url, healthy=True)
+        new_path = self._pdf_path(entry)
         logger.debug(f"Moving and renaming file to {new_path}.")
-        pdf_file.rename(new_path)
+        shutil.move(str(pdf_file), str(new_path))  # the download dir may be on another file system
+        return new_path
+
+    def download_directly(self, entry: tg.Dict, pdfdescriptor: PDFDescriptor, reserved: bool = False) -> Path:
+        """
+        Download the PDF of entry by a GET request and return its path.
+        With reserved, the caller has reserved the throttle slot for the request (see throttle.reserve).
+        """
+        pdf_path = self._pdf_path(entry)
+        self._download_pdf_with_requests(pdfdescriptor.download_url, pdf_path, reserved)
+        return pdf_path
+
+    async def download_directly_async(self, entry: tg.Dict, pdfdescriptor: PDFDescriptor, client: tg.Any) -> Path:
+        """Download the PDF of entry through the asyncio engine's client and return its path."""
+        pdf_path = self._pdf_path(entry)
+        await self._download_pdf_async(pdfdescriptor.download_url, pdf_path, client)
+        return pdf_path
+
+    def cancel(self) -> None:
+        """Make running direct downloads stop after their current chunk, keeping their .part files."""
+        self._stop.set()
         
     def _add_to_list(self, pdf_path: Path) -> None:
         """Append the pdf filepath to the list file."""
@@ -98,50 +310,103 @@ class PdfDownloader(PipelineStep):
             f.write(f'{pdf_path.as_posix()}\n')
         logger.debug(f'Added {pdf_path} to {self._list_file}.')
 
-    def run(self) -> None:
-        """Run the full PDF download process."""
-        self._metadata = utils.load_metadata(self._metadata_file)
-
-        logger.info('Starting PDF download. This may take a while for each PDF.')
+    @property
+    def uses_webbrowser(self) -> bool:
+        return self._use_webbrowser
 
-        for entry in tqdm(self._get_sample(self._samplesize, self._metadata)):
+    @property
+    def target_dir(self) -> Path:
+        return self._target_dir
 
+    def pending_entries(self, metadata: tg.List[tg.Dict]) -> tg.List[tg.Dict]:
+        """Return the sampled entries of metadata whose PDF is still missing and can be downloaded."""
+        pending = []
+        for entry in self._get_sample(self._samplesize, metadata):
             if entry.get('pdf'):
                 logger.debug(f'PDF already downloaded for entry {entry}. Skipping.')
                 continue
-
-            # get doi parameter from entry
-            doi_parameter = entry.get('doi')
-            if not doi_parameter:
+            if not entry.get('doi'):
                 logger.warning(f"No DOI provided in entry {entry}. Skipping.")
                 continue
-            
-            # get pdf url from mapper
-            try:
-                if self._use_webbrowser:
-                    pdfdescriptor = self._mapper.get_pdfdescriptor(doi_parameter)
-                else:
-                    pdf_dl_url = self._mapper.get_pdf_url(doi_parameter)
-            except PdfUrlNotFoundError as e:
-                logger.warning(repr(e))
-                logger.warning(f"No pdf URL found for DOI {doi_parameter}. Skipping. If this reoccurs, check if you have access to this publication.")
-                continue
-            
-            # generate filename
             if not entry.get('identifier'):
                 logger.warning(f'No identifier found in entry {entry}. Skipping.')
                 continue
-            pdf_path = Path(self._target_dir, f"{entry.get('identifier')}.pdf")
-            
+            pending.append(entry)
+        return pending
+
+    def pending_downloads(self) -> tg.List[tg.Tuple[tg.Dict, PDFDescriptor]]:
+        """
+        Load the metadata and return the entries whose PDF is still to be downloaded, each with
+        the descriptor of its PDF (the filename is None for direct downloads).
+        """
+        self._metadata = utils.load_metadata(self._metadata_file)
+        downloads = []
+        for entry in self.pending_entries(self._metadata):
+            pdfdescriptor = self.download_descriptor(entry)
+            if pdfdescriptor is not None:
+                downloads.append((entry, pdfdescriptor))
+        return downloads
+
+    def download_descriptor(self, entry: tg.Dict) -> tg.Optional[PDFDescriptor]:
+        """
+        Return the descriptor of the PDF of entry (the filename is None for direct downloads)
+        or None if there is no PDF URL for it.
+        """
+        try:
             if self._use_webbrowser:
-                self._download_pdf_with_webbrowser(pdfdescriptor, pdf_path, self._downloaddir)
-            else:
-                self._download_pdf_with_requests(pdf_dl_url, pdf_path)
-            time.sleep(random.uniform(0.25*self._maxwait, self._maxwait))
-
-            # this might lead to duplicate entries in the .list file
-            # since it can get interrupted between appending to list file and saving the state
-            # so we would append twice (can read in first and add to set if needed to combat this)
-            self._add_to_list(pdf_path)
-            entry['pdf'] = True
-            utils.save_metadata(self._metadata_file, self._metadata)
+                return self._get_pdfdescriptor(entry)
+            return PDFDescriptor(entry.get('pdf_url') or self._mapper.get_pdf_url(entry['doi']), None)
+        except PdfUrlNotFoundError as e:
+            self._warn_no_pdf_url(entry, e)
+            return None
+
+    def _pdf_path(self, entry: tg.Dict) -> Path:
+        return Path(self._target_dir, f"{entry['identifier']}.pdf")
+
+    def _warn_no_pdf_url(self, entry: tg.Dict, e: PdfUrlNotFoundError) -> None:
+        logger.warning(repr(e))
+        logger.warning(f"No pdf URL found for DOI {entry['doi']}. Skipping. If this reoccurs, check if you have access to this publication.")
+
+    def record_download(self, entry: tg.Dict, pdf_path: Path) -> None:
+        """Note in list file and journal that the PDF of entry is at pdf_path."""
+        # this might lead to duplicate entries in the .list file
+        # since it can get interrupted between appending to list file and saving the state
+        # so we would append twice (can read in first and add to set if needed to combat this)
+        self._add_to_list(pdf_path)
+        entry['pdf'] = True
+        utils.append_to_journal(self._metadata_file, entry['identifier'], pdf=True)
+
+    def _create_scheduler(self) -> download_scheduler.DownloadScheduler:
+        return download_scheduler.DownloadScheduler(Path(self._downloaddir), self._workers,
+                                                    self._window, self._downloadtimeout)
+
+    def download_from(self, feed: 'queue.Queue[tg.Optional[tg.Tuple[tg.Dict, PDFDescriptor]]]') -> None:
+        """
+        Like run(), but download the PDFs of the (entry, descriptor) pairs put into feed
+        while they arrive, until None is put.
+        """
+        logger.info('Starting PDF download while the DOIs are resolved.')
+        scheduler = self._create_scheduler()
+        scheduler.stream(self, feed)
+        scheduler.run()
+        self._finish(scheduler.finished(self))
+
+    def _finish(self, finished: bool) -> None:
+        """Report how the hosts coped and fail the step unless all PDFs could be downloaded."""
+        throttle.report()
+        if not finished:
+            # leave the step unfinished, so that the next run tries the missing PDFs again
+            logger.error('Not all PDFs could be downloaded. Run the same command again to retry them.')
+            raise SystemExit()
+
+    def run(self) -> None:
+        """Run the full PDF download process."""
+        logger.info('Starting PDF download. This may take a while for each PDF.')
+        if self._engine == 'asyncio' and not self._use_webbrowser:
+            finished = async_engine.download_pdfs(self, self._workers)
+        else:
+            scheduler = self._create_scheduler()
+            scheduler.add(self)
+            scheduler.run()
+            finished = scheduler.finished(self)
+        self._finish(finished)
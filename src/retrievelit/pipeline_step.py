@@ -1,7 +1,16 @@
 from abc import ABC, abstractmethod
 
 class PipelineStep(ABC):
-    
+    """
+    A step of the DownloaderPipeline.
+    Steps declare how they cope with a run that was interrupted in the middle of them:
+    an idempotent step may simply be run again from the start;
+    an incremental step records the progress of each entry as it goes (see utils.append_to_journal)
+    and, when run again, only processes the entries that are not done yet.
+    """
+    idempotent = False
+    incremental = False
+
     @abstractmethod
     def run(self) -> None:
         pass
\ No newline at end of file
@@ -0,0 +1,134 @@
+import dataclasses
+import json
+import logging
+import sqlite3
+import threading
+import time
+import typing as tg
+from pathlib import Path
+
+from retrievelit.doi_pdf_mappers.base import DoiMapper, PDFDescriptor
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL_DAYS = 30
+DEFAULT_MAX_ENTRIES = 200_000
+# check the size limit only every so many insertions, as counting rows is not free
+EVICTION_CHECK_INTERVAL = 1000
+
+
+class ResolutionCache():
+    """
+    Persistent store of mapper results, keyed by (mapper, doi).
+    Entries expire after `ttl_days`; beyond `max_entries` the oldest ones are evicted.
+    Safe to use from several threads and, thanks to SQLite, from several processes.
+    """
+    def __init__(self, path: Path, ttl_days: float = DEFAULT_TTL_DAYS,
+                 max_entries: int = DEFAULT_MAX_ENTRIES) -> None:
+        self._path = path
+        self._ttl = ttl_days * 24 * 3600
+        self._max_entries = max_entries
+        self._insertions = 0
+        self._lock = threading.Lock()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        logger.debug(f'Opening DOI resolution cache {path}')
+        self._db = sqlite3.connect(str(path), check_same_thread=False, isolation_level=None)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('CREATE TABLE IF NOT EXISTS resolutions ('
+                         'mapper TEXT, doi TEXT, value TEXT, created REAL, PRIMARY KEY (mapper, doi))')
+        self._db.execute('CREATE INDEX IF NOT EXISTS resolutions_created ON resolutions (created)')
+
+    def get(self, mapper: str, doi: str) -> tg.Optional[str]:
+        """Return the cached value for (mapper, doi) or None if there is no fresh one."""
+        with self._lock:
+            row = self._db.execute('SELECT value FROM resolutions WHERE mapper = ? AND doi = ? AND created > ?',
+                                   (mapper, doi, time.time() - self._ttl)).fetchone()
+        return row[0] if row else None
+
+    def put(self, mapper: str, doi: str, value: str) -> None:
+        """Store value for (mapper, doi), replacing any older value."""
+        with self._lock:
+            self._db.execute('INSERT OR REPLACE INTO resolutions VALUES (?, ?, ?, ?)',
+                             (mapper, doi, value, time.time()))
+            self._insertions += 1
+            if self._insertions % EVICTION_CHECK_INTERVAL == 0:
+                self._evict()
+
+    def _evict(self) -> None:
+        """Remove expired entries and the oldest ones beyond the size limit. Caller holds the lock."""
+        self._db.execute('DELETE FROM resolutions WHERE created <= ?', (time.time() - self._ttl,))
+        self._db.execute('DELETE FROM resolutions WHERE rowid NOT IN '
+                         '(SELECT rowid FROM resolutions ORDER BY created DESC LIMIT ?)', (self._max_entries,))
+        logger.debug('Evicted old entries from DOI resolution cache.')
+
+
+class CachedMapper():
+    """
+    Wrap a DoiMapper such that its results are looked up in and stored to a ResolutionCache.
+    When `offline`, the wrapped mapper is never asked; DOIs missing from the cache get no PDF URL.
+    """
+    def __init__(self, mapper: DoiMapper, cache: ResolutionCache, offline: bool = False) -> None:
+        self._mapper = mapper
+        self._cache = cache
+        self._offline = offline
+
+    def __getattr__(self, name: str) -> tg.Any:
+        # everything except the two mapping methods is the wrapped mapper's business
+        return getattr(self._mapper, name)
+
+    def _key(self, method: str) -> str:
+        return f"{type(self._mapper).__name__}.{method}"
+
+    def prefetch(self, dois: tg.Sequence[str]) -> None:
+        if self._offline:
+            return
+        key = self._key('get_pdfdescriptor')
+        self._mapper.prefetch([doi for doi in dois if self._cache.get(key, doi) is None])
+
+    @property
+    def wrapped(self) -> DoiMapper:
+        return self._mapper
+
+    def cached_descriptor(self, doi: str, with_filename: bool) -> tg.Optional[PDFDescriptor]:
+        """
+        Return the cached result of get_pdfdescriptor (with_filename) or get_pdf_url for doi,
+        the latter as a descriptor without filename, or None if there is none.
+        """
+        if with_filename:
+            value = self._cache.get(self._key('get_pdfdescriptor'), doi)
+            return PDFDescriptor(**json.loads(value)) if value is not None else None
+        url = self._cache.get(self._key('get_pdf_url'), doi)
+        return PDFDescriptor(url, None) if url is not None else None
+
+    def store_descriptor(self, doi: str, descriptor: PDFDescriptor, with_filename: bool) -> None:
+        """Cache descriptor as the result of get_pdfdescriptor (with_filename) or get_pdf_url for doi."""
+        if with_filename:
+            self._cache.put(self._key('get_pdfdescriptor'), doi, json.dumps(dataclasses.asdict(descriptor)))
+        else:
+            self._cache.put(self._key('get_pdf_url'), doi, descriptor.download_url)
+
+    def _offline_miss(self, doi: str) -> PDFDescriptor:
+        logger.warning(f'No cached PDF URL for {doi}; it stays without one as we are offline.')
+        return PDFDescriptor(None, None)
+
+    def get_pdf_url(self, doi: str) -> str:
+        cached = self.cached_descriptor(doi, with_filename=False)
+        if cached is None and self._offline:
+            return self._offline_miss(doi).download_url
+        if cached is None:
+            url = self._mapper.get_pdf_url(doi)
+            self.store_descriptor(doi, PDFDescriptor(url, None), with_filename=False)
+            return url
+        logger.debug(f'Cached PDF URL for {doi}: {cached.download_url}')
+        return cached.download_url
+
+    def get_pdfdescriptor(self, doi: str) -> PDFDescriptor:
+        descriptor = self.cached_descriptor(doi, with_filename=True)
+        if descriptor is None and self._offline:
+            return self._offline_miss(doi)
+        if descriptor is None:
+            descriptor = self._mapper.get_pdfdescriptor(doi)
+            self.store_descriptor(doi, descriptor, with_filename=True)
+        else:
+            logger.debug(f'Cached PDF descriptor for {doi}: {descriptor}')
+        return descriptor
@@ -0,0 +1,71 @@
+import logging
+import sqlite3
+import threading
+import time
+import typing as tg
+import zlib
+from pathlib import Path
+
+from retrievelit import http_client
+
+logger = logging.getLogger(__name__)
+
+
+class ResponseCache():
+    """
+    Persistent store of the bodies of GET responses, keyed by URL and compressed with zlib.
+    A stored response is revalidated with If-None-Match/If-Modified-Since when it is requested again,
+    so an unchanged resource costs a 304 instead of its body.
+    When `offline`, responses are served from the store only and nothing is requested.
+    Safe to use from several threads and, thanks to SQLite, from several processes.
+    """
+    def __init__(self, path: Path, offline: bool = False) -> None:
+        self._path = path
+        self._offline = offline
+        self._lock = threading.Lock()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        logger.debug(f'Opening HTTP response cache {path}')
+        self._db = sqlite3.connect(str(path), check_same_thread=False, isolation_level=None)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('CREATE TABLE IF NOT EXISTS responses ('
+                         'url TEXT PRIMARY KEY, body BLOB, etag TEXT, last_modified TEXT, validated REAL)')
+
+    @property
+    def offline(self) -> bool:
+        return self._offline
+
+    def _lookup(self, url: str) -> tg.Optional[tg.Tuple[bytes, tg.Optional[str], tg.Optional[str]]]:
+        with self._lock:
+            row = self._db.execute('SELECT body, etag, last_modified FROM responses WHERE url = ?',
+                                   (url,)).fetchone()
+        return (zlib.decompress(row[0]), row[1], row[2]) if row else None
+
+    def _store(self, url: str, body: bytes, etag: tg.Optional[str], last_modified: tg.Optional[str]) -> None:
+        with self._lock:
+            self._db.execute('INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)',
+                             (url, zlib.compress(body), etag, last_modified, time.time()))
+
+    def get(self, url: str) -> bytes:
+        """Return the body of a successful GET request to url, from the cache if it is still valid there."""
+        cached = self._lookup(url)
+        if self._offline:
+            if cached is None:
+                logger.error(f"{url} is not in the response cache {self._path}. Run once without --offline.")
+                raise SystemExit()
+            logger.debug(f'Serving {url} from the response cache.')
+            return cached[0]
+        headers = {}
+        if cached is not None:
+            _, etag, last_modified = cached
+            if etag:
+                headers['If-None-Match'] = etag
+            if last_modified:
+                headers['If-Modified-Since'] = last_modified
+        r = http_client.get(url, headers=headers)
+        if r.status_code == 304 and cached is not None:
+            logger.debug(f'{url} is unchanged, serving it from the response cache.')
+            self._store(url, cached[0], r.headers.get('ETag', cached[1]), r.headers.get('Last-Modified', cached[2]))
+            return cached[0]
+        r.raise_for_status()
+        self._store(url, r.content, r.headers.get('ETag'), r.headers.get('Last-Modified'))
+        return r.content
@@ -1,8 +1,9 @@
 import logging
-import json
 from pathlib import Path
 import typing as tg
 
+from retrievelit import metadata_store
+
 logger = logging.getLogger(__name__)
 
 class Setup():
@@ -14,13 +15,7 @@ class Setup():
 
     def _create_metadata_file(self) -> None:
         """Create a new metadata file in the target directory."""
-        content = {
-            "run_configuration": self._run_config,
-            "state": {},
-            "corpus_metadata": []
-        }
-        with open(self._metadata_file, 'w', encoding="utf8") as f:
-            f.write(json.dumps(content, ensure_ascii=False, indent=2, sort_keys=True))
+        metadata_store.open_store(self._metadata_file).create(self._run_config)
         logger.info(f'Created new metadata file at {self._metadata_file}.')
 
     def run(self) -> None:
@@ -28,7 +23,7 @@ class Setup():
         logger.info('Setting up folder and metadata structure.')
         logger.info(f"Creating target and metadata folder at {self._metadata_dir} if they don't exist.")
         self._metadata_dir.mkdir(exist_ok=True, parents=True)
-        if not self._metadata_file.is_file():
+        if not metadata_store.open_store(self._metadata_file).exists():
             logger.info('Creating metadata file.')
             self._create_metadata_file()
         else:
@@ -0,0 +1,144 @@
+import concurrent.futures
+import logging
+import queue
+import threading
+import typing as tg
+from pathlib import Path
+
+from retrievelit import utils
+from retrievelit.downloader_pipeline import DownloaderPipeline
+from retrievelit.metadata_downloader import MetadataDownloader
+from retrievelit.pdf_downloader import PdfDownloader
+
+logger = logging.getLogger(__name__)
+
+# resolved PDFs that may wait for the PdfDownloader; DOI resolution pauses while that many do
+FEED_SIZE = 16
+# seconds to wait for room in the feed at a time before checking whether to give up
+PUT_SLICE = 0.5
+
+
+def _put(feed: queue.Queue, item: tg.Any, stop: threading.Event) -> None:
+    """Put item into feed, waiting while it is full, unless stop is set meanwhile."""
+    while not stop.is_set():
+        try:
+            feed.put(item, timeout=PUT_SLICE)
+            return
+        except queue.Full:
+            pass
+
+
+class StreamingPipeline(DownloaderPipeline):
+    """
+    A DownloaderPipeline that starts downloading PDFs while the DOIs are still being resolved.
+    The metadata is retrieved and the steps in between (names, BibTeX) run on the whole corpus first,
+    as they don't need the PDF URLs and the names must not depend on the order in which DOIs resolve.
+    Then the DOIs are resolved on `resolve_workers` threads of the MetadataDownloader,
+    and each PDF to download goes to the PdfDownloader through a bounded queue as soon as its URL is known;
+    while that queue is full, the resolution pauses.
+    Both steps journal every entry as usual, so an interrupted run is resumed by any pipeline.
+    """
+    def __init__(self, metadata_file: Path, feed_size: int = FEED_SIZE) -> None:
+        super().__init__(metadata_file)
+        self._feed_size = feed_size
+        self._errors: tg.List[BaseException] = []
+
+    def run(self) -> None:
+        """Execute the pipeline, overlapping DOI resolution and PDF download (see class docstring)."""
+        fetcher, downloader = self._steps[0], self._steps[-1]
+        if not (isinstance(fetcher, MetadataDownloader) and isinstance(downloader, PdfDownloader)):
+            super().run()  # nothing to overlap
+            return
+        utils.compact_journal(self._metadata_file)
+        self._load_state()
+        try:
+            resolving = not self._state.get(type(fetcher).__name__)
+            if resolving:
+                self._start(fetcher)
+                fetcher.retrieve()
+            for step in self._steps[1:-1]:
+                self._run_step(step)
+            downloading = not self._state.get(type(downloader).__name__)
+            if downloading:
+                self._start(downloader)
+            if resolving or downloading:
+                self._stream(fetcher if resolving else None, downloader if downloading else None)
+            if resolving:
+                self._finish(fetcher)
+            if downloading:
+                self._finish(downloader)
+        finally:
+            utils.compact_journal(self._metadata_file)
+
+    def _stream(self, fetcher: tg.Optional[MetadataDownloader], downloader: tg.Optional[PdfDownloader]) -> None:
+        """Resolve the remaining DOIs with fetcher while downloader downloads the PDFs still missing."""
+        feed: queue.Queue = queue.Queue(maxsize=self._feed_size)
+        stop = threading.Event()
+        self._errors = []
+        producer = threading.Thread(target=self._produce, args=(fetcher, downloader, feed, stop), daemon=True)
+        producer.start()
+        try:
+            if downloader is not None:
+                downloader.download_from(feed)
+            producer.join()
+        finally:
+            stop.set()  # after a failure, resolve no more DOIs
+        if self._errors:
+            logger.error(f'Resolving the DOIs failed: {self._errors[0]!r}')
+            raise SystemExit()
+
+    def _produce(self, fetcher: tg.Optional[MetadataDownloader], downloader: tg.Optional[PdfDownloader],
+                 feed: queue.Queue, stop: threading.Event) -> None:
+        """Put the downloads into feed, resolving their DOIs first where needed, and None after the last."""
+        try:
+            entries = utils.load_metadata(self._metadata_file)
+            pending = downloader.pending_entries(entries) if downloader is not None else []
+            to_download = {id(e) for e in pending}
+            unresolved = [e for e in entries if 'pdf_url' not in e] if fetcher is not None else []
+            to_resolve = {id(e) for e in unresolved}
+            for entry in pending:
+                if id(entry) not in to_resolve:
+                    self._feed(downloader, entry, feed, stop)
+
+            def resolved(entry: tg.Dict) -> None:
+                if id(entry) in to_download:
+                    self._feed(downloader, entry, feed, stop)
+
+            if unresolved:
+                # the PDFs to download first
+                unresolved.sort(key=lambda e: id(e) not in to_download)
+                self._resolve(fetcher, unresolved, resolved, stop)
+        except BaseException as e:
+            self._errors.append(e)
+        finally:
+            _put(feed, None, stop)
+
+    def _feed(self, downloader: PdfDownloader, entry: tg.Dict, feed: queue.Queue, stop: threading.Event) -> None:
+        descriptor = downloader.download_descriptor(entry)
+        if descriptor is not None:
+            _put(feed, (entry, descriptor), stop)
+
+    def _resolve(self, fetcher: MetadataDownloader, entries: tg.List[tg.Dict],
+                 done: tg.Callable[[tg.Dict], None], stop: threading.Event) -> None:
+        """Resolve the DOIs of entries in order on the fetcher's workers, calling done(entry) after each."""
+        logger.info(f'Resolving {len(entries)} DOIs with {fetcher.resolve_workers} workers.')
+        fetcher.prefetch(entries)
+        todo = iter(entries)
+        lock = threading.Lock()
+        failed = threading.Event()
+
+        def work() -> None:
+            while not stop.is_set() and not failed.is_set():
+                with lock:
+                    entry = next(todo, None)
+                if entry is None:
+                    return
+                fetcher.resolve(entry)
+                done(entry)
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=fetcher.resolve_workers) as executor:
+            futures = [executor.submit(work) for _ in range(fetcher.resolve_workers)]
+            for future in concurrent.futures.as_completed(futures):
+                if future.exception() is not None:
+                    failed.set()  # let the other workers finish their current DOI and quit
+                    raise future.exception()
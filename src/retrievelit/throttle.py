@@ -0,0 +1,184 @@
+import logging
+import threading
+import time
+import typing as tg
+from dataclasses import dataclass
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+# seconds between two requests to the same host unless set_interval() says otherwise
+DEFAULT_INTERVAL = 1.0
+# healthy hosts are sped up until the interval is down to this fraction of the configured one
+FLOOR_FRACTION = 0.25
+# hosts in trouble are slowed down at most to this interval
+MAX_INTERVAL = 300.0
+# AIMD: each healthy response adds this fraction of the configured rate to the rate,
+# so it takes some 30 healthy responses to get from the configured interval to the floor ...
+RATE_INCREASE = 0.1
+# ... and each sign of trouble multiplies the rate by this factor
+RATE_DECREASE = 0.5
+# a response taking this many times longer than usual for its host counts as a slowdown
+SLOWDOWN_FACTOR = 4.0
+# statuses by which servers say we are too fast (or they are overloaded)
+TROUBLE_STATUSES = (403, 429, 500, 502, 503, 504)
+
+
+@dataclass
+class _HostState:
+    configured: float  # the interval asked for by set_interval()
+    interval: float  # the current, adapted interval
+    floor: float
+    next_slot: float = 0.0
+    usual_elapsed: tg.Optional[float] = None  # moving average of the response time
+    requests: int = 0
+    first_request: tg.Optional[float] = None
+
+
+class HostThrottle():
+    """
+    Space out the requests to each host, across all threads.
+    The interval adapts to the host's responses (additive increase, multiplicative decrease of the rate):
+    it shrinks down to a floor while responses are healthy and grows quickly
+    on throttling statuses, slowdowns, errors and anything else reported as unhealthy by feedback().
+    """
+    def __init__(self, default_interval: float = DEFAULT_INTERVAL) -> None:
+        self._default_interval = default_interval
+        self._hosts: tg.Dict[str, _HostState] = {}
+        self._lock = threading.Lock()
+
+    def _state(self, host: str) -> _HostState:
+        """Return the state of host, creating it if needed. Caller holds the lock."""
+        if host not in self._hosts:
+            interval = self._default_interval
+            self._hosts[host] = _HostState(interval, interval, interval * FLOOR_FRACTION)
+        return self._hosts[host]
+
+    def set_interval(self, host: str, interval: float, floor: tg.Optional[float] = None) -> None:
+        """
+        Start host at `interval` seconds between requests, adapting down to `floor`
+        (default: FLOOR_FRACTION of interval). Repeating the same call keeps the adapted interval.
+        """
+        with self._lock:
+            state = self._state(host)
+            if state.configured == interval:
+                return
+            logger.debug(f'Throttling {host} to one request per {interval}s.')
+            state.configured = state.interval = interval
+            state.floor = interval * FLOOR_FRACTION if floor is None else floor
+
+    def wait(self, url: str) -> None:
+        """Block until a request to the host of url is allowed."""
+        delay = self.reserve(url)
+        if delay > 0:
+            time.sleep(delay)
+
+    def reserve(self, url: str) -> float:
+        """
+        Reserve the next slot for a request to the host of url and return the seconds until it,
+        for callers that wait in their own way (e.g. with asyncio).
+        """
+        with self._lock:
+            state = self._state(urlparse(url).netloc)
+            # reserve the next free slot, so concurrent callers queue up behind each other
+            now = time.monotonic()
+            slot = max(now, state.next_slot)
+            state.next_slot = slot + state.interval
+            state.requests += 1
+            if state.first_request is None:
+                state.first_request = slot
+        return slot - now
+
+    def ready_at(self, url: str) -> float:
+        """Return the time.monotonic() value from which wait(url) will not block."""
+        with self._lock:
+            return self._state(urlparse(url).netloc).next_slot
+
+    def _adapt(self, host: str, state: _HostState, healthy: bool) -> None:
+        """Apply one AIMD step to the interval of host. Caller holds the lock."""
+        rate = 1 / state.interval
+        if healthy:
+            rate += RATE_INCREASE / state.configured
+        else:
+            rate *= RATE_DECREASE
+        interval = min(MAX_INTERVAL, max(state.floor, 1 / rate))
+        if interval != state.interval:
+            logger.debug(f'{host}: interval {state.interval:.2f}s -> {interval:.2f}s.')
+        if not healthy:
+            logger.info(f'{host} seems to want fewer requests. Slowing down to one per {interval:.1f}s.')
+            # the reservations already handed out were made at the old pace
+            state.next_slot = max(state.next_slot, time.monotonic() + interval)
+        state.interval = interval
+
+    def observe(self, url: str, status: int, elapsed: float) -> None:
+        """Adapt the pace for the host of url to a response with status that took elapsed seconds."""
+        host = urlparse(url).netloc
+        with self._lock:
+            state = self._state(host)
+            slow = (state.usual_elapsed is not None and elapsed > 1.0
+                    and elapsed > SLOWDOWN_FACTOR * state.usual_elapsed)
+            if state.usual_elapsed is None:
+                state.usual_elapsed = elapsed
+            else:
+                state.usual_elapsed = 0.8 * state.usual_elapsed + 0.2 * elapsed
+            if slow:
+                logger.debug(f'{host} took {elapsed:.1f}s instead of the usual {state.usual_elapsed:.1f}s.')
+            self._adapt(host, state, healthy=status not in TROUBLE_STATUSES and not slow)
+
+    def feedback(self, url: str, healthy: bool) -> None:
+        """
+        Adapt the pace for the host of url to an outcome judged by the caller,
+        e.g. unhealthy because it sent something other than what we asked for.
+        """
+        host = urlparse(url).netloc
+        with self._lock:
+            self._adapt(host, self._state(host), healthy)
+
+    def report(self) -> None:
+        """Log the effective request rate and current interval of every host used so far."""
+        now = time.monotonic()
+        with self._lock:
+            for host, state in sorted(self._hosts.items()):
+                if not state.requests:
+                    continue
+                duration = max(now - state.first_request, 1e-9)
+                logger.info(f'{host}: {state.requests} requests, {60 * state.requests / duration:.1f}/min; '
+                            f'interval now {state.interval:.2f}s.')
+
+
+_throttle = HostThrottle()
+
+
+def set_interval(host: str, interval: float, floor: tg.Optional[float] = None) -> None:
+    """Set the starting and minimum interval between requests to host for the whole process."""
+    _throttle.set_interval(host, interval, floor)
+
+
+def wait(url: str) -> None:
+    """Block until the process-wide throttle allows a request to the host of url."""
+    _throttle.wait(url)
+
+
+def reserve(url: str) -> float:
+    """Reserve a slot with the process-wide throttle and return the seconds until it."""
+    return _throttle.reserve(url)
+
+
+def ready_at(url: str) -> float:
+    """Return when the process-wide throttle will next allow a request to the host of url."""
+    return _throttle.ready_at(url)
+
+
+def observe(url: str, status: int, elapsed: float) -> None:
+    """Feed a response from url into the process-wide throttle."""
+    _throttle.observe(url, status, elapsed)
+
+
+def feedback(url: str, healthy: bool) -> None:
+    """Tell the process-wide throttle whether the host of url was fine with our last request."""
+    _throttle.feedback(url, healthy)
+
+
+def report() -> None:
+    """Log the effective rates of the process-wide throttle."""
+    _throttle.report()
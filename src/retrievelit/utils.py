@@ -1,10 +1,9 @@
-import json
 import logging
+import os
 import typing as tg
-import time
 from pathlib import Path
 
-import requests
+from retrievelit import metadata_store
 
 logger = logging.getLogger(__name__)
 
@@ -12,18 +11,7 @@ logger = logging.getLogger(__name__)
 def load_metadata(metadata_file: Path) -> tg.List[tg.Dict]:
     """Load the corpus metadata from the metadata file and return it."""
     logger.debug(f'Loading metadata from file {metadata_file}')
-    try:
-        with open(metadata_file, 'r', encoding='utf8') as f:
-            file_content = json.load(f)
-    except OSError as e:
-        logger.error(repr(e))
-        logger.error('Error while loading metadata file.')
-        raise SystemExit()
-    try:
-        metadata = file_content['corpus_metadata']
-    except KeyError:
-        logger.error(f"Metadata file {metadata_file} does not contain corpus metadata.")
-        raise SystemExit()
+    metadata = metadata_store.open_store(metadata_file).load()
     logger.debug(f'Finished loading metadata from file {metadata_file}')
     return metadata
 
@@ -31,28 +19,32 @@ def load_metadata(metadata_file: Path) -> tg.List[tg.Dict]:
 def save_metadata(metadata_file: Path, data: tg.List[tg.Dict]) -> None:
     """Save the corpus metadata to the metadata file."""
     logger.debug(f'Saving corpus metadata to file {metadata_file}')
-    try:
-        with open(metadata_file, 'r', encoding='utf8') as f:
-            file_content = json.load(f)
-        file_content['corpus_metadata'] = data
-        with open(metadata_file, 'w', encoding='utf8') as f:
-            f.write(json.dumps(file_content, ensure_ascii=False, indent=2, sort_keys=True))
-    except OSError as e:
-        logger.error(repr(e))
-        logger.error('Error while saving corpus metadata to file.')
-        raise SystemExit()
+    metadata_store.open_store(metadata_file).save(data)
     logger.debug(f'Finished writing corpus metadata to file {metadata_file}') 
 
-def make_get_request(url: str, delay: int = 0) -> requests.Response:
-    """Make a GET request to url and return the response if successful."""
-    time.sleep(delay)
-    logger.debug(f'GET request to {url}')
-    headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:104.0) Gecko/20100101 Firefox/104.0'}
-    response = requests.get(url, headers=headers)
-    logger.debug(f'Reponse code: {response.status_code}')
-    try:
-        response.raise_for_status()
-    except requests.HTTPError as e:
-        logger.error(f'Bad Reponse from GET requests. {e}')
-        raise SystemExit() 
-    return response
\ No newline at end of file
+
+def journal_file(metadata_file: Path) -> Path:
+    """Return the path of the append-only progress journal belonging to a JSON metadata_file."""
+    return metadata_store.journal_file(metadata_file)
+
+
+def append_to_journal(metadata_file: Path, identifier: str, by: str = 'identifier', **fields: tg.Any) -> None:
+    """
+    Record a change of the entry `identifier` (or, with by='doi', of the entries with that DOI)
+    in the metadata file: in its journal for JSON files,
+    in the entry's row for SQLite files. Either way, this costs the same for every entry
+    no matter how large the corpus is, and the change survives a crash right after the call.
+    """
+    metadata_store.open_store(metadata_file).update(identifier, by, **fields)
+
+
+def compact_journal(metadata_file: Path) -> None:
+    """Fold the journal of metadata_file, if any, into the metadata file and remove the journal."""
+    metadata_store.open_store(metadata_file).compact()
+
+
+def cache_dir() -> Path:
+    """Return the directory for data retrievelit keeps across runs and targets."""
+    base = os.environ.get('XDG_CACHE_HOME') or Path(Path.home(), '.cache')
+    return Path(base, 'retrievelit')
+
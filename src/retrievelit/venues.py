@@ -8,6 +8,9 @@ VENUES = {
                 'type': 'journals',
                 'acronym': 'ese'
             },
+            'crossref': {
+                'issn': ['1382-3256', '1573-7616']
+            },
         },
     },
     'EnCyCris': {  # small venue, included for testing purposes
@@ -38,6 +41,9 @@ VENUES = {
                 'type': 'journals',
                 'acronym': 'infsof'
             },
+            'crossref': {
+                'issn': ['0950-5849']
+            },
         },
     },
     'TOSEM': {
@@ -48,6 +54,9 @@ VENUES = {
                 'type': 'journals',
                 'acronym': 'tosem'
             },
+            'crossref': {
+                'issn': ['1049-331X', '1557-7392']
+            },
         },
     },
     'TSE': {
@@ -58,6 +67,9 @@ VENUES = {
                 'type': 'journals',
                 'acronym': 'tse'
             },
+            'crossref': {
+                'issn': ['0098-5589', '1939-3520']
+            },
         },
     }
 }
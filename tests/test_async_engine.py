@@ -0,0 +1,42 @@
+import typing as tg
+
+from retrievelit import async_engine
+from retrievelit.doi_pdf_mappers.base import AsyncDoiMapper, PDFDescriptor
+from retrievelit.resolution_cache import CachedMapper, ResolutionCache
+
+
+class SyncMapper():
+    """Stands in for a synchronous DoiMapper without filenames."""
+    resolves_online = True
+
+    def __init__(self) -> None:
+        self.calls: tg.List[str] = []
+
+    def has_pdfdescriptor(self) -> bool:
+        return False
+
+    def get_pdf_url(self, doi: str) -> str:
+        self.calls.append(doi)
+        return f"https://example.org/{doi}.pdf"
+
+
+class NativeMapper(SyncMapper, AsyncDoiMapper):
+    """Stands in for a mapper that also maps DOIs with asyncio."""
+    async def get_pdf_url_async(self, doi: str, client: tg.Any) -> str:
+        return f"https://example.org/async/{doi}.pdf"
+
+
+def test_sync_mappers_resolve_through_the_adapter_in_order() -> None:
+    mapper = SyncMapper()
+    descriptors = async_engine.resolve_dois(mapper, [f"10.1/{i}" for i in range(20)], per_host=4)
+    assert descriptors == [PDFDescriptor(f"https://example.org/10.1/{i}.pdf", None) for i in range(20)]
+    assert sorted(mapper.calls) == sorted(f"10.1/{i}" for i in range(20))
+
+
+def test_native_mappers_are_used_and_cached(tmp_path) -> None:
+    mapper = CachedMapper(NativeMapper(), ResolutionCache(tmp_path / "cache.sqlite"))
+    first = async_engine.resolve_dois(mapper, ["10.1/a"], per_host=4)
+    assert first == [PDFDescriptor("https://example.org/async/10.1/a.pdf", None)]
+    # the synchronous path finds the result of the asynchronous one in the cache
+    assert mapper.get_pdf_url("10.1/a") == "https://example.org/async/10.1/a.pdf"
+    assert mapper.wrapped.calls == []
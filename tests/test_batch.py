@@ -0,0 +1,61 @@
+import json
+
+import pytest
+
+from retrievelit import main
+from retrievelit import utils
+from retrievelit.dblp_downloader import DblpDownloader
+from retrievelit.download_scheduler import DownloadScheduler
+
+
+def test_target_ranges_and_mappers_are_expanded() -> None:
+    assert main.expand_target_spec("EMSE-2015:2017") == [("EMSE-2015", None), ("EMSE-2016", None),
+                                                         ("EMSE-2017", None)]
+    assert main.expand_target_spec("TSE-2022@ComputerOrgJournal") == [("TSE-2022", "ComputerOrgJournal")]
+    with pytest.raises(SystemExit):
+        main.expand_target_spec("EMSE-2024:2015")
+
+
+def test_later_targets_avoid_names_of_earlier_ones(tmp_path, monkeypatch, mocker) -> None:
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "batch.txt").write_text("# both years\nEMSE-2020:2021\n", encoding="utf8")
+
+    def fake_metadata(self) -> None:
+        entry = {"authors": ["John Smith"], "year": "2020", "title": "title", "doi": f"10.1/{self._number}"}
+        utils.save_metadata(self._metadata_file, [entry])
+
+    mocker.patch.object(DblpDownloader, "run", fake_metadata)
+    mocker.patch.object(DownloadScheduler, "run")
+    mocker.patch("retrievelit.bibtex_builder.BibtexBuilder.run")
+    args = main.create_batch_parser().parse_args(["--manifest", "batch.txt", "--cachedays", "0",
+                                                  "--mapper", "Springer"])
+    assert main.run_batch(args)
+    identifiers = []
+    for target in ("EMSE-2020", "EMSE-2021"):
+        with open(tmp_path / target / "metadata" / f"{target}-dblp.json", encoding="utf8") as f:
+            identifiers += [e["identifier"] for e in json.load(f)["corpus_metadata"]]
+    assert identifiers == ["Smith20", "Smith20a"]
+
+
+def test_refresh_adds_only_new_entries(tmp_path, monkeypatch, mocker) -> None:
+    monkeypatch.chdir(tmp_path)
+    old = {"authors": ["John Smith"], "year": "2020", "title": "Old", "doi": "10.1/old", "pdf": False}
+    new = {"authors": ["John Smith"], "year": "2020", "title": "New", "doi": "10.1/new", "pdf": False}
+    fetch = mocker.patch.object(DblpDownloader, "_fetch", return_value=[dict(old)])
+    mocker.patch("retrievelit.pdf_downloader.PdfDownloader.run")
+    mapper = mocker.Mock(**{"has_pdfdescriptor.return_value": False, "get_pdf_url.return_value": "https://x/y.pdf"})
+    args = main.create_parser().parse_args(["EMSE-2020"])
+    main.build_pipeline(args, mapper).run()
+    _, _, metadata_file, bibtex_file, _ = main.target_files(args)
+    bibtex_file.write_text(bibtex_file.read_text(encoding="utf8").replace("Old", "Edited"), encoding="utf8")
+
+    fetch.return_value = [dict(new), dict(old)]
+    args = main.create_parser().parse_args(["--refresh", "EMSE-2020"])
+    pipeline = main.build_pipeline(args, mapper)
+    pipeline.refresh()
+    pipeline.run()
+    assert [(e["doi"], e["identifier"]) for e in utils.load_metadata(metadata_file)] == [("10.1/old", "Smith20"),
+                                                                                        ("10.1/new", "Smith20a")]
+    assert [c.args for c in mapper.get_pdf_url.call_args_list] == [("10.1/old",), ("10.1/new",)]
+    bibtex = bibtex_file.read_text(encoding="utf8")
+    assert "Edited" in bibtex and "@article{Smith20a" in bibtex
@@ -0,0 +1,32 @@
+from pathlib import Path
+
+from retrievelit.crossref_downloader import CrossrefDownloader
+from retrievelit.venues import VENUES
+
+
+def _item(i: int) -> dict:
+    return {"DOI": f"10.1007/S10664-020-0{i}", "title": [f"Title {i}"], "volume": "25", "issue": "1",
+            "page": f"{i}-{i + 9}", "issued": {"date-parts": [[2020, 3]]}, "type": "journal-article",
+            "author": [{"given": "Ann", "family": "Lee"}, {"name": "Some Consortium"}]}
+
+
+def test_cursor_pages_are_followed_and_unified(mocker) -> None:
+    pages = {"*": ([_item(0), _item(1)], "c1"), "c1": ([_item(2)], "c2"), "c2": ([], "c3")}
+    requested = []
+
+    def get_data(params: dict) -> dict:
+        requested.append(dict(params))
+        items, next_cursor = pages[params["cursor"]]
+        return {"items": items, "next-cursor": next_cursor, "total-results": 3}
+
+    mapper = mocker.Mock(**{"has_pdfdescriptor.return_value": False, "get_pdf_url.return_value": "https://x/y.pdf"})
+    downloader = CrossrefDownloader(Path("unused"), VENUES["EMSE"], "2020", "year", mapper)
+    downloader._load_mds_config()
+    mocker.patch.object(downloader, "_get_data", side_effect=get_data)
+    entries = downloader._unify_data_format(downloader._get_data_for_year())
+    assert [r["cursor"] for r in requested] == ["*", "c1"]
+    assert requested[0]["filter"] == ("from-pub-date:2020-01-01,until-pub-date:2020-12-31,"
+                                      "issn:1382-3256,issn:1573-7616")
+    assert [e["doi"] for e in entries] == ["10.1007/s10664-020-00", "10.1007/s10664-020-01", "10.1007/s10664-020-02"]
+    assert entries[0]["authors"] == ["Ann Lee"]
+    assert (entries[0]["year"], entries[0]["number"], entries[0]["type"]) == ("2020", "1", "Journal Articles")
@@ -0,0 +1,99 @@
+import gzip
+from pathlib import Path
+
+from retrievelit import dblp_downloader
+from retrievelit import utils
+from retrievelit.dblp_downloader import DblpDownloader
+from retrievelit.dblp_dump import DblpDumpDownloader
+from retrievelit.metadata_store import open_store
+
+VENUE = {"name": "Transactions on Software Engineering", "type": "journal",
+         "metadata_sources": {"dblp": {"type": "journals", "acronym": "tse"}}}
+
+
+def _page(offset: int, sent: int, total: int) -> dict:
+    hits = [{"info": {"title": f"T{offset + i}", "year": "2015"}} for i in range(sent)]
+    return {"result": {"hits": {"@sent": str(sent), "@total": str(total), "hit": hits}}}
+
+
+def test_year_pages_are_filtered_by_dblp_and_kept_in_order(mocker) -> None:
+    mocker.patch.object(dblp_downloader, "PAGE_SIZE", 2)
+    requested = []
+
+    def get_data(url: str) -> dict:
+        requested.append(url)
+        offset = int(url.split("&f=")[1].split("&")[0])
+        return _page(offset, min(2, 5 - offset), 5)
+
+    downloader = DblpDownloader(Path("unused"), VENUE, "2015", "year", mapper=None)
+    downloader._load_mds_config()
+    mocker.patch.object(downloader, "_get_data", side_effect=get_data)
+    entries = downloader._get_data_for_year()
+    assert [e["info"]["title"] for e in entries] == ["T0", "T1", "T2", "T3", "T4"]
+    assert len(requested) == 3
+    assert all("stream:streams/journals/tse: year:2015:" in url for url in requested)
+
+
+
+def test_volume_pages_are_all_fetched(mocker) -> None:
+    mocker.patch.object(dblp_downloader, "PAGE_SIZE", 2)
+    requested = []
+
+    def get_data(url: str) -> dict:
+        requested.append(url)
+        offset = int(url.split("&f=")[1].split("&")[0]) if "&f=" in url else 0
+        return _page(offset, min(2, 5 - offset), 5)
+
+    downloader = DblpDownloader(Path("unused"), VENUE, "41", "volume", mapper=None)
+    downloader._load_mds_config()
+    mocker.patch.object(downloader, "_get_data", side_effect=get_data)
+    entries = downloader._get_data_for_volume()
+    assert [e["info"]["title"] for e in entries] == ["T0", "T1", "T2", "T3", "T4"]
+    assert requested[0] == "https://dblp.org/search/publ/api?q=toc:db/journals/tse/tse41.bht:&h=2&format=json"
+    assert len(requested) == 3
+
+DUMP = """<?xml version="1.0" encoding="ISO-8859-1"?>
+<!DOCTYPE dblp SYSTEM "dblp.dtd">
+<dblp>
+<article key="journals/tse/Mueller15" mdate="2020-01-01">
+<author pid="1/1">J&uuml;rgen M&uuml;ller 0001</author><author>Ann Lee</author>
+<title>On <i>Testing</i>.</title><pages>1-10</pages><year>2015</year><volume>41</volume><number>1</number>
+<ee>https://doi.org/10.1109/TSE.2015.1</ee><url>db/journals/tse/tse41.html#Mueller15</url>
+</article>
+<article key="journals/tse/Lee16"><author>Ann Lee</author><title>Later.</title><year>2016</year>
+<volume>42</volume><ee>https://doi.org/10.1109/TSE.2016.2</ee><url>db/journals/tse/tse42.html#Lee16</url>
+</article>
+<inproceedings key="conf/icse/Lee15"><author>Ann Lee</author><title>Elsewhere.</title><year>2015</year>
+<ee>https://doi.org/10.1109/ICSE.2015.3</ee><url>db/conf/icse/icse2015.html#Lee15</url>
+</inproceedings>
+</dblp>
+"""
+
+
+def test_dump_answers_year_and_volume_like_the_api(tmp_path, mocker) -> None:
+    dump_file = tmp_path / "dblp.xml.gz"
+    with gzip.open(dump_file, "wt", encoding="iso-8859-1") as f:
+        f.write(DUMP)
+    mapper = mocker.Mock(**{"has_pdfdescriptor.return_value": False, "get_pdf_url.return_value": "https://x/y.pdf"})
+    by_year = DblpDumpDownloader(Path("unused"), VENUE, "2015", "year", mapper, dump_file)
+    by_year._load_mds_config()
+    entries = by_year._unify_data_format(by_year._get_data_for_year())
+    assert [(e["title"], e["doi"], e["volume"]) for e in entries] == [("On Testing.", "10.1109/tse.2015.1", "41")]
+    assert entries[0]["authors"] == ["Jürgen Müller", "Ann Lee"]
+    by_volume = DblpDumpDownloader(Path("unused"), VENUE, "42", "volume", mapper, dump_file)
+    by_volume._load_mds_config()
+    assert [hit["info"]["title"] for hit in by_volume._get_data_for_volume()] == ["Later."]
+
+
+def test_resumed_run_resolves_only_the_remaining_dois(tmp_path, mocker) -> None:
+    metadata_file = tmp_path / "TSE-2015-dblp.json"
+    open_store(metadata_file).create({})
+    utils.save_metadata(metadata_file, [{"doi": "10.1/a", "pdf_url": "https://x/a.pdf", "pdf_filename": None},
+                                        {"doi": "10.1/b"}])
+    mapper = mocker.Mock(**{"has_pdfdescriptor.return_value": False, "get_pdf_url.return_value": "https://x/b.pdf"})
+    downloader = DblpDownloader(metadata_file, VENUE, "2015", "year", mapper)
+    fetch = mocker.patch.object(downloader, "_fetch")
+    downloader.run()
+    fetch.assert_not_called()
+    mapper.get_pdf_url.assert_called_once_with("10.1/b")
+    assert [e["pdf_url"] for e in utils.load_metadata(metadata_file)] == ["https://x/a.pdf", "https://x/b.pdf"]
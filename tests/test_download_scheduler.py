@@ -0,0 +1,119 @@
+import queue
+import threading
+import typing as tg
+from pathlib import Path
+
+from retrievelit import throttle
+from retrievelit.doi_pdf_mappers.base import PDFDescriptor
+from retrievelit.download_scheduler import DownloadScheduler
+from retrievelit.throttle import HostThrottle
+
+
+class FakeDownloader():
+    """Stands in for a PdfDownloader with direct downloads from host."""
+    uses_webbrowser = False
+
+    def __init__(self, host: str, count: int, started: tg.List[str], failing: tg.Any = False) -> None:
+        self.target_dir = Path(host)
+        self._entries = [{"identifier": f"{host}{i}"} for i in range(count)]
+        self._host = host
+        self._started = started
+        self._failing = failing
+        self.recorded: tg.List[str] = []
+
+    def pending_downloads(self) -> tg.List[tg.Tuple[tg.Dict, PDFDescriptor]]:
+        return [(e, PDFDescriptor(f"https://{self._host}/{e['identifier']}", None)) for e in self._entries]
+
+    def set_pace(self, host: str) -> None:
+        throttle.set_interval(host, 0.1)
+
+    def download_directly(self, entry: tg.Dict, pdfdescriptor: PDFDescriptor, reserved: bool = False) -> Path:
+        if not reserved:
+            throttle.wait(pdfdescriptor.download_url)  # as http_client does
+        self._started.append(entry["identifier"])
+        if self._failing is True:
+            raise SystemExit()
+        if self._failing and entry["identifier"] in self._failing:
+            raise ConnectionError(entry["identifier"])
+        return Path(f"{entry['identifier']}.pdf")
+
+    def record_download(self, entry: tg.Dict, pdf_path: Path) -> None:
+        self.recorded.append(entry["identifier"])
+
+    def cancel(self) -> None:
+        pass
+
+
+def test_hosts_take_turns(mocker) -> None:
+    mocker.patch.object(throttle, "_throttle", HostThrottle())
+    started: tg.List[str] = []
+    scheduler = DownloadScheduler(Path("unused"), workers=1)
+    first, second = FakeDownloader("a.example", 3, started), FakeDownloader("b.example", 3, started)
+    scheduler.add(first)
+    scheduler.add(second)
+    scheduler.run()
+    assert started == ["a.example0", "b.example0", "a.example1", "b.example1", "a.example2", "b.example2"]
+    assert first.recorded == ["a.example0", "a.example1", "a.example2"]
+    assert scheduler.finished(first) and scheduler.finished(second)
+
+
+def test_failing_downloader_does_not_stop_the_others(mocker) -> None:
+    mocker.patch.object(throttle, "_throttle", HostThrottle())
+    started: tg.List[str] = []
+    scheduler = DownloadScheduler(Path("unused"), workers=1)
+    failing, healthy = FakeDownloader("a.example", 3, started, failing=True), FakeDownloader("b.example", 3, started)
+    scheduler.add(failing)
+    scheduler.add(healthy)
+    scheduler.run()
+    assert started == ["a.example0", "b.example0", "b.example1", "b.example2"]
+    assert healthy.recorded == ["b.example0", "b.example1", "b.example2"]
+    assert not scheduler.finished(failing) and scheduler.finished(healthy)
+
+
+def test_streamed_downloads_are_taken_a_few_at_a_time(mocker) -> None:
+    mocker.patch.object(throttle, "_throttle", HostThrottle())
+    started: tg.List[str] = []
+    downloader = FakeDownloader("a.example", 6, started)
+    feed: queue.Queue = queue.Queue(maxsize=1)
+    scheduler = DownloadScheduler(Path("unused"), workers=1)
+    scheduler.stream(downloader, feed)
+    fed: tg.List[tg.Tuple[str, int]] = []
+
+    def produce() -> None:
+        for entry, descriptor in downloader.pending_downloads():
+            feed.put((entry, descriptor))
+            fed.append((entry["identifier"], len(started)))
+        feed.put(None)
+
+    producer = threading.Thread(target=produce)
+    producer.start()
+    scheduler.run()
+    producer.join()
+    assert downloader.recorded == [f"a.example{i}" for i in range(6)]
+    # the bounded feed holds the producer back until the downloads catch up
+    assert fed[-1][1] >= 2
+    assert scheduler.finished(downloader)
+
+
+def test_started_download_takes_the_slot_of_its_host(mocker) -> None:
+    mocker.patch.object(throttle, "_throttle", HostThrottle())
+    scheduler = DownloadScheduler(Path("unused"), workers=2)
+    scheduler.add(FakeDownloader("a.example", 2, []))
+    executor = mocker.Mock()
+    scheduler._start(scheduler._next_download(), executor)
+    # the free worker must not be handed a download that would only wait for a.example's next slot
+    assert scheduler._next_download() is None
+    executor.submit.assert_called_once()
+
+
+def test_error_of_one_download_does_not_stop_the_others(mocker) -> None:
+    mocker.patch.object(throttle, "_throttle", HostThrottle())
+    started: tg.List[str] = []
+    scheduler = DownloadScheduler(Path("unused"), workers=1)
+    flaky, healthy = FakeDownloader("a.example", 3, started, failing=["a.example1"]), FakeDownloader("b.example", 2, started)
+    scheduler.add(flaky)
+    scheduler.add(healthy)
+    scheduler.run()
+    assert flaky.recorded == ["a.example0", "a.example2"]
+    assert healthy.recorded == ["b.example0", "b.example1"]
+    assert not scheduler.finished(flaky) and scheduler.finished(healthy)
@@ -0,0 +1,31 @@
+import threading
+import time
+
+import pytest
+
+from retrievelit.download_watcher import DownloadWatcher
+from retrievelit.exceptions import DownloadTimeoutError
+
+
+def _download_like_firefox(directory, filename) -> None:
+    """Create an empty placeholder, write into a .part file, then rename it over the placeholder."""
+    time.sleep(0.2)
+    (directory / filename).touch()
+    part = directory / f"{filename}.part"
+    part.write_bytes(b"%PDF-1.4 ...")
+    time.sleep(0.2)
+    part.rename(directory / filename)
+
+
+@pytest.mark.parametrize("use_inotify", [True, False])
+def test_watcher_waits_for_complete_file(tmp_path, mocker, use_inotify) -> None:
+    if not use_inotify:
+        mocker.patch.object(DownloadWatcher, "_start_inotify", return_value=None)
+    with DownloadWatcher(tmp_path) as watcher:
+        browser = threading.Thread(target=_download_like_firefox, args=(tmp_path, "a.pdf"))
+        browser.start()
+        assert watcher.wait(["b.pdf", "a.pdf"], timeout=5) == "a.pdf"
+        browser.join()
+        assert not (tmp_path / "a.pdf.part").exists()
+        with pytest.raises(DownloadTimeoutError):
+            watcher.wait(["b.pdf"], timeout=0.3)
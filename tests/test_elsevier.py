@@ -0,0 +1,45 @@
+import pytest
+import requests
+
+from retrievelit.doi_pdf_mappers import elsevier
+from retrievelit.doi_pdf_mappers.elsevier import ElsevierMapper
+from retrievelit.exceptions import PdfUrlNotFoundError
+
+
+def test_pii_is_found_among_alternative_ids() -> None:
+    assert elsevier._pii_from_alternative_ids(["S0950584916301793", "x"]) == "S0950584916301793"
+    assert elsevier._pii_from_alternative_ids(["S0950-5849(16)30179-3"]) == "S0950584916301793"
+    assert elsevier._pii_from_alternative_ids(["10.1016/j.infsof.2016.09.011"]) is None
+
+
+def test_failed_prefetch_batch_does_not_stop_later_ones(mocker) -> None:
+    mocker.patch.object(elsevier, "PREFETCH_BATCH_SIZE", 1)
+    ok = mocker.Mock()
+    ok.json.return_value = {"message": {"items": [
+        {"DOI": "10.1016/J.INFSOF.2016.09.011", "alternative-id": ["S0950584916301793"]}]}}
+    get = mocker.patch("retrievelit.http_client.get", side_effect=[requests.ConnectionError(), ok])
+    mapper = ElsevierMapper()
+    mapper.prefetch(["10.1016/j.infsof.2016.09.010", "10.1016/j.infsof.2016.09.011"])
+    assert get.call_count == 2
+    assert mapper._elsevier_ids == {"10.1016/j.infsof.2016.09.011": "S0950584916301793"}
+
+
+def test_failed_resolution_gives_no_pii(mocker) -> None:
+    response = requests.Response()
+    response.status_code, response.url = 429, "https://doi.org/10.1016/j.infsof.2016.09.011"
+    mocker.patch("retrievelit.http_client.head", return_value=response)
+    with pytest.raises(requests.HTTPError):
+        ElsevierMapper().get_pdf_url("10.1016/j.infsof.2016.09.011")
+
+
+def test_only_sciencedirect_piis_are_memoized(mocker) -> None:
+    elsewhere, article = requests.Response(), requests.Response()
+    elsewhere.status_code, elsewhere.url = 200, "https://www.elsevier.com/cookie-consent"
+    article.status_code = 200
+    article.url = "https://www.sciencedirect.com/science/article/pii/S0950584916301793"
+    head = mocker.patch("retrievelit.http_client.head", side_effect=[elsewhere, article, article])
+    mapper = ElsevierMapper()
+    with pytest.raises(PdfUrlNotFoundError):
+        mapper.get_pdf_url("10.1016/j.infsof.2016.09.011")
+    assert mapper.get_pdfdescriptor("10.1016/j.infsof.2016.09.011").filename == "1-s2.0-S0950584916301793-main.pdf"
+    assert head.call_count == 2
@@ -0,0 +1,24 @@
+import pytest
+
+from retrievelit import http_client
+
+
+def test_hosts_get_one_retrying_session_each(monkeypatch) -> None:
+    monkeypatch.setattr(http_client, "_sessions", {})
+    monkeypatch.setattr(http_client, "_settings", dict(http_client._settings))
+    http_client.configure(retries=3, backoff_factor=0.5, pool_size=7)
+    session = http_client.session_for("https://example.org/a.pdf")
+    assert http_client.session_for("https://example.org/b.pdf") is session
+    assert http_client.session_for("https://other.example/a.pdf") is not session
+    adapter = session.get_adapter("https://example.org/a.pdf")
+    retry = adapter.max_retries
+    assert (retry.total, retry.backoff_factor) == (3, 0.5)
+    assert set(retry.status_forcelist) == {429, 500, 502, 503, 504}
+    assert retry.allowed_methods == {"HEAD", "GET"}
+    assert retry.respect_retry_after_header and not retry.raise_on_status
+    assert adapter._pool_maxsize == 7
+
+
+def test_unknown_setting_is_rejected() -> None:
+    with pytest.raises(ValueError):
+        http_client.configure(retry=3)
@@ -0,0 +1,106 @@
+import json
+import logging
+
+import pytest
+
+from retrievelit import metadata_store
+from retrievelit import utils
+from retrievelit.bibtex_builder import BibtexBuilder
+from retrievelit.downloader_pipeline import DownloaderPipeline
+from retrievelit.metadata_downloader import MetadataDownloader
+from retrievelit.name_generator import NameGenerator
+from retrievelit.pdf_downloader import PdfDownloader
+from retrievelit.pipeline_step import PipelineStep
+
+
+def _metadata_file(tmp_path, entries):
+    metadata_file = tmp_path / "T-1-dblp.json"
+    content = {"run_configuration": {}, "state": {}, "corpus_metadata": entries}
+    metadata_file.write_text(json.dumps(content), encoding="utf8")
+    return metadata_file
+
+
+def test_journal_is_replayed_on_load(tmp_path) -> None:
+    metadata_file = _metadata_file(tmp_path, [{"identifier": "a", "pdf": False},
+                                              {"identifier": "b", "pdf": False}])
+    utils.append_to_journal(metadata_file, "b", pdf=True)
+    with open(utils.journal_file(metadata_file), "a", encoding="utf8") as f:
+        f.write('{"identifier": "a", "pd')  # torn write of a crashed run
+    metadata = utils.load_metadata(metadata_file)
+    assert [e["pdf"] for e in metadata] == [False, True]
+
+
+def test_compact_journal(tmp_path) -> None:
+    metadata_file = _metadata_file(tmp_path, [{"identifier": "a", "pdf": False}])
+    utils.append_to_journal(metadata_file, "a", pdf=True)
+    utils.compact_journal(metadata_file)
+    assert not utils.journal_file(metadata_file).exists()
+    stored = json.loads(metadata_file.read_text(encoding="utf8"))
+    assert stored["corpus_metadata"] == [{"identifier": "a", "pdf": True}]
+
+
+class Step(PipelineStep):
+    incremental = True
+
+    def __init__(self, metadata_file, fail: bool) -> None:
+        self._metadata_file = metadata_file
+        self._fail = fail
+        self.processed = []
+
+    def run(self) -> None:
+        for entry in utils.load_metadata(self._metadata_file):
+            if entry["pdf"]:
+                continue
+            if self._fail and self.processed:
+                raise SystemExit()
+            self.processed.append(entry["identifier"])
+            utils.append_to_journal(self._metadata_file, entry["identifier"], pdf=True)
+
+
+def test_interrupted_incremental_step_resumes_with_the_rest(tmp_path) -> None:
+    metadata_file = _metadata_file(tmp_path, [{"identifier": i, "pdf": False} for i in "abc"])
+    pipeline = DownloaderPipeline(metadata_file)
+    first = Step(metadata_file, fail=True)
+    pipeline.add_step(first)
+    with pytest.raises(SystemExit):
+        pipeline.run()
+    pipeline = DownloaderPipeline(metadata_file)
+    second = Step(metadata_file, fail=False)
+    pipeline.add_step(second)
+    pipeline.run()
+    assert (first.processed, second.processed) == (["a"], ["b", "c"])
+
+
+class OneShotStep(PipelineStep):
+    def run(self) -> None:
+        pass
+
+
+def test_interrupted_step_that_cannot_resume_is_refused(tmp_path, caplog) -> None:
+    metadata_file = _metadata_file(tmp_path, [])
+    metadata_store.open_store(metadata_file).save_state({"OneShotStep": False})
+    pipeline = DownloaderPipeline(metadata_file)
+    pipeline.add_step(OneShotStep())
+    with pytest.raises(SystemExit):
+        pipeline.run()
+    assert "cannot be resumed or repeated" in caplog.text
+    assert metadata_store.open_store(metadata_file).load_state() == {"OneShotStep": False}
+
+
+def test_only_the_steps_journaling_each_entry_are_incremental() -> None:
+    steps = (MetadataDownloader, NameGenerator, BibtexBuilder, PdfDownloader)
+    assert [step.incremental for step in steps] == [True, False, False, True]
+    assert all(step.idempotent for step in steps)
+
+
+def test_interrupted_step_that_is_not_incremental_is_restarted(tmp_path, caplog) -> None:
+    metadata_file = _metadata_file(tmp_path, [{"identifier": "Smith20", "authors": ["John Smith"], "year": "2020"},
+                                              {"authors": ["Jane Smith"], "year": "2020"}])
+    metadata_store.open_store(metadata_file).save_state({"NameGenerator": False})
+    pipeline = DownloaderPipeline(metadata_file)
+    pipeline.add_step(NameGenerator(metadata_file, []))
+    with caplog.at_level(logging.INFO):
+        pipeline.run()
+    assert "Restarting step NameGenerator" in caplog.text
+    assert [e["identifier"] for e in utils.load_metadata(metadata_file)] == ["Smith20", "Smith20a"]
+    assert metadata_store.open_store(metadata_file).load_state() == {"NameGenerator": True}
@@ -1,6 +1,17 @@
+import os
+import pkgutil
+import subprocess
+import sys
+from pathlib import Path
+
 import requests
 import pytest
 
+import retrievelit
+import retrievelit.doi_pdf_mappers
+from retrievelit import mapper_factory
+from retrievelit.doi_pdf_mappers.base import DoiMapper
+
 from retrievelit.doi_pdf_mappers.acm import AcmMapper
 from retrievelit.doi_pdf_mappers.computer_org import ComputerOrgConfMapper, ComputerOrgJournalMapper
 from retrievelit.doi_pdf_mappers.html_parser import HtmlParserMapper
@@ -26,4 +37,31 @@ def test_mapper(class_, doi):
     r = requests.get(pdf_url, headers=headers)
     r.raise_for_status()
     assert r.status_code == 200
-    assert 'application/pdf' in r.headers.get('Content-Type')
\ No newline at end of file
+    assert 'application/pdf' in r.headers.get('Content-Type')
+
+
+def test_mapper_table_lists_every_mapper() -> None:
+    for module in pkgutil.iter_modules(retrievelit.doi_pdf_mappers.__path__):
+        __import__(f"retrievelit.doi_pdf_mappers.{module.name}")
+    names = sorted(cls.__name__[:-len("Mapper")] for cls in DoiMapper.__subclasses__())
+    assert names == sorted(mapper_factory.mapper_names())
+    assert all(mapper_factory.mapper_class(name).__name__ == f"{name}Mapper" for name in names)
+
+
+def test_startup_imports_no_mappers_and_writes_no_log(tmp_path) -> None:
+    heavy = ('bs4', 'bibtexparser', 'requests', 'urllib3', 'aiohttp', 'tqdm', 'retrievelit.doi_pdf_mappers.')
+    code = ("import sys; from retrievelit import main; main.create_parser(); "
+            f"print(sorted(m for m in sys.modules if m.startswith({heavy!r})))")
+    env = dict(os.environ, PYTHONPATH=str(Path(retrievelit.__file__).parents[1]))
+    result = subprocess.run([sys.executable, "-c", code], cwd=tmp_path, env=env,
+                            capture_output=True, text=True, check=True)
+    assert result.stdout.split() == ["['retrievelit.doi_pdf_mappers.base']"]
+    assert not (tmp_path / "log").exists()
+
+
+def test_failed_resolution_gives_no_pdf_url(mocker) -> None:
+    response = requests.Response()
+    response.status_code, response.url = 503, "https://www.computer.org/maintenance"
+    mocker.patch("retrievelit.http_client.head", return_value=response)
+    with pytest.raises(requests.HTTPError):
+        ComputerOrgConfMapper().get_pdf_url("10.1109/ICSE43902.2021.00014")
@@ -0,0 +1,44 @@
+import time
+from pathlib import Path
+
+import pytest
+
+from retrievelit.exceptions import PdfUrlNotFoundError
+from retrievelit.metadata_downloader import MetadataDownloader
+
+DOIS = [f"10.1/{i}" for i in range(6)]
+
+
+class Source(MetadataDownloader):
+    def _fetch(self) -> list:
+        return [{"doi": doi} for doi in DOIS]
+
+
+def _mapper(mocker, failing: str = "", error: BaseException = PdfUrlNotFoundError("no PDF")):
+    def get_pdf_url(doi: str) -> str:
+        time.sleep(0.01 * (len(DOIS) - DOIS.index(doi)))  # later DOIs resolve sooner
+        if doi == failing:
+            raise error
+        return f"https://example.org/{doi}.pdf"
+
+    return mocker.Mock(**{"has_pdfdescriptor.return_value": False, "get_pdf_url.side_effect": get_pdf_url})
+
+
+def test_parallel_resolution_records_the_entries_in_order(mocker) -> None:
+    journal = mocker.patch("retrievelit.utils.append_to_journal")
+    entries = [{"doi": doi} for doi in DOIS]
+    Source(Path("unused"), _mapper(mocker), resolve_workers=4)._add_pdfdescriptors(entries)
+    assert [c.args[1] for c in journal.call_args_list] == DOIS
+    assert [e["pdf_url"] for e in entries] == [f"https://example.org/{doi}.pdf" for doi in DOIS]
+
+
+@pytest.mark.parametrize("error", [PdfUrlNotFoundError("no PDF"), SystemExit()])
+@pytest.mark.parametrize("workers", [1, 4])
+def test_failing_resolution_stops_at_the_same_entry_as_serially(mocker, error, workers) -> None:
+    journal = mocker.patch("retrievelit.utils.append_to_journal")
+    entries = [{"doi": doi} for doi in DOIS]
+    with pytest.raises(type(error)):
+        Source(Path("unused"), _mapper(mocker, DOIS[2], error), resolve_workers=workers)._add_pdfdescriptors(entries)
+    # the entries after the failing one stay unresolved, even if their workers were done first
+    assert [c.args[1] for c in journal.call_args_list] == DOIS[:2]
+    assert ["pdf_url" in e for e in entries] == [True, True, False, False, False, False]
@@ -0,0 +1,48 @@
+import json
+
+import pytest
+
+from retrievelit import main
+from retrievelit import utils
+from retrievelit.metadata_store import SqliteMetadataStore, open_store
+
+
+def test_sqlite_store_updates_entries_in_place(tmp_path) -> None:
+    store = SqliteMetadataStore(tmp_path / "T-1-dblp.sqlite")
+    store.create({"target": "T-1"})
+    store.save([{"identifier": "a", "doi": "10.1/a", "pdf": False}, {"identifier": "b", "doi": "10.1/b", "pdf": False}])
+    store.update("b", pdf=True)
+    store.save_state({"DblpDownloader": True})
+    reopened = SqliteMetadataStore(tmp_path / "T-1-dblp.sqlite")
+    assert [e["pdf"] for e in reopened.load()] == [False, True]
+    assert reopened.load_state() == {"DblpDownloader": True}
+    assert reopened.run_configuration() == {"target": "T-1"}
+
+
+def test_export_writes_json_bibtex_and_list(tmp_path, monkeypatch) -> None:
+    monkeypatch.chdir(tmp_path)
+    args = main.create_parser().parse_args(["--store", "sqlite", "--export", "EMSE-2020"])
+    _, metadata_dir, metadata_file, bibtex_file, list_file = main.target_files(args)
+    metadata_dir.mkdir(parents=True)
+    open_store(metadata_file).create({})
+    entry = {"identifier": "Smith20", "authors": ["John Smith"], "title": "T", "year": "2020", "pdf": False}
+    utils.save_metadata(metadata_file, [entry, dict(entry, identifier="Lee20")])
+    utils.append_to_journal(metadata_file, "Lee20", pdf=True)
+    main.export_target(args)
+    exported = json.loads(metadata_file.with_suffix(".json").read_text(encoding="utf8"))
+    assert [e["pdf"] for e in exported["corpus_metadata"]] == [False, True]
+    assert "@article{Lee20" in bibtex_file.read_text(encoding="utf8")
+    assert list_file.read_text(encoding="utf8") == "EMSE-2020/Lee20.pdf\n"
+
+
+def test_json_store_is_replaced_whole(tmp_path, mocker) -> None:
+    metadata_file = tmp_path / "T-1-dblp.json"
+    store = open_store(metadata_file)
+    store.create({"target": "T-1"})
+    store.save([{"identifier": "a", "pdf": False}])
+    dumps = mocker.patch("json.dumps", side_effect=KeyboardInterrupt)  # interrupted while writing
+    with pytest.raises(KeyboardInterrupt):
+        store.save([{"identifier": "a", "pdf": True}])
+    mocker.stop(dumps)
+    assert store.load() == [{"identifier": "a", "pdf": False}]
+    assert [p.name for p in tmp_path.iterdir()] == ["T-1-dblp.json"]
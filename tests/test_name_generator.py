@@ -0,0 +1,46 @@
+import json
+
+from retrievelit.name_generator import NameGenerator
+from retrievelit.name_registry import NameRegistry
+
+
+def _existing_corpus(tmp_path) -> None:
+    metadata_dir = tmp_path / "EMSE-24" / "metadata"
+    metadata_dir.mkdir(parents=True)
+    (metadata_dir / "EMSE-24.list").write_text("EMSE-24/Smith20.pdf\n", encoding="utf8")
+    content = {"corpus_metadata": [{"identifier": "Smith20a"}, {"identifier": "DoeRoe20"}]}
+    (metadata_dir / "EMSE-24-dblp.json").write_text(json.dumps(content), encoding="utf8")
+
+
+def test_names_of_existing_folders_are_avoided(tmp_path, monkeypatch) -> None:
+    monkeypatch.chdir(tmp_path)
+    _existing_corpus(tmp_path)
+    name_generator_ = NameGenerator("mocked", ["EMSE-24"])
+    name_generator_._load_existing_names()
+    article = {"authors": ["John Smith"], "year": "2020", "title": "title"}
+    assert name_generator_._generate_name(article) == "Smith20b"
+
+
+def test_name_index_spares_rereading_unchanged_folders(tmp_path, monkeypatch, mocker) -> None:
+    monkeypatch.chdir(tmp_path)
+    _existing_corpus(tmp_path)
+    NameRegistry().load_folders(["EMSE-24"])
+    read_names = mocker.spy(NameRegistry, "_read_names")
+    registry = NameRegistry()
+    registry.load_folders(["EMSE-24"])
+    assert read_names.call_count == 0
+    assert {"Smith20", "Smith20a", "DoeRoe20"} <= set(registry._names)
+
+
+def test_generated_names_are_unique() -> None:
+    name_generator_ = NameGenerator("mocked", [], append_keyword=True)
+    articles = [{"authors": ["John Smith"], "year": "2020", "title": "Testing"}] * 3
+    articles.append({"authors": ["Jo Doe", "Al Roe"], "year": "2021", "title": "A study of tests"})
+    assert name_generator_.generate_names(articles) == ["Smith20-testing", "Smith20a-testing",
+                                                        "Smith20b-testing", "DoeRoe21-study"]
+
+
+def test_title_of_stopwords_only_uses_its_first_word() -> None:
+    name_generator_ = NameGenerator("mocked", [], append_keyword=True)
+    article = {"authors": ["John Smith"], "year": "2020", "title": "What about this"}
+    assert name_generator_.generate_names([article]) == ["Smith20-what"]
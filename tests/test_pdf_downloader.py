@@ -0,0 +1,211 @@
+import json
+import threading
+import typing as tg
+from pathlib import Path
+
+import pytest
+import requests
+
+from retrievelit import throttle
+from retrievelit.exceptions import DownloadCancelledError, PdfUrlNotFoundError
+from retrievelit.pdf_downloader import PdfDownloader
+from retrievelit.throttle import HostThrottle
+
+
+def _pdf_downloader(tmp_path, mapper, **kwargs) -> PdfDownloader:
+    return PdfDownloader(tmp_path / "T-1-dblp.json", mapper, tmp_path, tmp_path / "T-1.list",
+                         None, 4, str(tmp_path / "Downloads"), **kwargs)
+
+
+def test_cancelled_download_keeps_part_file(tmp_path, mocker) -> None:
+    pdf_downloader = _pdf_downloader(tmp_path, mocker.Mock(), direct=True)
+    part_path = tmp_path / "Smith20.pdf.part"
+
+    def chunks(size):
+        yield b"%PDF-1.4 first chunk"
+        pdf_downloader._stop.set()  # as if the run was interrupted meanwhile
+        yield b"second chunk"
+
+    response = mocker.Mock(iter_content=chunks)
+    with pytest.raises(DownloadCancelledError):
+        pdf_downloader._store_pdf(response, part_path, "wb")
+    assert part_path.read_bytes() == b"%PDF-1.4 first chunk"
+
+
+def _browser_downloader(tmp_path, mocker, entries, **kwargs) -> PdfDownloader:
+    """A PdfDownloader for browser downloads of entries, with the webbrowser mocked away."""
+    (tmp_path / "Downloads").mkdir()
+    metadata_file = tmp_path / "T-1-dblp.json"
+    content = {"run_configuration": {}, "state": {}, "corpus_metadata": entries}
+    metadata_file.write_text(json.dumps(content), encoding="utf8")
+    mapper = mocker.Mock(politeness=1.0)
+    mapper.has_pdfdescriptor.return_value = True
+    mocker.patch("retrievelit.pdf_downloader.webbrowser.open")
+    mocker.patch.object(throttle, "_throttle", HostThrottle())  # don't inherit other tests' pace
+    mocker.patch("retrievelit.throttle.wait")
+    return _pdf_downloader(tmp_path, mapper, **kwargs)
+
+
+def _entry(identifier: str) -> tg.Dict:
+    return {"identifier": identifier, "doi": f"10.1/{identifier}",
+            "pdf_url": f"https://example.org/{identifier}", "pdf_filename": f"{identifier}-download.pdf"}
+
+
+def test_timed_out_browser_download_leaves_step_unfinished(tmp_path, mocker) -> None:
+    pdf_downloader = _browser_downloader(tmp_path, mocker, [_entry("Smith20")], downloadtimeout=0.2)
+    with pytest.raises(SystemExit):
+        pdf_downloader.run()
+    assert not (tmp_path / "T-1.list").exists()
+
+
+def test_browser_downloads_are_matched_by_filename(tmp_path, mocker) -> None:
+    doe = dict(_entry("Doe20"), pdf_filename="Smith20-download.pdf")  # same name as Smith20's download
+    missing = {"identifier": "Roe20", "doi": "10.1/Roe20"}
+    pdf_downloader = _browser_downloader(tmp_path, mocker, [_entry("Smith20"), _entry("Lee20"), doe, missing],
+                                         window=3)
+    pdf_downloader._mapper.get_pdfdescriptor.side_effect = PdfUrlNotFoundError()
+    downloads = tmp_path / "Downloads"
+    opened = []
+
+    def browser(url, new):
+        opened.append(url)
+        if url.endswith("Lee20"):
+            (downloads / "Lee20-download.pdf").write_bytes(b"%PDF-")
+            # Smith20 lands after Lee20, although it was requested first
+            threading.Timer(0.2, (downloads / "Smith20-download.pdf").write_bytes, [b"%PDF-"]).start()
+        elif url.endswith("Doe20"):
+            (downloads / "Smith20-download.pdf").write_bytes(b"%PDF-")
+
+    mocker.patch("retrievelit.pdf_downloader.webbrowser.open", side_effect=browser)
+    pdf_downloader.run()
+    # Doe20 waits until Smith20's file with the same name has been collected
+    assert opened == ["https://example.org/Smith20", "https://example.org/Lee20", "https://example.org/Doe20"]
+    listed = (tmp_path / "T-1.list").read_text(encoding="utf8").split()
+    assert [Path(path).name for path in listed] == ["Lee20.pdf", "Smith20.pdf", "Doe20.pdf"]
+
+
+def test_browser_downloads_without_pdf_url_are_skipped(tmp_path, mocker) -> None:
+    pdf_downloader = _browser_downloader(tmp_path, mocker, [{"identifier": "Roe20", "doi": "10.1/Roe20"}])
+    pdf_downloader._mapper.get_pdfdescriptor.side_effect = PdfUrlNotFoundError()
+    pdf_downloader.run()
+    assert not (tmp_path / "T-1.list").exists()
+
+
+class FakeResponse():
+    """Stands in for a streamed requests response."""
+    def __init__(self, status_code: int, body: bytes = b"", headers: tg.Optional[tg.Dict[str, str]] = None) -> None:
+        self.status_code = status_code
+        self.headers = {"Content-Type": "application/pdf", **(headers or {})}
+        self._body = body
+
+    def __enter__(self) -> "FakeResponse":
+        return self
+
+    def __exit__(self, *args: tg.Any) -> None:
+        pass
+
+    def raise_for_status(self) -> None:
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} Error")
+
+    def iter_content(self, size: int) -> tg.Iterator[bytes]:
+        yield from (self._body[i:i + 4] for i in range(0, len(self._body), 4))
+
+
+PDF = b"%PDF-1.4 whole file"
+URL = "https://example.org/Smith20.pdf"
+
+
+def _download(tmp_path, mocker, *responses: FakeResponse) -> tg.List[tg.Dict[str, str]]:
+    """Download URL to Smith20.pdf with the responses, returning the headers of the requests."""
+    get = mocker.patch("retrievelit.http_client.get", side_effect=list(responses))
+    _pdf_downloader(tmp_path, mocker.Mock(), direct=True)._download_pdf_with_requests(URL, tmp_path / "Smith20.pdf")
+    return [c.kwargs["headers"] for c in get.call_args_list]
+
+
+def _leave_part(tmp_path, data: bytes, **info: tg.Any) -> None:
+    """Leave the .part file of an earlier, interrupted download behind."""
+    (tmp_path / "Smith20.pdf.part").write_bytes(data)
+    (tmp_path / "Smith20.pdf.part.json").write_text(json.dumps({"url": URL, "length": len(PDF), **info}),
+                                                    encoding="utf8")
+
+
+def test_fresh_download_keeps_part_info_until_complete(tmp_path, mocker) -> None:
+    response = FakeResponse(200, PDF, {"Content-Length": str(len(PDF)), "ETag": '"v1"'})
+    saved = []
+
+    def store_pdf(r: FakeResponse, part_path: Path, mode: str) -> None:
+        saved.append(json.loads((tmp_path / "Smith20.pdf.part.json").read_text(encoding="utf8")))
+        part_path.write_bytes(PDF)
+
+    mocker.patch.object(PdfDownloader, "_store_pdf", side_effect=store_pdf)
+    headers = _download(tmp_path, mocker, response)
+    assert "Range" not in headers[0]
+    # what a later run needs for resuming is on disk while the data arrives
+    assert saved == [{"url": URL, "etag": '"v1"', "last_modified": None, "length": len(PDF)}]
+    assert (tmp_path / "Smith20.pdf").read_bytes() == PDF
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["Smith20.pdf"]
+
+
+@pytest.mark.parametrize("content_range", [f"bytes 9-{len(PDF) - 1}/{len(PDF)}", f"bytes 9-{len(PDF) - 1}/*", None])
+def test_resumed_download_appends_the_rest(tmp_path, mocker, content_range) -> None:
+    _leave_part(tmp_path, PDF[:9], etag='"v1"')
+    headers = {"Content-Length": str(len(PDF) - 9)}
+    if content_range:
+        headers["Content-Range"] = content_range
+    sent = _download(tmp_path, mocker, FakeResponse(206, PDF[9:], headers))
+    assert (sent[0]["Range"], sent[0]["If-Range"]) == ("bytes=9-", '"v1"')
+    assert (tmp_path / "Smith20.pdf").read_bytes() == PDF
+
+
+def test_changed_file_is_downloaded_again(tmp_path, mocker) -> None:
+    _leave_part(tmp_path, b"%PDF-old", last_modified="Mon, 01 Jan 2024 00:00:00 GMT")
+    # If-Range did not match, so the server sends the whole new file
+    sent = _download(tmp_path, mocker, FakeResponse(200, PDF, {"Content-Length": str(len(PDF))}))
+    assert sent[0]["If-Range"] == "Mon, 01 Jan 2024 00:00:00 GMT"
+    assert (tmp_path / "Smith20.pdf").read_bytes() == PDF
+
+
+def test_refused_range_starts_over(tmp_path, mocker) -> None:
+    _leave_part(tmp_path, PDF + b"garbage", etag='"v1"')
+    sent = _download(tmp_path, mocker, FakeResponse(416), FakeResponse(200, PDF, {"Content-Length": str(len(PDF))}))
+    assert "Range" in sent[0] and "Range" not in sent[1]
+    assert (tmp_path / "Smith20.pdf").read_bytes() == PDF
+
+
+@pytest.mark.parametrize("info", [{"url": "https://example.org/other.pdf", "etag": '"v1"'}, {"etag": None}])
+def test_part_file_is_only_resumed_with_validator_for_the_same_url(tmp_path, info) -> None:
+    _leave_part(tmp_path, PDF[:9], **info)
+    pdf_downloader = _pdf_downloader(tmp_path, None, direct=True)
+    assert pdf_downloader._resume_point(URL, tmp_path / "Smith20.pdf.part", tmp_path / "Smith20.pdf.part.json") == (0, None)
+
+
+def test_html_served_as_pdf_is_rejected_at_the_first_chunk(tmp_path, mocker) -> None:
+    feedback = mocker.patch("retrievelit.throttle.feedback")
+    html = b"<!DOCTYPE html><html>Please log in</html>"
+    response = FakeResponse(200, html, {"Content-Length": str(len(html))})
+    write = mocker.spy(PdfDownloader, "_write_chunk")
+    with pytest.raises(SystemExit):
+        _download(tmp_path, mocker, response)
+    assert write.call_count == 1
+    feedback.assert_called_once_with(URL, healthy=False)
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_response_without_content_type_is_not_read(tmp_path, mocker) -> None:
+    feedback = mocker.patch("retrievelit.throttle.feedback")
+    response = FakeResponse(200, PDF, {"Content-Length": str(len(PDF))})
+    del response.headers["Content-Type"]
+    store = mocker.spy(PdfDownloader, "_store_pdf")
+    with pytest.raises(SystemExit):
+        _download(tmp_path, mocker, response)
+    assert store.call_count == 0
+    feedback.assert_called_once_with(URL, healthy=False)
+    assert not (tmp_path / "Smith20.pdf").exists()
+
+
+def test_body_shorter_than_announced_is_discarded(tmp_path, mocker) -> None:
+    response = FakeResponse(200, PDF[:9], {"Content-Length": str(len(PDF))})
+    with pytest.raises(SystemExit):
+        _download(tmp_path, mocker, response)
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,49 @@
+from retrievelit import resolution_cache
+from retrievelit.doi_pdf_mappers.base import PDFDescriptor
+from retrievelit.resolution_cache import CachedMapper, ResolutionCache
+
+
+class CountingMapper():
+    """Stands in for a DoiMapper that resolves DOIs online."""
+    resolves_online = True
+
+    def __init__(self) -> None:
+        self.calls = 0
+
+    def get_pdf_url(self, doi: str) -> str:
+        self.calls += 1
+        return f"https://example.org/{doi}.pdf"
+
+    def get_pdfdescriptor(self, doi: str) -> PDFDescriptor:
+        self.calls += 1
+        return PDFDescriptor(self.get_pdf_url(doi), f"{doi}.pdf")
+
+
+def test_entries_expire_after_ttl(tmp_path, mocker) -> None:
+    cache = ResolutionCache(tmp_path / "cache.sqlite", ttl_days=1)
+    time_ = mocker.patch("retrievelit.resolution_cache.time.time", return_value=1_000_000.0)
+    cache.put("M.get_pdf_url", "10.1/a", "https://example.org/a.pdf")
+    time_.return_value += 23 * 3600
+    assert cache.get("M.get_pdf_url", "10.1/a") == "https://example.org/a.pdf"
+    time_.return_value += 2 * 3600
+    assert cache.get("M.get_pdf_url", "10.1/a") is None
+
+
+def test_oldest_entries_are_evicted_beyond_max_entries(tmp_path, mocker) -> None:
+    mocker.patch.object(resolution_cache, "EVICTION_CHECK_INTERVAL", 5)
+    time_ = mocker.patch("retrievelit.resolution_cache.time.time", return_value=1_000_000.0)
+    cache = ResolutionCache(tmp_path / "cache.sqlite", max_entries=3)
+    for i in range(5):
+        time_.return_value += 1
+        cache.put("M.get_pdf_url", f"10.1/{i}", f"url{i}")
+    assert [cache.get("M.get_pdf_url", f"10.1/{i}") for i in range(5)] == [None, None, "url2", "url3", "url4"]
+
+
+def test_cached_mapper_round_trips_descriptors(tmp_path) -> None:
+    cache = ResolutionCache(tmp_path / "cache.sqlite")
+    mapper = CountingMapper()
+    first = CachedMapper(mapper, cache).get_pdfdescriptor("10.1/a")
+    # a later run opens the same file
+    second = CachedMapper(mapper, ResolutionCache(tmp_path / "cache.sqlite")).get_pdfdescriptor("10.1/a")
+    assert second == first == PDFDescriptor("https://example.org/10.1/a.pdf", "10.1/a.pdf")
+    assert mapper.calls == 2  # one get_pdfdescriptor, which asked get_pdf_url once
@@ -0,0 +1,20 @@
+import pytest
+
+from retrievelit import http_client
+from retrievelit.response_cache import ResponseCache
+
+URL = "https://dblp.org/search/publ/api?q=toc:db/journals/ese/ese25.bht:&h=1000&format=json"
+
+
+def test_unchanged_response_is_revalidated_and_served_offline(tmp_path, mocker) -> None:
+    get = mocker.patch.object(http_client, "get")
+    get.return_value = mocker.Mock(status_code=200, content=b'{"result": 1}', headers={"ETag": '"v1"'})
+    assert ResponseCache(tmp_path / "responses.sqlite").get(URL) == b'{"result": 1}'
+    get.return_value = mocker.Mock(status_code=304, content=b"", headers={})
+    assert ResponseCache(tmp_path / "responses.sqlite").get(URL) == b'{"result": 1}'
+    assert get.call_args.kwargs["headers"] == {"If-None-Match": '"v1"'}
+    offline = ResponseCache(tmp_path / "responses.sqlite", offline=True)
+    assert offline.get(URL) == b'{"result": 1}'
+    assert get.call_count == 2
+    with pytest.raises(SystemExit):
+        offline.get(URL + "&f=1000")
@@ -0,0 +1,70 @@
+import typing as tg
+from pathlib import Path
+
+import pytest
+
+from retrievelit import main
+from retrievelit import metadata_store
+from retrievelit import throttle
+from retrievelit import utils
+from retrievelit.dblp_downloader import DblpDownloader
+from retrievelit.pdf_downloader import PdfDownloader
+from retrievelit.streaming_pipeline import StreamingPipeline
+from retrievelit.throttle import HostThrottle
+
+
+def _entries(count: int) -> tg.List[tg.Dict]:
+    return [{"authors": [f"Ann Author{i}"], "year": "2020", "title": f"Title {i}", "doi": f"10.1/{i}",
+             "pdf": False} for i in range(count)]
+
+
+def _stream(mocker, events: tg.List[str], fail_at: tg.Optional[str] = None) -> tg.Any:
+    """Run EMSE-2020 with --stream, logging resolutions and downloads to events."""
+    def get_pdf_url(doi: str) -> str:
+        if doi == fail_at:
+            raise ConnectionError(doi)
+        events.append(f"resolved {doi}")
+        return f"https://x/{doi}.pdf"
+
+    def download_directly(self, entry: tg.Dict, descriptor: tg.Any, reserved: bool = False) -> Path:
+        events.append(f"downloaded {entry['doi']}")
+        return Path(f"{entry['identifier']}.pdf")
+
+    mocker.patch.object(PdfDownloader, "download_directly", download_directly)
+    mapper = mocker.Mock(politeness=0, **{"has_pdfdescriptor.return_value": False,
+                                          "get_pdf_url.side_effect": get_pdf_url})
+    args = main.create_parser().parse_args(["--stream", "--resolve-workers", "1", "--cachedays", "0", "EMSE-2020"])
+    pipeline = main.build_pipeline(args, mapper)
+    assert isinstance(pipeline, StreamingPipeline)
+    pipeline.run()
+    return args
+
+
+def test_downloads_start_before_all_dois_are_resolved(tmp_path, monkeypatch, mocker) -> None:
+    monkeypatch.chdir(tmp_path)
+    mocker.patch.object(throttle, "_throttle", HostThrottle())
+    mocker.patch.object(DblpDownloader, "_fetch", return_value=_entries(40))
+    events: tg.List[str] = []
+    args = _stream(mocker, events)
+    assert events.index("downloaded 10.1/0") < events.index("resolved 10.1/39")
+    _, _, metadata_file, bibtex_file, list_file = main.target_files(args)
+    assert all(e["pdf"] and e["pdf_url"] for e in utils.load_metadata(metadata_file))
+    assert len(list_file.read_text(encoding="utf8").split()) == 40
+    assert bibtex_file.exists()
+    assert all(metadata_store.open_store(metadata_file).load_state().values())
+
+
+def test_interrupted_stream_resumes_with_the_rest(tmp_path, monkeypatch, mocker) -> None:
+    monkeypatch.chdir(tmp_path)
+    mocker.patch.object(throttle, "_throttle", HostThrottle())
+    fetch = mocker.patch.object(DblpDownloader, "_fetch", return_value=_entries(5))
+    events: tg.List[str] = []
+    with pytest.raises(SystemExit):
+        _stream(mocker, events, fail_at="10.1/3")
+    # what was resolved before the failure is downloaded nonetheless
+    assert sorted(events) == ["downloaded 10.1/0", "downloaded 10.1/1", "downloaded 10.1/2",
+                              "resolved 10.1/0", "resolved 10.1/1", "resolved 10.1/2"]
+    events.clear()
+    _stream(mocker, events)
+    fetch.assert_called_once()
+    assert sorted(events) == ["downloaded 10.1/3", "downloaded 10.1/4", "resolved 10.1/3", "resolved 10.1/4"]
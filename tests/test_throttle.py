@@ -0,0 +1,34 @@
+import pytest
+
+from retrievelit.throttle import HostThrottle
+
+URL = "https://example.org/some.pdf"
+
+
+def test_throttle_backs_off_and_recovers() -> None:
+    throttle_ = HostThrottle()
+    throttle_.set_interval("example.org", 4.0)
+    throttle_.observe(URL, 429, 0.1)
+    assert throttle_._hosts["example.org"].interval == pytest.approx(8.0)
+    for _ in range(100):
+        throttle_.observe(URL, 200, 0.1)
+    assert throttle_._hosts["example.org"].interval == pytest.approx(1.0)  # the floor
+
+
+def test_throttle_treats_slow_responses_as_trouble() -> None:
+    throttle_ = HostThrottle()
+    throttle_.set_interval("example.org", 2.0)
+    throttle_.observe(URL, 200, 0.5)
+    interval = throttle_._hosts["example.org"].interval
+    throttle_.observe(URL, 200, 10.0)
+    assert throttle_._hosts["example.org"].interval > interval
+
+
+def test_slow_hosts_speed_up_gradually() -> None:
+    throttle_ = HostThrottle()
+    throttle_.set_interval("example.org", 30.0)
+    throttle_.observe(URL, 200, 0.1)
+    assert throttle_._hosts["example.org"].interval == pytest.approx(30.0 / 1.1)
+    for _ in range(10):
+        throttle_.observe(URL, 200, 0.1)
+    assert throttle_._hosts["example.org"].interval > 7.5  # still well above the floor